@@ -0,0 +1,175 @@
+# aicp/agent_registry.py
+import time, asyncio, logging
+from array import array
+from typing import Any, Dict, List, Optional
+
+from . import codec
+
+logger = logging.getLogger("AICP-AGENTS")
+
+_EWMA_ALPHA = 0.2
+_SAMPLES = 256  # 백분위 계산용 최근 지연 샘플 수
+
+class AgentStats:
+    __slots__ = ("name","capabilities","skills","base_cost","max_concurrency",
+                 "inflight","ewma_ms","samples","n_samples","updated","local")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.capabilities: List[str] = []
+        self.skills: Dict[str, float] = {}
+        self.base_cost: Optional[float] = None
+        self.max_concurrency = 8
+        self.inflight = 0
+        self.ewma_ms: Optional[float] = None
+        self.samples = array("d", bytes(8 * _SAMPLES))
+        self.n_samples = 0
+        self.updated = 0.0   # wall clock (레플리카 간 비교용)
+        self.local = False   # 이 레플리카로 heartbeat 를 보낸 에이전트인지
+
+    def observe(self, latency_ms: float) -> None:
+        self.ewma_ms = latency_ms if self.ewma_ms is None else self.ewma_ms + _EWMA_ALPHA * (latency_ms - self.ewma_ms)
+        self.samples[self.n_samples % _SAMPLES] = latency_ms
+        self.n_samples += 1
+
+    def percentiles(self) -> Dict[str, float]:
+        n = min(self.n_samples, _SAMPLES)
+        if not n: return {}
+        xs = sorted(self.samples[:n])
+        return {f"p{q}": xs[min(n - 1, int(n * q / 100))] for q in (50, 95, 99)}
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name, "capabilities": self.capabilities, "skills": self.skills,
+            "base_cost": self.base_cost, "max_concurrency": self.max_concurrency,
+            "inflight": self.inflight, "ewma_ms": self.ewma_ms, "updated": self.updated,
+            "latency": self.percentiles(),
+        }
+
+class AgentRegistry:
+    """
+    라이브 에이전트 레지스트리
+    - register/heartbeat 로 in-flight 수와 관측 지연(EWMA, 최근 샘플 백분위) 수집
+    - 변경 시 RoutingEngine 의 load/latency 를 갱신 (load = inflight/max_concurrency, latency = ewma/latency_ref_ms)
+    - Redis 가 있으면 aicp:agents 해시로 레플리카 간 공유 (주기적 동기화)
+    - ttl 동안 heartbeat 가 없으면 만료: 동적 에이전트는 제거, 기본 에이전트는 정적 값 복원
+    """
+    redis_key = "aicp:agents"
+
+    def __init__(self, engine, redis=None, ttl: float = 30.0, sync_interval: float = 1.0, latency_ref_ms: float = 5000.0):
+        self.engine = engine
+        self.redis = redis
+        self.ttl = ttl
+        self.sync_interval = sync_interval
+        self.latency_ref_ms = latency_ref_ms
+        self.agents: Dict[str, AgentStats] = {}
+        self._static = {a: dict(w) for a, w in engine.weights.items()}
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def register(self, name: str, capabilities: Optional[List[str]] = None, skills: Optional[Dict[str, float]] = None,
+                       max_concurrency: Optional[int] = None, base_cost: Optional[float] = None) -> Dict[str, Any]:
+        st = self.agents.get(name) or AgentStats(name)
+        if capabilities is not None: st.capabilities = list(capabilities)
+        if skills is not None: st.skills = {k: float(v) for k, v in skills.items()}
+        if max_concurrency: st.max_concurrency = max(1, int(max_concurrency))
+        if base_cost is not None: st.base_cost = float(base_cost)
+        st.local = True
+        st.updated = time.time()
+        self.agents[name] = st
+        self._apply(st); self.engine.refresh((name,))
+        await self._publish(st)
+        return st.to_dict()
+
+    async def heartbeat(self, name: str, inflight: Optional[int] = None, latency_ms: Optional[float] = None,
+                        latencies_ms: Optional[List[float]] = None) -> Dict[str, Any]:
+        st = self.agents.get(name)
+        if st is None or not st.local:
+            await self.register(name)
+            st = self.agents[name]
+        if inflight is not None: st.inflight = max(0, int(inflight))
+        if latency_ms is not None: st.observe(float(latency_ms))
+        for x in latencies_ms or (): st.observe(float(x))
+        st.updated = time.time()
+        self._apply(st); self.engine.refresh((name,))
+        await self._publish(st)
+        return {"status":"ok","name":name,"load":self._load(st),"ewma_ms":st.ewma_ms}
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {name: st.to_dict() for name, st in self.agents.items()}
+
+    # ---- 라우터 반영 ----
+    def _load(self, st: AgentStats) -> float:
+        return min(1.0, st.inflight / st.max_concurrency)
+
+    def _apply(self, st: AgentStats) -> None:
+        """에이전트 상태 → engine.weights (점수 재계산은 호출자가 engine.refresh 로 모아서)"""
+        w = self.engine.weights.get(st.name)
+        if w is None:
+            w = {"analysis":0.5,"creative":0.5,"technical":0.5,"multimodal":0.5,"base_cost":0.5,"latency":0.5,"load":0.5}
+            self.engine.weights[st.name] = w
+        w.update(st.skills)
+        if st.base_cost is not None: w["base_cost"] = st.base_cost
+        w["load"] = self._load(st)
+        if st.ewma_ms is not None: w["latency"] = min(1.0, st.ewma_ms / self.latency_ref_ms)
+
+    def _expire(self) -> None:
+        cutoff = time.time() - self.ttl
+        stale = [n for n, st in self.agents.items() if st.updated < cutoff]
+        if not stale: return
+        for name in stale:
+            del self.agents[name]
+            if name in self._static:
+                self.engine.weights[name] = dict(self._static[name])
+            else:
+                self.engine.weights.pop(name, None)
+        self.engine.refresh(stale)
+
+    # ---- Redis 공유 ----
+    async def _publish(self, st: AgentStats) -> None:
+        if not self.redis: return
+        try:
+            await self.redis.hset(self.redis_key, st.name, codec.dumps(st.to_dict()))
+        except Exception as e:
+            logger.warning(f"agent publish failed: {e}")
+
+    async def _sync(self) -> None:
+        cutoff = time.time() - self.ttl
+        raw = await self.redis.hgetall(self.redis_key)
+        stale = []; changed = []
+        for k, v in raw.items():
+            d = codec.loads(v)
+            if d.get("updated", 0) < cutoff:
+                stale.append(k); continue
+            st = self.agents.get(d["name"])
+            if st is not None and (st.local or st.updated >= d["updated"]): continue
+            st = st or AgentStats(d["name"])
+            st.capabilities = d.get("capabilities") or []
+            st.skills = d.get("skills") or {}
+            st.base_cost = d.get("base_cost")
+            st.max_concurrency = d.get("max_concurrency") or 8
+            st.inflight = d.get("inflight") or 0
+            st.ewma_ms = d.get("ewma_ms")
+            st.updated = d["updated"]
+            self.agents[st.name] = st
+            self._apply(st); changed.append(st.name)
+        if changed: self.engine.refresh(changed)
+        if stale: await self.redis.hdel(self.redis_key, *stale)
+
+    async def _loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.sync_interval)
+            try:
+                if self.redis: await self._sync()
+                self._expire()
+            except Exception as e:
+                logger.warning(f"agent registry sync failed: {e}")
@@ -0,0 +1,202 @@
+# aicp/blobs.py
+"""
+내용 주소(content-addressed) 블롭 저장소 — 큰 컨텍스트 값 분리 보관
+- 키: "sha256:<hex>" (같은 내용은 1번만 저장, 재저장은 시각만 갱신)
+- 원문을 chunk_size 단위로 나눠 청크별 압축 (zstd 설치 시 zstd, 아니면 zlib) → 범위 읽기는 필요한 청크만 해제
+- 백엔드: Redis 해시 aicp:blob:<digest> {m: 메타 JSON, 0..n-1: 청크} 또는 로컬 디렉터리(파일 1개 = 메타 1줄 + 청크, mmap 읽기)
+- SharedState 에는 참조만 저장: {"$blob": "sha256:...", "size": n, "type": "application/json"}
+- 회수: sweep(live, older_than) — 참조되지 않고 grace 이상 지난 블롭 삭제
+"""
+import os, re, mmap, time, zlib, asyncio, hashlib, logging
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+from . import codec
+from .metrics import BLOB_PUTS, BLOB_BYTES
+
+try:
+    import zstandard  # optional
+except Exception:
+    zstandard = None  # type: ignore
+
+logger = logging.getLogger("AICP-BLOBS")
+
+REF_RE = re.compile(r'"\$blob":"(sha256:[0-9a-f]{64})"')
+DIGEST_RE = re.compile(r"sha256:[0-9a-f]{64}\Z")
+
+def ref_digest(value_text: str) -> Optional[str]:
+    """값 텍스트가 블롭 참조 자체면 digest, 아니면 None"""
+    if not value_text.startswith('{"$blob":'): return None
+    m = REF_RE.match(value_text, 1)
+    return m.group(1) if m else None
+
+class BlobStore:
+    prefix = "aicp:blob:"
+
+    def __init__(self, redis=None, directory: Optional[str] = None, chunk_size: int = 256 << 10, level: int = 3):
+        if redis is None and not directory: raise ValueError("BlobStore needs a Redis client or a directory")
+        self.redis = redis if not directory else None  # bytes 응답 클라이언트 (decode_responses=False)
+        self.directory = directory
+        self.chunk_size = chunk_size
+        self.level = level
+        self.codec = "zstd" if zstandard is not None else "zlib"
+        if directory: os.makedirs(directory, exist_ok=True)
+
+    # ---- 압축 ----
+    def _compress(self, data: bytes, codec_name: str) -> bytes:
+        if codec_name == "zstd": return zstandard.ZstdCompressor(level=self.level).compress(data)
+        if codec_name == "zlib": return zlib.compress(data, self.level)
+        return data
+
+    @staticmethod
+    def _decompress(data: bytes, codec_name: str) -> bytes:
+        if codec_name == "zstd":
+            if zstandard is None: raise RuntimeError("blob is zstd-compressed but zstandard is not installed")
+            return zstandard.ZstdDecompressor().decompress(data)
+        if codec_name == "zlib": return zlib.decompress(data)
+        return data
+
+    def _pack(self, data: bytes) -> Tuple[str, Dict[str, Any], List[bytes]]:
+        """(스레드) 해시 + 청크 압축. 압축 이득이 10% 미만이면 원문 저장"""
+        digest = "sha256:" + hashlib.sha256(data).hexdigest()
+        raw = [data[i:i + self.chunk_size] for i in range(0, len(data), self.chunk_size)] or [b""]
+        chunks = [self._compress(c, self.codec) for c in raw]
+        name = self.codec
+        if sum(map(len, chunks)) > 0.9 * len(data): chunks, name = raw, "none"
+        meta = {"size":len(data),"chunk":self.chunk_size,"codec":name,"n":len(chunks)}
+        return digest, meta, chunks
+
+    # ---- 쓰기 ----
+    async def put(self, data: bytes, mime: str = "application/json") -> Dict[str, Any]:
+        """저장 → 참조 객체"""
+        digest, meta, chunks = await asyncio.to_thread(self._pack, data)
+        if await self._touch(digest):
+            BLOB_PUTS.labels("dedup").inc()
+        else:
+            await self._store(digest, meta, chunks)
+            BLOB_PUTS.labels("new").inc()
+            BLOB_BYTES.labels("raw").inc(len(data)); BLOB_BYTES.labels("stored").inc(sum(map(len, chunks)))
+        return {"$blob":digest,"size":len(data),"type":mime}
+
+    def _path(self, digest: str) -> str:
+        h = digest.partition(":")[2]
+        return os.path.join(self.directory, h[:2], h)
+
+    async def _touch(self, digest: str) -> bool:
+        """있으면 시각 갱신 후 True (회수 대상에서 제외)"""
+        if self.redis is not None:
+            pipe = self.redis.pipeline(transaction=True)
+            pipe.hexists(self.prefix + digest, "m")
+            pipe.hset(self.prefix + digest, "t", str(time.time()))
+            return bool((await pipe.execute())[0])  # 저장이 실패해 "m" 이 없으면 다음 put 이 다시 저장
+        try:
+            os.utime(self._path(digest)); return True
+        except FileNotFoundError:
+            return False
+
+    async def _store(self, digest: str, meta: Dict[str, Any], chunks: List[bytes]) -> None:
+        if self.redis is not None:
+            fields: Dict[str, Any] = {"m":codec.dumpb(meta)}
+            fields.update({str(i): c for i, c in enumerate(chunks)})
+            await self.redis.hset(self.prefix + digest, mapping=fields)  # "t" 는 _touch 가 이미 기록
+            return
+        await asyncio.to_thread(self._write_file, self._path(digest), meta, chunks)
+
+    @staticmethod
+    def _write_file(path: str, meta: Dict[str, Any], chunks: List[bytes]) -> None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        ends, n = [], 0
+        for c in chunks:
+            n += len(c); ends.append(n)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(codec.dumpb(dict(meta, ends=ends)) + b"\n")
+            for c in chunks: f.write(c)
+        os.replace(tmp, path)  # 같은 내용 동시 저장은 어느 쪽이 이겨도 동일
+
+    # ---- 읽기 ----
+    async def stat(self, digest: str) -> Optional[Dict[str, Any]]:
+        if not DIGEST_RE.match(digest): return None
+        if self.redis is not None:
+            m = await self.redis.hget(self.prefix + digest, "m")
+            return None if m is None else codec.loads(m)
+        try:
+            with open(self._path(digest), "rb") as f:
+                return codec.loads(f.readline())
+        except FileNotFoundError:
+            return None
+
+    async def read(self, digest: str, offset: int = 0, length: Optional[int] = None) -> Optional[Tuple[bytes, int]]:
+        """[offset, offset+length) 원문 바이트 → (bytes, 전체 크기). 블롭이 없으면(잘못된 digest 포함) None"""
+        if not DIGEST_RE.match(digest): return None
+        if self.redis is None:
+            return await asyncio.to_thread(self._read_file, self._path(digest), offset, length)
+        meta = await self.stat(digest)
+        if meta is None: return None
+        first, last, end = self._span(meta, offset, length)
+        if first > last: return b"", meta["size"]
+        chunks = await self.redis.hmget(self.prefix + digest, [str(i) for i in range(first, last + 1)])
+        if any(c is None for c in chunks): return None  # 읽는 도중 회수됨
+        return self._slice(meta, chunks, first, offset, end), meta["size"]
+
+    @staticmethod
+    def _span(meta: Dict[str, Any], offset: int, length: Optional[int]) -> Tuple[int, int, int]:
+        size, chunk = meta["size"], meta["chunk"]
+        end = size if length is None else min(size, offset + length)
+        if offset >= end: return 1, 0, end
+        return offset // chunk, (end - 1) // chunk, end
+
+    def _slice(self, meta: Dict[str, Any], chunks: List[bytes], first: int, offset: int, end: int) -> bytes:
+        data = b"".join(self._decompress(c, meta["codec"]) for c in chunks)
+        base = first * meta["chunk"]
+        return data[offset - base:end - base]
+
+    def _read_file(self, path: str, offset: int, length: Optional[int]) -> Optional[Tuple[bytes, int]]:
+        try:
+            f = open(path, "rb")
+        except FileNotFoundError:
+            return None
+        with f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            nl = mm.find(b"\n")
+            meta = codec.loads(mm[:nl])
+            first, last, end = self._span(meta, offset, length)
+            if first > last: return b"", meta["size"]
+            ends = meta["ends"]; base = nl + 1
+            chunks = [mm[base + (ends[i - 1] if i else 0):base + ends[i]] for i in range(first, last + 1)]
+            return self._slice(meta, chunks, first, offset, end), meta["size"]
+
+    async def get(self, digest: str) -> Optional[bytes]:
+        r = await self.read(digest)
+        return None if r is None else r[0]
+
+    # ---- 회수 ----
+    async def sweep(self, live: Set[str], older_than: float) -> int:
+        """live 에 없고 older_than(epoch 초) 이전에 저장/갱신된 블롭 삭제 → 삭제 수"""
+        if self.redis is None:
+            return await asyncio.to_thread(self._sweep_files, live, older_than)
+        n = 0
+        async for k in self.redis.scan_iter(match=self.prefix + "*", count=500):
+            digest = (k.decode() if isinstance(k, bytes) else k)[len(self.prefix):]
+            if digest in live: continue
+            t = await self.redis.hget(self.prefix + digest, "t")
+            if t is not None and float(t) < older_than:
+                n += await self.redis.delete(self.prefix + digest)
+        return n
+
+    def _sweep_files(self, live: Set[str], older_than: float) -> int:
+        n = 0
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    if ("sha256:" + name) in live or os.path.getmtime(path) >= older_than: continue
+                    os.remove(path); n += 1
+                except FileNotFoundError:
+                    pass
+        return n
+
+def refs_in(texts: Iterator[str]) -> Set[str]:
+    """값 텍스트들 안(중첩 포함)의 블롭 digest 집합"""
+    out: Set[str] = set()
+    for t in texts:
+        if '"$blob"' in t: out.update(REF_RE.findall(t))
+    return out
@@ -0,0 +1,62 @@
+# aicp/codec.py
+"""
+JSON 코덱 레이어
+- orjson → msgspec → 표준 json 순으로 사용 가능한 백엔드 선택 (AICP_JSON 으로 강제 가능)
+- 모든 백엔드는 UTF-8 bytes 를 출력 (ensure_ascii=False 와 동일한 결과)
+- Raw: 이미 직렬화된 JSON 조각. encode_response 가 재직렬화 없이 envelope 에 이어붙임 (result, notification params)
+"""
+import os, json
+from typing import Any, Callable, Dict, List, Union
+
+def _std_dumpb(obj: Any) -> bytes:
+    return json.dumps(obj, ensure_ascii=False, separators=(",",":")).encode()
+
+def _select():
+    want = os.getenv("AICP_JSON", "auto").lower()
+    if want in ("auto", "orjson"):
+        try:
+            import orjson
+            opts = orjson.OPT_NON_STR_KEYS
+            return "orjson", (lambda o: orjson.dumps(o, option=opts)), orjson.loads
+        except ImportError:
+            pass
+    if want in ("auto", "msgspec"):
+        try:
+            import msgspec
+            enc = msgspec.json.Encoder()
+            return "msgspec", enc.encode, msgspec.json.decode
+        except ImportError:
+            pass
+    return "json", _std_dumpb, json.loads
+
+BACKEND: str
+dumpb: Callable[[Any], bytes]
+loads: Callable[[Union[str, bytes]], Any]
+BACKEND, dumpb, loads = _select()
+
+def dumps(obj: Any) -> str:
+    return dumpb(obj).decode()
+
+class Raw:
+    """사전 직렬화된 JSON 값 (bytes). result 자리에 두면 그대로 송신된다"""
+    __slots__ = ("data",)
+    def __init__(self, data: bytes):
+        self.data = data
+
+    @classmethod
+    def of(cls, obj: Any) -> "Raw":
+        return cls(dumpb(obj))
+
+    def decode(self) -> Any:
+        return loads(self.data)
+
+def encode_response(resp: Union[Dict[str, Any], List[Dict[str, Any]]]) -> bytes:
+    """JSON-RPC 응답(또는 batch 배열, notification) → bytes. result/params 가 Raw 면 이어붙이기만 한다"""
+    if isinstance(resp, list):
+        return b"[" + b",".join(encode_response(r) for r in resp) + b"]"
+    for field in ("result", "params"):
+        raw = resp.get(field)
+        if isinstance(raw, Raw):
+            head = dumpb({k: v for k, v in resp.items() if k != field})
+            return head[:-1] + b',"' + field.encode() + b'":' + raw.data + b"}"
+    return dumpb(resp)
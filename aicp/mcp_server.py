@@ -1,13 +1,10 @@
-import os, json, asyncio, logging
-from dataclasses import dataclass, asdict
-from typing import Dict, Any, Optional, List, Union
-from datetime import datetime
+import os, time, base64, signal, asyncio, logging, threading
+from dataclasses import dataclass, field
+from typing import Dict, Any, Optional, List, Union, Callable, Awaitable, Iterable
+from datetime import datetime, timezone
+from urllib.parse import parse_qs
 
-import websockets
-from websockets.server import WebSocketServerProtocol
-
-from prometheus_client import Counter, Histogram, Gauge, generate_latest, CONTENT_TYPE_LATEST
-from aiohttp import web
+from aiohttp import web, WSMsgType
 
 try:
     from redis.asyncio import Redis
@@ -15,20 +12,26 @@ except Exception:
     Redis = None  # type: ignore
 
 # ---- 프로젝트 내부 모듈 ----
-from .shared_state import SharedState
+from .shared_state import SharedState, VersionConflict
+from .patch import PatchError
+from .state_cache import LocalCache
+from .mem_store import MemoryStore
+from .routing_cache import RoutingCache
+from .blobs import BlobStore
+from .utils import gen_id
+from .ratelimit import RateLimiter, RateLimits, RateLimited
+from .security import TokenVerifier, Claims, AuthError
+from .routing_history import RoutingHistory, FileSink, PostgresSink
 from .neural_bus import NeuralBusMCP
+from .subscriptions import SubscriptionHub
+from . import codec, profiling
+from .codec import Raw
+from .metrics import HTTP_REQ, HTTP_LAT, WS_CONNS, WS_REJECTED, WS_EVICTED, ROUTING_OK, ERRORS, SEND_QUEUE, Tracer, inflight, instrument_redis, observe_phase, render
 
 # ---- 로깅 ----
 logging.basicConfig(level=os.getenv("LOG_LEVEL","INFO"))
 logger = logging.getLogger("AICP-MCP")
 
-# ---- 메트릭 ----
-HTTP_REQ = Counter("aicp_http_requests_total","HTTP requests",["method","path","status"])
-HTTP_LAT = Histogram("aicp_http_latency_seconds","HTTP latency seconds")
-WS_CONNS = Gauge("aicp_ws_connections","Active WS connections")
-ROUTING_OK = Counter("aicp_routing_success_total","Routing success")
-ERRORS = Counter("aicp_errors_total","Errors",["kind"])
-
 # ---- MCP 메시지 ----
 @dataclass
 class MCPMessage:
@@ -38,167 +41,692 @@ class MCPMessage:
     params: Optional[Dict[str,Any]] = None
     result: Optional[Any] = None
     error: Optional[Dict[str,Any]] = None
-    def to_dict(self): return {k:v for k,v in asdict(self).items() if v is not None}
-
-# ---- 세션 & 레이트리밋 ----
-class RateLimiter:
-    def __init__(self, rate_per_sec: float = 10, burst: int = 20):
-        import time
-        self.rate = rate_per_sec
-        self.capacity = burst
-        self.tokens = burst
-        self.updated = time.monotonic()
-        self.time = time
-
-    async def take(self, n: int = 1):
-        now = self.time.monotonic()
-        delta = now - self.updated
-        self.updated = now
-        self.tokens = min(self.capacity, self.tokens + delta * self.rate)
-        if self.tokens >= n:
-            self.tokens -= n
-            return True
-        wait = (n - self.tokens) / self.rate
-        await asyncio.sleep(max(wait,0))
-        self.tokens = 0
-        return True
+    # asdict()는 result를 재귀 복사하므로 얕은 변환 사용 (정적 응답 재사용)
+    def to_dict(self):
+        d = {k:v for k,v in self.__dict__.items() if v is not None}
+        if "id" not in d and ("result" in d or "error" in d): d["id"] = None  # 응답은 id 필수 (모르면 null)
+        return d
 
+# ---- 세션 ----
 @dataclass
 class MCPSession:
     session_id: str
     client_name: str = "unknown"
     client_version: str = "1.0"
-    created_at: str = datetime.utcnow().isoformat()
-    limiter: RateLimiter = RateLimiter()
+    created_at: str = field(default_factory=lambda: datetime.now(timezone.utc).isoformat())
+    tenant: str = "default"
+    claims: Optional[Claims] = None  # 인증 시 1회 고정 (handshake 헤더 또는 initialize)
+    binary_frames: bool = False  # 클라이언트 허용 시 binary 프레임으로 송신
+    notify: Optional[Callable[[Dict[str,Any]], Awaitable[None]]] = None  # 서버 → 클라이언트 notification 송신
+    limiter: RateLimiter = field(default_factory=RateLimiter)  # 세션마다 별도 버킷
+    uploads: Dict[str, bytearray] = field(default_factory=dict)  # upload_blob 진행 중 (세션 종료 시 폐기)
+
+# ---- 정적 정의 (시작 시 1회 생성) ----
+TOOLS: List[Dict[str,Any]] = [
+    {
+        "name":"route_to_agent",
+        "description":"Route message to optimal AI agent",
+        "inputSchema":{
+            "type":"object",
+            "properties":{
+                "message":{"type":"string"},
+                "target_capabilities":{"type":"array","items":{"type":"string"}},
+                "context":{"type":"object"}
+            },
+            "required":["message"]
+        }
+    },
+    {
+        "name":"route_batch",
+        "description":"Route many messages in one call (bulk triage)",
+        "inputSchema":{
+            "type":"object",
+            "properties":{
+                "messages":{
+                    "type":"array",
+                    "maxItems":10000,
+                    "items":{
+                        "oneOf":[
+                            {"type":"string"},
+                            {
+                                "type":"object",
+                                "properties":{
+                                    "message":{"type":"string"},
+                                    "target_capabilities":{"type":"array","items":{"type":"string"}}
+                                },
+                                "required":["message"]
+                            }
+                        ]
+                    }
+                }
+            },
+            "required":["messages"]
+        }
+    },
+    {
+        "name":"register_agent",
+        "description":"Register (or update) a live agent for load-aware routing",
+        "inputSchema":{
+            "type":"object",
+            "properties":{
+                "name":{"type":"string"},
+                "capabilities":{"type":"array","items":{"type":"string"}},
+                "skills":{"type":"object","additionalProperties":{"type":"number","minimum":0,"maximum":1}},
+                "max_concurrency":{"type":"integer","minimum":1},
+                "base_cost":{"type":"number","minimum":0,"maximum":1}
+            },
+            "required":["name"]
+        }
+    },
+    {
+        "name":"agent_heartbeat",
+        "description":"Report agent in-flight count and observed latencies",
+        "inputSchema":{
+            "type":"object",
+            "properties":{
+                "name":{"type":"string"},
+                "inflight":{"type":"integer","minimum":0},
+                "latency_ms":{"type":"number","minimum":0},
+                "latencies_ms":{"type":"array","items":{"type":"number","minimum":0}}
+            },
+            "required":["name"]
+        }
+    },
+    {
+        "name":"share_context",
+        "description":"Share context across agents (SSoT)",
+        "inputSchema":{
+            "type":"object",
+            "properties":{
+                "context_key":{"type":"string"},
+                "context_value":{
+                    "oneOf":[
+                        {"type":"object"},{"type":"string"},
+                        {"type":"number"},{"type":"boolean"},
+                        {"type":"array"},{"type":"null"}
+                    ]
+                },
+                "if_version":{"type":"integer","minimum":0},
+                "ttl_seconds":{"type":"number","exclusiveMinimum":0}
+            },
+            "required":["context_key","context_value"]
+        }
+    },
+    {
+        "name":"patch_context",
+        "description":"Apply a JSON Patch (array) or JSON Merge Patch (object) to a shared context value",
+        "inputSchema":{
+            "type":"object",
+            "properties":{
+                "context_key":{"type":"string"},
+                "patch":{"oneOf":[{"type":"array","items":{"type":"object"}},{"type":"object"}]},
+                "format":{"type":"string","enum":["json-patch","merge-patch"]},
+                "if_version":{"type":"integer","minimum":0}
+            },
+            "required":["context_key","patch"]
+        }
+    },
+    {
+        "name":"orchestrate_collaboration",
+        "description":"Orchestrate multi-agent collaboration; runs in the background unless wait=true",
+        "inputSchema":{
+            "type":"object",
+            "properties":{
+                "task":{"type":"string"},
+                "agents":{"type":"array","items":{"type":"string"}},
+                "steps":{
+                    "type":"array",
+                    "items":{
+                        "type":"object",
+                        "properties":{
+                            "id":{"type":"string"},
+                            "agent":{"type":"string"},
+                            "task":{"type":"string"},
+                            "depends_on":{"type":"array","items":{"type":"string"}},
+                            "timeout":{"type":"number","exclusiveMinimum":0}
+                        }
+                    }
+                },
+                "timeout":{"type":"number","exclusiveMinimum":0},
+                "wait":{"type":"boolean"}
+            },
+            "required":["task"]
+        }
+    },
+    {
+        "name":"cancel_collaboration",
+        "description":"Cancel a background collaboration job (started with wait=false)",
+        "inputSchema":{
+            "type":"object",
+            "properties":{"job_id":{"type":"string"}},
+            "required":["job_id"]
+        }
+    },
+    {
+        "name":"upload_blob",
+        "description":"Upload a large value in parts; the last part (final=true) returns a {$blob} reference to use as a context value",
+        "inputSchema":{
+            "type":"object",
+            "properties":{
+                "data":{"type":"string"},
+                "encoding":{"type":"string","enum":["text","base64"]},
+                "upload_id":{"type":"string"},
+                "final":{"type":"boolean"},
+                "mime_type":{"type":"string"}
+            },
+            "required":["data"]
+        }
+    }
+]
+
+RESOURCES: List[Dict[str,Any]] = [
+    {"uri":"aicp://shared-state","name":"Shared State","description":"SSoT snapshot (?key=&since_version= for one versioned key, subscribe: ?prefix=)","mimeType":"application/json"},
+    {"uri":"aicp://agents","name":"Agent Registry","description":"Live agents with load/latency stats","mimeType":"application/json"},
+    {"uri":"aicp://routing-history","name":"Routing History","description":"Recent routing decisions (?session_id=&agent=&limit=)","mimeType":"application/json"},
+    {"uri":"aicp://blob/{digest}","name":"Blob","description":"Content of a {$blob} reference, base64 (?offset=&length= for ranged reads)","mimeType":"application/octet-stream"}
+]
+
+PROMPT_LIST: List[Dict[str,Any]] = [
+    {"name":"analyze_task","description":"Analyze a task for optimal routing"},
+    {"name":"collaboration_request","description":"Ask agents to collaborate"}
+]
+
+PROMPTS: Dict[str,Dict[str,Any]] = {
+    "analyze_task": {
+        "name":"analyze_task",
+        "description":"Analyze a task for optimal agent routing",
+        "arguments":[{"name":"task","description":"The task","required":True}],
+        "messages":[{"role":"user","content":"Analyze this task and determine best agent(s): {{task}}"}]
+    },
+    "collaboration_request": {
+        "name":"collaboration_request",
+        "description":"Orchestrate collaboration",
+        "arguments":[{"name":"task","required":True},{"name":"agents","required":False}],
+        "messages":[{"role":"user","content":"Coordinate {{agents}} to complete: {{task}}"}]
+    },
+}
+
+SERVER_INFO: Dict[str,Any] = {
+    "protocolVersion":"2025-06-18",
+    "serverInfo":{"name":"AICP-MCP-Server","version":"1.2.0"},
+    "capabilities":{"tools":{},"resources":{"subscribe":True},"prompts":{},"logging":{}}
+}
+
+class RPCError(Exception):
+    """JSON-RPC 오류 (핸들러에서 raise → error 응답으로 변환)"""
+    def __init__(self, code: int, message: str, data: Any = None):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+        self.data = data
+
+    def to_error(self) -> Dict[str,Any]:
+        err = {"code":self.code,"message":self.message}
+        if self.data is not None: err["data"] = self.data
+        return err
+
+def _text(payload: Any) -> Raw:
+    # payload는 1회만 직렬화, text 필드는 문자열 이스케이프만 수행
+    return Raw(b'{"content":[{"type":"text","text":' + codec.dumpb(codec.dumps(payload)) + b'}]}')
 
 # ---- 브리지 ----
 class AICPMCPBridge:
-    def __init__(self, neural_bus: NeuralBusMCP):
+    """
+    테이블 기반 디스패처
+    - methods/tools: 이름 → 핸들러 (O(1) 조회)
+    - JSON-RPC 2.0 batch: 배열 요청을 동시 실행 후 배열로 응답 (notification 응답은 생략)
+    """
+    # 레이트리밋을 거치지 않는 메서드
+    UNLIMITED = frozenset({"initialize"})
+    MAX_PAGE = 1000
+    MAX_BLOB_READ = 512 << 10  # base64 후에도 1 MiB 프레임 안
+    MAX_ROUTE_BATCH = 10000
+    JOB_TIMEOUT = 120.0
+    MAX_JOB_TIMEOUT = 3600.0
+
+    def __init__(self, neural_bus: NeuralBusMCP, max_batch: int = 128, page_size: int = 100, limits: Optional[RateLimits] = None,
+                 auth: Optional[TokenVerifier] = None, subs: Optional[SubscriptionHub] = None, tracer: Optional[Tracer] = None,
+                 max_blob: int = 64 << 20, max_uploads: int = 4):
         self.bus = neural_bus
+        self.max_blob = max_blob
+        self.max_uploads = max_uploads  # 세션당 동시 진행 upload_blob 수 (메모리 상한 = max_uploads × max_blob)
+        self.tracer = tracer or Tracer()
+        self.limits = limits or RateLimits()
+        self.auth = auth
+        self.subs = subs or SubscriptionHub(neural_bus.ssot)
+        self.max_batch = max_batch
+        self.page_size = page_size
+        self.methods = {
+            "initialize": self.initialize,
+            "tools/list": self.tools_list,
+            "tools/call": self.tools_call,
+            "resources/list": self.resources_list,
+            "resources/read": self.resources_read,
+            "resources/subscribe": self.resources_subscribe,
+            "resources/unsubscribe": self.resources_unsubscribe,
+            "prompts/list": self.prompts_list,
+            "prompts/get": self.prompts_get,
+        }
+        self.tools = {
+            "route_to_agent": self.tool_route_to_agent,
+            "route_batch": self.tool_route_batch,
+            "register_agent": self.tool_register_agent,
+            "agent_heartbeat": self.tool_agent_heartbeat,
+            "share_context": self.tool_share_context,
+            "patch_context": self.tool_patch_context,
+            "orchestrate_collaboration": self.tool_orchestrate_collaboration,
+            "cancel_collaboration": self.tool_cancel_collaboration,
+            "upload_blob": self.tool_upload_blob,
+        }
+        # 정적 응답은 시작 시 직렬화해 두고 그대로 이어붙임
+        self._server_info = Raw.of(SERVER_INFO)
+        self._tools_result = Raw.of({"tools":TOOLS})
+        self._resources_result = Raw.of({"resources":RESOURCES})
+        self._prompts_result = Raw.of({"prompts":PROMPT_LIST})
+        self._prompts = {k: Raw.of(v) for k,v in PROMPTS.items()}
 
-    async def handle(self, msg: Dict[str,Any], session: MCPSession) -> Dict[str,Any]:
-        method = msg.get("method"); params = msg.get("params") or {}; msg_id = msg.get("id")
-        try:
-            if method == "initialize":
-                ci = params.get("clientInfo") or {}
-                session.client_name = ci.get("name","unknown")
-                session.client_version = ci.get("version","1.0")
-                return MCPMessage(id=msg_id, result={
-                    "protocolVersion":"2025-06-18",
-                    "serverInfo":{"name":"AICP-MCP-Server","version":"1.2.0"},
-                    "capabilities":{"tools":{},"resources":{},"prompts":{},"logging":{}}
-                }).to_dict()
-
-            await session.limiter.take()
-
-            if method == "tools/list":
-                tools = [
-                    {
-                        "name":"route_to_agent",
-                        "description":"Route message to optimal AI agent",
-                        "inputSchema":{
-                            "type":"object",
-                            "properties":{
-                                "message":{"type":"string"},
-                                "target_capabilities":{"type":"array","items":{"type":"string"}},
-                                "context":{"type":"object"}
-                            },
-                            "required":["message"]
-                        }
-                    },
-                    {
-                        "name":"share_context",
-                        "description":"Share context across agents (SSoT)",
-                        "inputSchema":{
-                            "type":"object",
-                            "properties":{
-                                "context_key":{"type":"string"},
-                                "context_value":{
-                                    "oneOf":[
-                                        {"type":"object"},{"type":"string"},
-                                        {"type":"number"},{"type":"boolean"},
-                                        {"type":"array"},{"type":"null"}
-                                    ]
-                                }
-                            },
-                            "required":["context_key","context_value"]
-                        }
-                    },
-                    {
-                        "name":"orchestrate_collaboration",
-                        "description":"Orchestrate multi-agent collaboration",
-                        "inputSchema":{
-                            "type":"object",
-                            "properties":{
-                                "task":{"type":"string"},
-                                "agents":{"type":"array","items":{"type":"string"}}
-                            },
-                            "required":["task"]
-                        }
-                    }
-                ]
-                return MCPMessage(id=msg_id, result={"tools":tools}).to_dict()
-
-            if method == "tools/call":
-                args = params.get("arguments") or {}
-                name = params.get("name")
-                if name == "route_to_agent":
-                    payload = await self.bus.route_message(args.get("message",""), args.get("target_capabilities",[]), args.get("context",{}), session.session_id)
-                    ROUTING_OK.inc()
-                    return MCPMessage(id=msg_id, result={"content":[{"type":"text","text":json.dumps(payload,ensure_ascii=False)}]}).to_dict()
-                if name == "share_context":
-                    payload = await self.bus.share_context(args.get("context_key"), json.dumps(args.get("context_value"),ensure_ascii=False), session.session_id)
-                    return MCPMessage(id=msg_id, result={"content":[{"type":"text","text":json.dumps(payload,ensure_ascii=False)}]}).to_dict()
-                if name == "orchestrate_collaboration":
-                    payload = await self.bus.orchestrate_collaboration(args.get("task",""), args.get("agents",[]), session.session_id)
-                    return MCPMessage(id=msg_id, result={"content":[{"type":"text","text":json.dumps(payload,ensure_ascii=False)}]}).to_dict()
-                return MCPMessage(id=msg_id, error={"code":-32602,"message":f"Unknown tool {name}"}).to_dict()
-
-            if method == "resources/list":
-                return MCPMessage(id=msg_id, result={"resources":[
-                    {"uri":"aicp://shared-state","name":"Shared State","description":"SSoT snapshot","mimeType":"application/json"}
-                ]}).to_dict()
-
-            if method == "resources/read":
-                uri = params.get("uri")
-                if uri != "aicp://shared-state":
-                    return MCPMessage(id=msg_id, error={"code":-32602,"message":f"Unknown resource {uri}"}).to_dict()
-                snapshot = await self.bus.get_shared_state()
-                return MCPMessage(id=msg_id, result={"contents":[{"uri":uri,"mimeType":"application/json","text":json.dumps(snapshot,ensure_ascii=False)}]}).to_dict()
-
-            if method == "prompts/list":
-                return MCPMessage(id=msg_id, result={"prompts":[
-                    {"name":"analyze_task","description":"Analyze a task for optimal routing"},
-                    {"name":"collaboration_request","description":"Ask agents to collaborate"}
-                ]}).to_dict()
-
-            if method == "prompts/get":
-                name = params.get("name")
-                if name == "analyze_task":
-                    return MCPMessage(id=msg_id, result={
-                        "name":"analyze_task",
-                        "description":"Analyze a task for optimal agent routing",
-                        "arguments":[{"name":"task","description":"The task","required":True}],
-                        "messages":[{"role":"user","content":"Analyze this task and determine best agent(s): {{task}}"}]
-                    }).to_dict()
-                if name == "collaboration_request":
-                    return MCPMessage(id=msg_id, result={
-                        "name":"collaboration_request",
-                        "description":"Orchestrate collaboration",
-                        "arguments":[{"name":"task","required":True},{"name":"agents","required":False}],
-                        "messages":[{"role":"user","content":"Coordinate {{agents}} to complete: {{task}}"}]
-                    }).to_dict()
-                return MCPMessage(id=msg_id, error={"code":-32602,"message":f"Unknown prompt {name}"}).to_dict()
-
-            return MCPMessage(id=msg_id, error={"code":-32601,"message":"Method not found"}).to_dict()
+    async def handle(self, msg: Any, session: MCPSession) -> Optional[Union[Dict[str,Any],List[Dict[str,Any]]]]:
+        """단일/배치 요청 처리. 응답할 것이 없으면(notification) None"""
+        if isinstance(msg, list):
+            if not msg:
+                return MCPMessage(error={"code":-32600,"message":"Invalid Request"}).to_dict()
+            if len(msg) > self.max_batch:
+                return MCPMessage(error={"code":-32600,"message":f"batch too large (max {self.max_batch})"}).to_dict()
+            out = await asyncio.gather(*(self.handle_one(m, session) for m in msg))
+            return [r for r in out if r is not None] or None
+        return await self.handle_one(msg, session)
 
+    async def handle_one(self, msg: Any, session: MCPSession) -> Optional[Dict[str,Any]]:
+        if not isinstance(msg, dict) or not isinstance(msg.get("method"), str):
+            msg_id = msg.get("id") if isinstance(msg, dict) else None
+            return MCPMessage(id=msg_id, error={"code":-32600,"message":"Invalid Request"}).to_dict()
+        method = msg["method"]; params = msg.get("params"); msg_id = msg.get("id")
+        if params is None: params = {}
+        notification = "id" not in msg
+        label = self.label(msg)
+        gauge = inflight(label); gauge.inc()
+        span = self.tracer.start(label, session=session.session_id)
+        if span is not None and method == "tools/call" and isinstance(params, dict): span.set("tool", str(params.get("name")))
+        try:
+            if method not in self.UNLIMITED:
+                if self.auth is not None: self._check_auth(session)
+                t = time.perf_counter()
+                await self.limits.acquire(session.limiter, session.tenant)
+                waited = time.perf_counter() - t
+                observe_phase(label, "", "limiter", waited)
+                if span is not None: span.set("limiter_ms", round(waited * 1000, 3))
+            fn = self.methods.get(method)
+            if fn is None:
+                raise RPCError(-32601, "Method not found")
+            if not isinstance(params, dict):
+                raise RPCError(-32602, "params must be an object")
+            t = time.perf_counter()
+            try:
+                result = await fn(params, session)
+            finally:
+                took = time.perf_counter() - t
+                # tools/call 은 tools_call 에서 도구 라벨로 기록
+                if method != "tools/call": observe_phase(label, "", "handler", took)
+                if span is not None: span.set("handler_ms", round(took * 1000, 3))
+            resp = MCPMessage(id=msg_id, result=result).to_dict()
+        except RPCError as e:
+            resp = MCPMessage(id=msg_id, error=e.to_error()).to_dict()
+        except RateLimited as e:
+            ERRORS.labels("rate_limited").inc()
+            resp = MCPMessage(id=msg_id, error={"code":-32029,"message":str(e),"data":{"scope":e.scope,"retryAfter":round(e.retry_after,3)}}).to_dict()
         except Exception as e:
             ERRORS.labels("server").inc()
             logger.exception("error handling MCP")
-            return MCPMessage(id=msg_id, error={"code":-32603,"message":str(e)}).to_dict()
+            resp = MCPMessage(id=msg_id, error={"code":-32603,"message":str(e)}).to_dict()
+        finally:
+            gauge.dec()
+        if span is not None: span.end(resp["error"].get("message") if "error" in resp else None)
+        return None if notification else resp
+
+    def label(self, msg: Any) -> str:
+        """메트릭 라벨용 메서드 이름 (알 수 없는 값은 하나로 묶어 라벨 수 제한)"""
+        if isinstance(msg, list): return "batch"
+        method = msg.get("method") if isinstance(msg, dict) else None
+        return method if method in self.methods else "unknown"
+
+    # ---- auth ----
+    async def authenticate(self, session: MCPSession, token: Optional[str]) -> Claims:
+        """토큰 검증 후 세션에 Claims/tenant 고정"""
+        try:
+            claims = await self.auth.verify(token or "")
+        except AuthError as e:
+            ERRORS.labels("auth").inc()
+            raise RPCError(-32001, f"unauthorized: {e}")
+        session.claims = claims
+        session.tenant = claims.tenant
+        return claims
+
+    @staticmethod
+    def _check_auth(session: MCPSession) -> None:
+        claims = session.claims
+        if claims is None:
+            raise RPCError(-32001, "unauthorized: send a bearer token in the handshake or initialize.params.authorization")
+        if claims.exp is not None and claims.exp <= time.time():
+            session.claims = None
+            raise RPCError(-32001, "unauthorized: token expired")
+
+    # ---- methods ----
+    async def initialize(self, params: Dict[str,Any], session: MCPSession):
+        if self.auth is not None and session.claims is None:
+            await self.limits.acquire_session(session.limiter)  # UNLIMITED 이지만 토큰 검증은 세션 버킷 소비
+            await self.authenticate(session, self._check(params, "authorization", str, "a string"))
+        ci = self._check(params, "clientInfo", dict, "an object") or {}
+        session.client_name = str(ci.get("name","unknown"))
+        session.client_version = str(ci.get("version","1.0"))
+        exp = (self._check(params, "capabilities", dict, "an object") or {}).get("experimental") or {}
+        if not isinstance(exp, dict): raise RPCError(-32602, "capabilities.experimental must be an object")
+        session.binary_frames = bool(exp.get("aicp/binaryFrames"))
+        return self._server_info
+
+    async def tools_list(self, params: Dict[str,Any], session: MCPSession):
+        return self._tools_result
+
+    async def tools_call(self, params: Dict[str,Any], session: MCPSession):
+        name = params.get("name")
+        fn = self.tools.get(name) if isinstance(name, str) else None
+        if fn is None:
+            raise RPCError(-32602, f"Unknown tool {name}")
+        args = self._check(params, "arguments", dict, "an object") or {}
+        meta = self._check(params, "_meta", dict, "an object") or {}
+        if self.auth is not None:
+            try:
+                self.auth.check_tool(session.claims, name)
+            except AuthError as e:
+                raise RPCError(-32003, f"forbidden: {e}")
+        t = time.perf_counter()
+        await self.limits.acquire(session.limiter, session.tenant, tool=name)
+        t1 = time.perf_counter()
+        observe_phase("tools/call", name, "limiter", t1 - t)
+        try:
+            return await fn(args, session, meta)
+        finally:
+            observe_phase("tools/call", name, "handler", time.perf_counter() - t1)
+
+    async def resources_list(self, params: Dict[str,Any], session: MCPSession):
+        return self._resources_result
+
+    async def resources_read(self, params: Dict[str,Any], session: MCPSession):
+        uri = self._check(params, "uri", str, "a string")
+        base, _, query = (uri or "").partition("?")
+        if base == "aicp://routing-history":
+            return await self._read_routing_history(uri, parse_qs(query))
+        if uri == "aicp://agents":
+            agents = await self.bus.get_agent_registry()
+            return {"contents":[{"uri":uri,"mimeType":"application/json","text":codec.dumps(agents)}]}
+        if base.startswith("aicp://blob/"):
+            return await self._read_blob(uri, base[len("aicp://blob/"):], parse_qs(query))
+        if base == "aicp://shared-state" and "key" in parse_qs(query):
+            return await self._read_context(uri, parse_qs(query))
+        if uri != "aicp://shared-state":
+            raise RPCError(-32602, f"Unknown resource {uri}")
+        if params.get("cursor") is None and params.get("limit") is None:
+            snapshot = await self.bus.get_shared_state()
+            return {"contents":[{"uri":uri,"mimeType":"application/json","text":codec.dumps(snapshot)}]}
+        # 페이지 조회: 전체 스냅샷을 만들지 않음
+        cursor = self._check(params, "cursor", str, "a string")
+        limit = self._check(params, "limit", int, "an integer")
+        try:
+            limit = min(max(limit or self.page_size, 1), self.MAX_PAGE)
+            items, next_cursor = await self.bus.get_shared_state_page(cursor, limit)
+        except ValueError:
+            raise RPCError(-32602, "invalid cursor or limit")
+        result = {"contents":[{"uri":uri,"mimeType":"application/json","text":codec.dumps(items)}]}
+        if next_cursor is not None: result["nextCursor"] = next_cursor
+        return result
+
+    @staticmethod
+    def _state_prefix(uri: Any) -> str:
+        """aicp://shared-state[?prefix=...] → 키 접두사"""
+        base, _, query = (uri or "").partition("?") if isinstance(uri, str) else ("", "", "")
+        if base != "aicp://shared-state":
+            raise RPCError(-32602, f"Resource does not support subscriptions: {uri}")
+        return parse_qs(query).get("prefix",[""])[0]
+
+    async def resources_subscribe(self, params: Dict[str,Any], session: MCPSession):
+        uri = params.get("uri")
+        prefix = self._state_prefix(uri)
+        if session.notify is None:
+            raise RPCError(-32602, "subscriptions need a streaming transport")
+        try:
+            self.subs.subscribe(session.session_id, session.notify, uri, prefix)
+        except ValueError as e:
+            raise RPCError(-32602, str(e))
+        return {}
+
+    async def resources_unsubscribe(self, params: Dict[str,Any], session: MCPSession):
+        self._state_prefix(params.get("uri"))
+        self.subs.unsubscribe(session.session_id, params.get("uri"))
+        return {}
+
+    async def _read_context(self, uri: str, q: Dict[str,List[str]]):
+        key = q["key"][0]
+        try:
+            since = q.get("since_version",[None])[0]
+            payload = await self.bus.get_context(key, None if since is None else int(since))
+        except ValueError:
+            raise RPCError(-32602, "invalid since_version")
+        return {"contents":[{"uri":uri,"mimeType":"application/json","text":codec.dumps(payload)}]}
+
+    async def _read_blob(self, uri: str, digest: str, q: Dict[str,List[str]]):
+        blobs = self.bus.ssot.blobs
+        if blobs is None:
+            raise RPCError(-32602, "blob store is not configured")
+        try:
+            offset = int(q.get("offset",["0"])[0])
+            length = min(int(q.get("length",[str(self.MAX_BLOB_READ)])[0]), self.MAX_BLOB_READ)
+            if offset < 0 or length < 0: raise ValueError
+        except ValueError:
+            raise RPCError(-32602, "invalid offset or length")
+        res = await blobs.read(digest, offset, length)
+        if res is None:
+            raise RPCError(-32602, f"Unknown blob {digest}")
+        data, size = res
+        return {"contents":[{"uri":uri,"mimeType":"application/octet-stream","blob":base64.b64encode(data).decode(),
+                             "offset":offset,"length":len(data),"size":size}]}
+
+    async def _read_routing_history(self, uri: str, q: Dict[str,List[str]]):
+        try:
+            limit = min(max(int(q.get("limit",["50"])[0]), 1), self.MAX_PAGE)
+        except ValueError:
+            raise RPCError(-32602, "invalid limit")
+        records = await self.bus.get_routing_history(q.get("session_id",[None])[0], q.get("agent",[None])[0], limit)
+        return {"contents":[{"uri":uri,"mimeType":"application/json","text":codec.dumps(records)}]}
+
+    async def prompts_list(self, params: Dict[str,Any], session: MCPSession):
+        return self._prompts_result
+
+    async def prompts_get(self, params: Dict[str,Any], session: MCPSession):
+        name = params.get("name")
+        prompt = self._prompts.get(name) if isinstance(name, str) else None
+        if prompt is None:
+            raise RPCError(-32602, f"Unknown prompt {name}")
+        return prompt
+
+    # ---- tools ----
+    @staticmethod
+    def _check(args: Dict[str,Any], name: str, types: Any, what: str) -> Any:
+        """선택 인자 타입 확인 (잘못되면 -32602, bool 은 숫자로 보지 않음)"""
+        v = args.get(name)
+        if v is not None and (not isinstance(v, types) or (isinstance(v, bool) and types is not bool)):
+            raise RPCError(-32602, f"{name} must be {what}")
+        return v
+
+    @classmethod
+    def _strings(cls, args: Dict[str,Any], name: str) -> Optional[List[str]]:
+        v = cls._check(args, name, list, "an array of strings")
+        if v is not None and not all(isinstance(x, str) for x in v):
+            raise RPCError(-32602, f"{name} must be an array of strings")
+        return v
+
+    async def tool_route_to_agent(self, args: Dict[str,Any], session: MCPSession, meta: Dict[str,Any]):
+        message = self._check(args, "message", str, "a string") or ""
+        context = self._check(args, "context", dict, "an object") or {}
+        payload = await self.bus.route_message(message, self._strings(args, "target_capabilities") or [], context, session.session_id)
+        ROUTING_OK.inc()
+        return _text(payload)
+
+    async def tool_route_batch(self, args: Dict[str,Any], session: MCPSession, meta: Dict[str,Any]):
+        messages = args.get("messages")
+        if not isinstance(messages, list):
+            raise RPCError(-32602, "messages must be an array")
+        if len(messages) > self.MAX_ROUTE_BATCH:
+            raise RPCError(-32602, f"too many messages (max {self.MAX_ROUTE_BATCH})")
+        try:
+            payload = await self.bus.route_batch(messages, session.session_id)
+        except ValueError as e:
+            raise RPCError(-32602, str(e))
+        ROUTING_OK.inc(len(messages))
+        return _text(payload)
+
+    async def tool_register_agent(self, args: Dict[str,Any], session: MCPSession, meta: Dict[str,Any]):
+        name = args.get("name")
+        if not isinstance(name, str) or not name:
+            raise RPCError(-32602, "name is required")
+        skills = self._check(args, "skills", dict, "an object of numbers")
+        if skills is not None and not all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in skills.values()):
+            raise RPCError(-32602, "skills must be an object of numbers")
+        payload = await self.bus.register_agent(name, self._strings(args, "capabilities"), skills,
+                                                self._check(args, "max_concurrency", int, "an integer"),
+                                                self._check(args, "base_cost", (int, float), "a number"))
+        return _text(payload)
 
-# ---- HTTP(health/metrics) ----
+    async def tool_agent_heartbeat(self, args: Dict[str,Any], session: MCPSession, meta: Dict[str,Any]):
+        name = args.get("name")
+        if not isinstance(name, str) or not name:
+            raise RPCError(-32602, "name is required")
+        latencies = self._check(args, "latencies_ms", list, "an array of numbers")
+        if latencies is not None and not all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in latencies):
+            raise RPCError(-32602, "latencies_ms must be an array of numbers")
+        payload = await self.bus.agent_heartbeat(name, self._check(args, "inflight", int, "an integer"),
+                                                 self._check(args, "latency_ms", (int, float), "a number"), latencies)
+        return _text(payload)
+
+    @staticmethod
+    def _if_version(args: Dict[str,Any]) -> Optional[int]:
+        v = args.get("if_version")
+        if v is not None and (not isinstance(v, int) or isinstance(v, bool) or v < 0):
+            raise RPCError(-32602, "if_version must be a non-negative integer")
+        return v
+
+    async def tool_share_context(self, args: Dict[str,Any], session: MCPSession, meta: Dict[str,Any]):
+        key = args.get("context_key")
+        if not isinstance(key, str) or not key:
+            raise RPCError(-32602, "context_key is required")
+        try:
+            ttl = args.get("ttl_seconds")
+            if ttl is not None and (not isinstance(ttl, (int, float)) or isinstance(ttl, bool) or ttl <= 0):
+                raise RPCError(-32602, "ttl_seconds must be a positive number")
+            payload = await self.bus.share_context(key, args.get("context_value"), session.session_id,
+                                                   self._if_version(args), ttl)
+        except VersionConflict as e:
+            raise RPCError(-32009, str(e), {"version":e.version})
+        return _text(payload)
+
+    async def tool_patch_context(self, args: Dict[str,Any], session: MCPSession, meta: Dict[str,Any]):
+        key = args.get("context_key"); patch = args.get("patch")
+        if not isinstance(key, str) or not key:
+            raise RPCError(-32602, "context_key is required")
+        kind = args.get("format") or ("json-patch" if isinstance(patch, list) else "merge-patch")
+        if kind not in ("json-patch","merge-patch"):
+            raise RPCError(-32602, f"unknown format {kind}")
+        try:
+            payload = await self.bus.patch_context(key, patch, kind, session.session_id, self._if_version(args))
+        except VersionConflict as e:
+            raise RPCError(-32009, str(e), {"version":e.version})
+        except PatchError as e:
+            raise RPCError(-32602, f"patch failed: {e}")
+        return _text(payload)
+
+    async def tool_upload_blob(self, args: Dict[str,Any], session: MCPSession, meta: Dict[str,Any]):
+        """부분 업로드: upload_id 없이 시작 → 같은 upload_id 로 이어 보내고 final=true(기본) 에서 저장"""
+        blobs = self.bus.ssot.blobs
+        if blobs is None:
+            raise RPCError(-32602, "blob store is not configured")
+        data = args.get("data")
+        if not isinstance(data, str):
+            raise RPCError(-32602, "data must be a string")
+        try:
+            part = base64.b64decode(data, validate=True) if args.get("encoding") == "base64" else data.encode()
+        except ValueError:
+            raise RPCError(-32602, "invalid base64 data")
+        upload_id = self._check(args, "upload_id", str, "a string")
+        mime = self._check(args, "mime_type", str, "a string")
+        if upload_id is None:
+            if len(session.uploads) >= self.max_uploads:
+                raise RPCError(-32000, f"too many uploads in progress (max {self.max_uploads})")
+            upload_id = gen_id("upload"); buf = session.uploads[upload_id] = bytearray()
+        else:
+            buf = session.uploads.get(upload_id)
+            if buf is None:
+                raise RPCError(-32602, f"Unknown upload_id {upload_id}")
+        if len(buf) + len(part) > self.max_blob:
+            session.uploads.pop(upload_id, None)
+            raise RPCError(-32000, f"blob exceeds {self.max_blob} bytes")
+        buf += part
+        if not args.get("final", True):
+            return _text({"upload_id":upload_id,"received":len(buf)})
+        del session.uploads[upload_id]
+        ref = await blobs.put(bytes(buf), mime or ("application/octet-stream" if args.get("encoding") == "base64" else "text/plain"))
+        return _text(ref)
+
+    async def tool_orchestrate_collaboration(self, args: Dict[str,Any], session: MCPSession, meta: Dict[str,Any]):
+        token = meta.get("progressToken")
+        progress = None
+        if token is not None and session.notify is not None:
+            async def progress(done: int, total: int, message: str):
+                notify = session.notify  # 백그라운드 작업: 연결이 끊기면 None
+                if notify is not None:
+                    await notify({"jsonrpc":"2.0","method":"notifications/progress",
+                                  "params":{"progressToken":token,"progress":done,"total":total,"message":message}})
+        task = args.get("task")
+        if not isinstance(task, str):
+            raise RPCError(-32602, "task must be a string")
+        agents = self._strings(args, "agents") or []
+        timeout = self._check(args, "timeout", (int, float), "a number")
+        if timeout is not None and timeout <= 0:
+            raise RPCError(-32602, "timeout must be a positive number")
+        timeout = min(float(timeout or self.JOB_TIMEOUT), self.MAX_JOB_TIMEOUT)
+        try:
+            payload = await self.bus.orchestrate_collaboration(task, agents, session.session_id,
+                                                               steps=self._check(args, "steps", list, "an array"), timeout=timeout, wait=bool(self._check(args, "wait", bool, "a boolean")),
+                                                               progress=progress, owner=self._owner(session))
+        except ValueError as e:
+            raise RPCError(-32602, str(e))
+        return _text(payload)
+
+    async def tool_cancel_collaboration(self, args: Dict[str,Any], session: MCPSession, meta: Dict[str,Any]):
+        job_id = self._check(args, "job_id", str, "a string")
+        return _text({"status":"cancelled" if self.bus.cancel_job(job_id, self._owner(session)) else "not_found","job_id":job_id})
+
+    @staticmethod
+    def _owner(session: MCPSession) -> str:
+        """작업 소유자: 인증된 세션은 tenant 단위, 아니면 세션 단위"""
+        return f"tenant:{session.tenant}" if session.claims else f"session:{session.session_id}"
+
+# ---- HTTP(health/ready/metrics) + /mcp ----
 class HttpApp:
+    """
+    단일 포트 앱: /health, /ready, /metrics (+ ws 지정 시 /mcp WebSocket 업그레이드)
+    - /ready: 시작 완료 + drain 중 아님 + Redis ping 정상(redis 지정 시, ready_interval 마다 확인) → 200, 아니면 503
+    - profile=True(DEBUG_PROFILE=1) 이면 /debug/profile?seconds=10&interval_ms=5 활성화
+      → 이벤트 루프 스레드 샘플링 결과(collapsed stack) 반환. 운영에서는 내부망에서만 열 것
+    """
+    MAX_PROFILE_SECONDS = 60.0
+
+    def __init__(self, profile: bool = False, ws: Optional["MCPWebSocketServer"] = None, redis=None, ready_interval: float = 2.0):
+        self.profile_enabled = profile
+        self.ws = ws
+        self.redis = redis
+        self.ready_interval = ready_interval
+        self.started = False
+        self.redis_ok = redis is None
+        self._profiling = False
+
     async def health(self, request):
         with HTTP_LAT.time():
             HTTP_REQ.labels(request.method,"/health","200").inc()
@@ -206,12 +734,54 @@ class HttpApp:
 
     async def ready(self, request):
         with HTTP_LAT.time():
-            HTTP_REQ.labels(request.method,"/ready","200").inc()
-            return web.json_response({"status":"ready"})
+            draining = self.ws is not None and self.ws.draining
+            ok = self.started and self.redis_ok and not draining
+            body = {"status":"ready" if ok else "draining" if draining else "starting" if not self.started else "degraded",
+                    "redis":None if self.redis is None else self.redis_ok,
+                    "connections":0 if self.ws is None else len(self.ws.conns)}
+            status = 200 if ok else 503
+            HTTP_REQ.labels(request.method,"/ready",str(status)).inc()
+            return web.json_response(body, status=status)
+
+    async def _watch_redis(self, app):
+        """cleanup_ctx: Redis ping 주기 확인 (요청마다 ping 하지 않음)"""
+        async def loop():
+            while True:
+                try:
+                    await asyncio.wait_for(self.redis.ping(), self.ready_interval)
+                    if not self.redis_ok: logger.info("redis reachable, ready")
+                    self.redis_ok = True
+                except Exception as e:
+                    if self.redis_ok: logger.warning(f"redis unreachable, not ready: {e}")
+                    self.redis_ok = False
+                await asyncio.sleep(self.ready_interval)
+        task = asyncio.create_task(loop()) if self.redis is not None else None
+        yield
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
 
     async def metrics(self, request):
-        data = generate_latest()
-        return web.Response(body=data, content_type=CONTENT_TYPE_LATEST)
+        data, content_type = render()
+        return web.Response(body=data, headers={"Content-Type": content_type})
+
+    async def profile(self, request):
+        if not self.profile_enabled:
+            raise web.HTTPNotFound()
+        if self._profiling:
+            return web.json_response({"error":"profile already running"}, status=409)
+        try:
+            seconds = min(max(float(request.query.get("seconds","10")), 0.1), self.MAX_PROFILE_SECONDS)
+            interval = min(max(float(request.query.get("interval_ms","5")), 1.0), 1000.0) / 1000
+        except ValueError:
+            return web.json_response({"error":"invalid seconds or interval_ms"}, status=400)
+        self._profiling = True
+        try:
+            # 샘플러는 별도 스레드, 대상은 이 핸들러를 실행 중인 루프 스레드
+            text = await asyncio.get_running_loop().run_in_executor(None, profiling.sample, seconds, interval, threading.get_ident())
+        finally:
+            self._profiling = False
+        return web.Response(text=text, content_type="text/plain")
 
     def make(self):
         app = web.Application()
@@ -219,68 +789,378 @@ class HttpApp:
             web.get("/health", self.health),
             web.get("/ready", self.ready),
             web.get("/metrics", self.metrics),
+            web.get("/debug/profile", self.profile),
         ])
+        if self.ws is not None:
+            app.add_routes([web.get("/mcp", self.ws.handle)])
+            app.on_shutdown.append(lambda app: self.ws.close_all())
+        app.cleanup_ctx.append(self._watch_redis)
         return app
 
 # ---- WS 서버 ----
+class _Conn:
+    """연결 1개의 수명 관리 상태"""
+    __slots__ = ("ws","session","transport","last_rx","inflight","queue","queued")
+
+    def __init__(self, ws: web.WebSocketResponse, session: MCPSession, transport, now: float, send_queue: int):
+        self.ws = ws; self.session = session; self.transport = transport
+        self.last_rx = now
+        self.inflight: Dict[Any, asyncio.Task] = {}
+        self.queue: "asyncio.Queue" = asyncio.Queue(send_queue)  # (frame, 라벨, 적재 시각)
+        self.queued = 0  # 큐에 있는(미송신) frame 수 — 종료 시 SEND_QUEUE 보정
+
 class MCPWebSocketServer:
-    def __init__(self, bridge: AICPMCPBridge, max_msg_size=1<<20):
+    """
+    세션(소켓) 단위 파이프라인 디스패치 (aiohttp /mcp, HttpApp 과 같은 포트)
+    - 수신 메시지를 id 기준 태스크로 동시 처리 (세션당 max_inflight 상한)
+    - 응답은 완료 순서대로 단일 writer 태스크가 송신 (send_queue 프레임 상한 = 백프레셔)
+    - max_inflight=1 이면 기존과 같은 직렬 처리
+    - 연결 수명 관리
+        max_connections : 초과하면 업그레이드 전에 503 (0=무제한). drain 중에도 503
+        idle_timeout    : 그 시간 동안 요청이 없으면 1001 종료 (처리 중 요청/구독이 있는 세션 제외, 0=끔)
+        send_timeout    : 프레임 1개 송신(소켓 버퍼 drain 포함)이 더 걸리면 느린 클라이언트로 보고 1013 종료 (0=끔)
+        write_buffer    : 소켓 송신 버퍼 high-water(바이트). 넘으면 writer 가 drain 까지 대기
+        heartbeat       : ping 간격(초), 응답 없으면 종료 (0=끔)
+        compress        : permessage-deflate 협상 허용 (협상되면 모든 프레임 압축, aiohttp 기본 동작)
+    - drain: listening 소켓을 먼저 닫아(SO_REUSEPORT 면 커널이 새 연결을 다른 워커로) 기존 세션 종료를 기다림
+    """
+    def __init__(self, bridge: AICPMCPBridge, max_msg_size=1<<20, max_inflight: int = 32, send_queue: int = 64,
+                 max_connections: int = 0, idle_timeout: float = 0.0, send_timeout: float = 30.0,
+                 write_buffer: int = 256 << 10, heartbeat: float = 30.0, compress: bool = False):
         self.bridge = bridge
         self.max_msg_size = max_msg_size
+        self.max_inflight = max(1, max_inflight)
+        self.send_queue = max(1, send_queue)
+        self.max_connections = max_connections
+        self.idle_timeout = idle_timeout
+        self.send_timeout = send_timeout
+        self.write_buffer = write_buffer
+        self.heartbeat = heartbeat
+        self.compress = compress
+        self.conns: Dict[str, _Conn] = {}
+        self.draining = False
+        self._reaper: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def _frame(resp: Any, session: MCPSession) -> Union[str,bytes]:
+        data = codec.encode_response(resp)
+        return data if session.binary_frames else data.decode()
+
+    @staticmethod
+    async def _enqueue(conn: _Conn, data: Union[str,bytes], label: str) -> None:
+        await conn.queue.put((data, label, time.perf_counter()))
+        conn.queued += 1; SEND_QUEUE.inc()
+
+    async def _writer(self, conn: _Conn):
+        ws = conn.ws
+        while True:
+            data, label, t = await conn.queue.get()
+            conn.queued -= 1; SEND_QUEUE.dec()
+            try:
+                async with asyncio.timeout(self.send_timeout or None):
+                    if isinstance(data, bytes): await ws.send_bytes(data)
+                    else: await ws.send_str(data)
+            except TimeoutError:
+                WS_EVICTED.labels("slow").inc()
+                logger.info(f"ws_evict session={conn.session.session_id} reason=slow")
+                await self._evict(conn, 1013, "slow consumer")
+                break
+            except ConnectionResetError:
+                break
+            observe_phase(label, "", "send", time.perf_counter() - t)
+        # 송신 불가 → 큐 적재 대기 중인 요청 취소 (슬롯 반환, 수신 루프가 종료를 감지하도록)
+        for task in list(conn.inflight.values()): task.cancel()
+
+    async def _call(self, msg: Any, session: MCPSession, slots: asyncio.Semaphore, received: float, element: bool = False) -> Any:
+        """element=True: 배치 요소 → handle_one (중첩 배열은 HTTP 경로와 같이 -32600)"""
+        observe_phase(self.bridge.label(msg), "", "queue", time.perf_counter() - received)
+        try:
+            return await (self.bridge.handle_one(msg, session) if element else self.bridge.handle(msg, session))
+        finally:
+            slots.release()
+
+    async def _dispatch(self, msg: Any, conn: _Conn, slots: asyncio.Semaphore, received: float):
+        resp = await self._call(msg, conn.session, slots, received)
+        if resp is not None:
+            await self._enqueue(conn, self._frame(resp, conn.session), self.bridge.label(msg))
+
+    async def _batch(self, parts: List[asyncio.Task], conn: _Conn):
+        """배치 요소(각자 슬롯 1개)가 모두 끝나면 응답 배열 1개로 송신"""
+        out = [r for r in await asyncio.gather(*parts, return_exceptions=True) if isinstance(r, dict)]
+        if out: await self._enqueue(conn, self._frame(out, conn.session), "batch")
 
-    async def handler(self, websocket: WebSocketServerProtocol, path: str):
+    @staticmethod
+    def _track(inflight: Dict[Any, asyncio.Task], msg: Any, task: asyncio.Task) -> asyncio.Task:
+        key = msg.get("id") if isinstance(msg, dict) and msg.get("id") is not None else id(task)
+        inflight[key] = task
+        task.add_done_callback(lambda t, k=key: inflight.pop(k, None) if inflight.get(k) is t else None)
+        return task
+
+    def _reject(self, reason: str, status: int, message: str) -> web.Response:
+        WS_REJECTED.labels(reason).inc()
+        return web.json_response({"error":message}, status=status, headers={"Retry-After":"1"} if status == 503 else None)
+
+    async def handle(self, request: web.Request) -> web.StreamResponse:
+        """GET /mcp → WebSocket 세션"""
+        if self.draining:
+            return self._reject("draining", 503, "server is draining")
+        if self.max_connections and len(self.conns) >= self.max_connections:
+            return self._reject("max_connections", 503, "too many connections")
+        ws = web.WebSocketResponse(max_msg_size=self.max_msg_size, heartbeat=self.heartbeat or None, compress=self.compress)
+        if not ws.can_prepare(request).ok:
+            return self._reject("not_websocket", 426, "websocket upgrade required")
         session_id = f"sess-{os.urandom(4).hex()}"
+        session = MCPSession(session_id=session_id, limiter=self.bridge.limits.session_bucket())
+        if self.bridge.auth is not None and request.headers.get("Authorization"):
+            try:
+                await self.bridge.authenticate(session, request.headers["Authorization"])
+            except RPCError as e:
+                logger.info(f"ws_reject session={session_id} {e.message}")
+                return self._reject("unauthorized", 401, "unauthorized")
+        await ws.prepare(request)
+        transport = request.transport
+        if transport is not None: transport.set_write_buffer_limits(high=self.write_buffer)
+        loop = asyncio.get_running_loop()
+        conn = self.conns[session_id] = _Conn(ws, session, transport, loop.time(), self.send_queue)
+        if self.idle_timeout and self._reaper is None: self._reaper = asyncio.create_task(self._reap())
         WS_CONNS.inc()
-        session = MCPSession(session_id=session_id)
-        logger.info(f"ws_open session={session_id} path={path}")
+        logger.info(f"ws_open session={session_id} path={request.path}")
+        slots = asyncio.Semaphore(self.max_inflight)
+        inflight = conn.inflight
+        writer = asyncio.create_task(self._writer(conn))
+        async def notify(msg: Dict[str,Any]):
+            await self._enqueue(conn, self._frame(msg, session), msg.get("method") or "notification")
+        session.notify = notify
         try:
-            async for raw in websocket:
+            async for m in ws:
+                if m.type == WSMsgType.TEXT:
+                    raw = m.data
+                elif m.type == WSMsgType.BINARY:
+                    raw = m.data; session.binary_frames = True  # 클라이언트가 binary 프레임을 보내면 binary 로 응답
+                else:
+                    break
+                received = time.perf_counter()
+                conn.last_rx = loop.time()
+                if writer.done(): break
                 if len(raw) > self.max_msg_size:
-                    await websocket.send(json.dumps(MCPMessage(error={"code":-32000,"message":"message too large"}).to_dict(), ensure_ascii=False))
+                    await self._enqueue(conn, self._frame(MCPMessage(error={"code":-32000,"message":"message too large"}).to_dict(), session), "invalid")
                     continue
-                msg = json.loads(raw)
-                resp = await self.bridge.handle(msg, session)
-                await websocket.send(json.dumps(resp, ensure_ascii=False))
-        except websockets.ConnectionClosed:
-            pass
+                try:
+                    msg = codec.loads(raw)
+                except ValueError:
+                    await self._enqueue(conn, self._frame(MCPMessage(error={"code":-32700,"message":"Parse error"}).to_dict(), session), "invalid")
+                    continue
+                # MCP 취소 알림: 해당 요청 태스크 취소 (응답 없음)
+                if isinstance(msg, dict) and msg.get("method") == "notifications/cancelled":
+                    t = inflight.get((msg.get("params") or {}).get("requestId"))
+                    if t is not None: t.cancel()
+                    continue
+                # 상한 도달 시 다음 프레임을 읽지 않음 → TCP 레벨 백프레셔
+                # 배치는 요소마다 슬롯 1개 → 배치 안의 호출도 max_inflight 에 포함
+                if isinstance(msg, list) and 0 < len(msg) <= self.bridge.max_batch:
+                    parts = []
+                    for m in msg:
+                        await slots.acquire()
+                        parts.append(self._track(inflight, m, asyncio.create_task(self._call(m, session, slots, received, True))))
+                    self._track(inflight, None, asyncio.create_task(self._batch(parts, conn)))
+                    continue
+                await slots.acquire()
+                self._track(inflight, msg, asyncio.create_task(self._dispatch(msg, conn, slots, received)))
         finally:
+            for t in list(inflight.values()): t.cancel()
+            if inflight: await asyncio.gather(*inflight.values(), return_exceptions=True)
+            self.bridge.subs.drop(session_id)
+            session.notify = None  # 백그라운드 작업의 진행 알림 중단
+            writer.cancel()
+            await asyncio.gather(writer, return_exceptions=True)
+            SEND_QUEUE.dec(conn.queued)  # 송신 못 한 frame
+            self.conns.pop(session_id, None)
             WS_CONNS.dec()
-            logger.info(f"ws_close session={session_id}")
+            logger.info(f"ws_close session={session_id} code={ws.close_code}")
+        return ws
 
-# ---- 메인 실행 ----
-async def _run_http(port: int):
-    app = HttpApp().make()
-    runner = web.AppRunner(app); await runner.setup()
-    site = web.TCPSite(runner, "0.0.0.0", port); await site.start()
+    async def _evict(self, conn: _Conn, code: int, reason: str) -> None:
+        """close 프레임 송신 시도(최대 1초) 후에도 안 닫히면 소켓 강제 종료"""
+        try:
+            async with asyncio.timeout(1.0):
+                await conn.ws.close(code=code, message=reason.encode())
+            return
+        except Exception:
+            pass
+        if conn.transport is not None: conn.transport.abort()
 
-async def main():
+    async def _reap(self) -> None:
+        """idle_timeout 동안 요청이 없는 연결 종료 (처리 중 요청 또는 구독이 있으면 유지)"""
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(min(5.0, self.idle_timeout / 4))
+            cutoff = loop.time() - self.idle_timeout
+            idle = [c for c in self.conns.values() if c.last_rx < cutoff and not c.inflight and c.session.session_id not in self.bridge.subs.subs]
+            for c in idle:
+                c.last_rx = loop.time()  # 종료 진행 중 재선정 방지
+                WS_EVICTED.labels("idle").inc()
+                logger.info(f"ws_evict session={c.session.session_id} reason=idle")
+                asyncio.create_task(self._evict(c, 1001, "idle timeout"))
+
+    async def drain(self, timeout: float, sites: Iterable[web.BaseSite] = ()) -> None:
+        """listening 소켓 닫기(sites) + 새 업그레이드 503 → 기존 연결이 스스로 닫히길 timeout 초 대기 → 남은 연결 1001 종료"""
+        self.draining = True
+        for site in sites: await site.stop()  # 기존 연결은 유지됨
+        logger.info(f"draining: {len(self.conns)} open sockets, timeout={timeout}s")
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while self.conns and loop.time() < deadline:
+            await asyncio.sleep(0.2)
+        await self.close_all()
+
+    async def close_all(self) -> None:
+        if self._reaper is not None:
+            self._reaper.cancel()
+            await asyncio.gather(self._reaper, return_exceptions=True)
+            self._reaper = None
+        if self.conns:
+            await asyncio.gather(*(self._evict(c, 1001, "server shutdown") for c in list(self.conns.values())), return_exceptions=True)
+
+# ---- 메인 실행 ----
+async def main(reuse_port: bool = False, on_ready: Optional[Callable[[], None]] = None):
+    """
+    reuse_port: SO_REUSEPORT 로 바인딩 (멀티 워커, aicp.supervisor)
+    단일 aiohttp 스택: PORT 하나에서 /mcp(WebSocket) + /health /ready /metrics /debug/profile
+    (HTTP_PORT 를 PORT 와 다르게 지정하면 같은 앱을 그 포트에도 추가로 바인딩 — 기존 배포 호환용)
+    SIGTERM/SIGINT 수신 시 drain: listening 소켓 닫기 → 기존 소켓 종료 대기(DRAIN_TIMEOUT) → 남은 연결 1001 종료
+    """
     host = os.getenv("HOST","0.0.0.0")
-    ws_port = int(os.getenv("PORT","8765"))
-    http_port = int(os.getenv("HTTP_PORT","8080"))
+    port = int(os.getenv("PORT","8765"))
+    http_port = int(os.getenv("HTTP_PORT") or port)
     redis_url = os.getenv("REDIS_URL")  # 없으면 메모리 SSoT 사용
 
     # Redis 연결 시도
     redis_client = None
     if redis_url and Redis:
         try:
-            redis_client = Redis.from_url(redis_url, decode_responses=True)
+            redis_client = instrument_redis(Redis.from_url(redis_url, decode_responses=True))
             await redis_client.ping()
             logger.info(f"Redis connected: {redis_url}")
         except Exception as e:
             logger.warning(f"Redis disabled (connection failed): {e}")
             redis_client = None
 
-    ssot = SharedState(redis=redis_client)
-    bus = NeuralBusMCP(ssot)
-    bridge = AICPMCPBridge(bus)
+    # 로컬 읽기 캐시 (Redis 사용 시, STATE_CACHE_MB=0 이면 비활성)
+    cache_mb = float(os.getenv("STATE_CACHE_MB","0"))
+    cache = LocalCache(max_bytes=int(cache_mb*(1<<20)), ttl=float(os.getenv("STATE_CACHE_TTL","30"))) if cache_mb > 0 else None
+    # Redis 없을 때 내장 저장소: 바이트 상한(STATE_MEM_MAX_MB, 0=무제한) + 축출 정책, STATE_MEM_PATH 지정 시 로그/스냅샷 영속화
+    mem = None
+    if not redis_client:
+        mem = MemoryStore(max_bytes=int(float(os.getenv("STATE_MEM_MAX_MB","0"))*(1<<20)),
+                          policy=os.getenv("STATE_MEM_POLICY","lru"),
+                          path=os.getenv("STATE_MEM_PATH") or None,
+                          fsync=os.getenv("STATE_MEM_FSYNC","everysec"))
+        mem.load()
+    # 블롭 저장소: BLOB_DIR(로컬 디스크) 또는 Redis(바이너리 클라이언트). BLOB_THRESHOLD_KB 넘는 값은 자동 분리
+    blobs = None
+    if os.getenv("BLOB_DIR"):
+        blobs = BlobStore(directory=os.environ["BLOB_DIR"])
+    elif redis_client:
+        blobs = BlobStore(redis=instrument_redis(Redis.from_url(redis_url)))
+    # write-behind (Redis 사용 시, STATE_WRITE_BEHIND_MS=0 이면 비활성)
+    ssot = SharedState(redis=redis_client, cache=cache, mem=mem,
+                       write_window=float(os.getenv("STATE_WRITE_BEHIND_MS","0"))/1000,
+                       write_ack=os.getenv("STATE_WRITE_ACK","flush"),
+                       write_buffer=int(os.getenv("STATE_WRITE_BUFFER_KEYS","10000")),
+                       blobs=blobs, blob_threshold=int(float(os.getenv("BLOB_THRESHOLD_KB","0"))*1024),
+                       blob_gc_interval=float(os.getenv("BLOB_GC_INTERVAL","3600")))
+    await ssot.start()
+    # 라우팅 이력: 링버퍼 + (옵션) Postgres state_logs / 로컬 파일로 배치 저장
+    sink = None
+    if os.getenv("POSTGRES_URL"):
+        try:
+            sink = PostgresSink(os.environ["POSTGRES_URL"])
+        except RuntimeError as e:
+            logger.warning(f"routing history spill disabled: {e}")
+    elif os.getenv("ROUTING_HISTORY_FILE"):
+        sink = FileSink(os.environ["ROUTING_HISTORY_FILE"])
+    history = RoutingHistory(capacity=int(os.getenv("ROUTING_HISTORY_SIZE","10000")), sink=sink)
+    await history.start()
+
+    # 라우팅 캐시 (ROUTE_CACHE_SIZE=0 이면 비활성, ROUTE_CACHE_MIN_CHARS 미만 메시지는 캐시 미사용)
+    route_cache = None
+    if int(os.getenv("ROUTE_CACHE_SIZE","0")) > 0:
+        route_cache = RoutingCache(capacity=int(os.environ["ROUTE_CACHE_SIZE"]), ttl=float(os.getenv("ROUTE_CACHE_TTL","300")),
+                                   min_length=int(os.getenv("ROUTE_CACHE_MIN_CHARS","256")))
+    bus = NeuralBusMCP(ssot, history=history, route_cache=route_cache)
+    await bus.agent_registry.start()
+    tenant_rate = float(os.getenv("TENANT_RATE_PER_SEC","0"))
+    limits = RateLimits(
+        session=(float(os.getenv("RATE_PER_SEC","10")), int(os.getenv("RATE_BURST","20"))),
+        tenant=(tenant_rate, int(os.getenv("TENANT_RATE_BURST","100"))) if tenant_rate > 0 else None,
+        tools=RateLimits.parse_tools(os.getenv("TOOL_RATE_LIMITS","")),
+        redis=redis_client,
+        mode=os.getenv("RATE_LIMIT_MODE","wait"),
+        max_wait=float(os.getenv("RATE_MAX_WAIT","2")),
+    )
+    auth = TokenVerifier.from_env()  # JWT_REQUIRED=true 일 때만
+    if auth is not None:
+        logger.info(f"JWT auth enabled algorithms={auth.algorithms} offload={auth.offload}")
+    # resources/subscribe: 변경 푸시 (Redis 사용 시 레플리카 간 pub/sub)
+    subs = SubscriptionHub(ssot, max_keys=int(os.getenv("SUBSCRIPTION_QUEUE_KEYS","1000")))
+    await subs.start()
+    bridge = AICPMCPBridge(bus, limits=limits, auth=auth, subs=subs, tracer=Tracer.from_env(),
+                           max_blob=int(float(os.getenv("BLOB_MAX_MB","64"))*(1<<20)),
+                           max_uploads=int(os.getenv("BLOB_MAX_UPLOADS","4")))
 
-    asyncio.create_task(_run_http(http_port))
+    # 연결 수명 관리 (0 = 해당 기능 끔)
+    server = MCPWebSocketServer(bridge,
+                                max_inflight=int(os.getenv("MCP_MAX_INFLIGHT","32")),
+                                max_connections=int(os.getenv("WS_MAX_CONNECTIONS","0")),
+                                idle_timeout=float(os.getenv("WS_IDLE_TIMEOUT","0")),
+                                send_timeout=float(os.getenv("WS_SEND_TIMEOUT","30")),
+                                write_buffer=int(float(os.getenv("WS_SEND_BUFFER_KB","256"))*1024),
+                                heartbeat=float(os.getenv("WS_PING_INTERVAL","30")),
+                                compress=os.getenv("WS_COMPRESS","0").lower() in ("1","true","yes"))
+    http = HttpApp(profile=os.getenv("DEBUG_PROFILE","0").lower() in ("1","true","yes"), ws=server, redis=redis_client)
+    runner = web.AppRunner(http.make(), access_log=None, shutdown_timeout=1.0)
+    await runner.setup()
+    backlog = int(os.getenv("LISTEN_BACKLOG","1024"))
+    for p in dict.fromkeys((port, http_port)):
+        await web.TCPSite(runner, host, p, reuse_port=reuse_port or None, backlog=backlog).start()
+    http.started = True
 
-    logger.info(f"Starting AICP-MCP Server on {host}:{ws_port}")
-    logger.info(f"MCP endpoint: ws://{host}:{ws_port}/mcp")  # f-string 고정
+    logger.info(f"Starting AICP-MCP Server on {host}:{port}")
+    logger.info(f"MCP endpoint: ws://{host}:{port}/mcp")  # f-string 고정
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:  # Windows
+            pass
+
+    try:
+        if on_ready: on_ready()
+        await stop.wait()
+        await server.drain(float(os.getenv("DRAIN_TIMEOUT","30")), runner.sites)
+    finally:
+        await runner.cleanup()
+    # 이하 종료 정리
+    await history.close()
+    await bus.agent_registry.close()
+    await subs.close()
+    await ssot.close()
+    if auth is not None: auth.close()
+    logger.info("stopped")
+
+def _install_uvloop() -> None:
+    if os.getenv("UVLOOP","0").lower() in ("1","true","yes"):
+        try:
+            import uvloop
+            uvloop.install()
+        except ImportError:
+            logger.warning("UVLOOP requested but uvloop is not installed")
 
-    async with websockets.serve(MCPWebSocketServer(bridge).handler, host, ws_port, max_size=1<<20):
-        await asyncio.Future()
+def run(reuse_port: bool = False, on_ready: Optional[Callable[[], None]] = None) -> None:
+    _install_uvloop()
+    asyncio.run(main(reuse_port=reuse_port, on_ready=on_ready))
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    run()
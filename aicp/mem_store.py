@@ -0,0 +1,317 @@
+# aicp/mem_store.py
+"""
+내장 메모리 저장소 (REDIS_URL 없을 때 SharedState 백엔드)
+- 키별 TTL (접근 시 지연 만료 + 만료 힙 주기 정리)
+- 전체 바이트 상한 + 축출 정책: lru | lfu (LRU 꼬리 lfu_sample 개 중 적중 수 최소)
+- 버전 스냅샷: 키 목록만 복사, 스냅샷 이후 바뀐 값은 변경 시점에 이전 엔트리를 보관(undo) → 값 전체 복사 없음
+- 영속화(path 지정 시): append-only 로그 세그먼트(<path>.NNNNNN.aof) + 주기적 압축 스냅샷(<path>.snap)
+  시작 시 스냅샷 → 그 이후 세그먼트 순으로 재생. fsync: always | everysec | no
+  파일은 프로세스 1개 전용(<path>.lock). 멀티 워커는 Redis 사용 — 잠금을 못 얻으면 영속화 없이 동작
+"""
+import os, time, fcntl, heapq, asyncio, logging
+from collections import OrderedDict
+from itertools import islice
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+from . import codec
+from .metrics import MEM_KEYS, MEM_BYTES, MEM_REMOVED
+
+logger = logging.getLogger("AICP-MEMSTORE")
+
+_ENTRY_OVERHEAD = 120  # 엔트리 객체 + dict 슬롯 근사치
+
+class Entry:
+    __slots__ = ("value","expires","size","version","seq","hits")
+
+    def __init__(self, value: str, expires: Optional[float], size: int, version: int, seq: int):
+        self.value = value; self.expires = expires; self.size = size
+        self.version = version; self.seq = seq; self.hits = 0
+
+class Snapshot:
+    """seq 시점의 일관된 보기. with 블록/close() 로 해제해야 undo 보관이 멈춤"""
+    def __init__(self, store: "MemoryStore"):
+        self.store = store
+        self.seq = store.seq
+        self.keys: List[str] = list(store.data)
+        self.undo: Dict[str, Entry] = {}
+        self.at = time.time()
+
+    def get(self, key: str) -> Optional[Entry]:
+        e = self.undo.get(key)
+        if e is None:
+            e = self.store.data.get(key)
+            if e is None or e.seq > self.seq: return None
+        return None if e.expires is not None and e.expires <= self.at else e
+
+    def items(self, start: int = 0) -> Iterator[Tuple[str, str]]:
+        for k in islice(self.keys, start, None):
+            e = self.get(k)
+            if e is not None: yield k, e.value
+
+    def close(self) -> None:
+        self.store.snapshots.discard(self)
+
+    def __enter__(self): return self
+    def __exit__(self, *exc): self.close()
+
+class MemoryStore:
+    def __init__(self, max_bytes: int = 0, policy: str = "lru", path: Optional[str] = None, fsync: str = "everysec",
+                 compact_min_bytes: int = 64 << 20, lfu_sample: int = 16):
+        if policy not in ("lru","lfu"): raise ValueError(f"unknown eviction policy {policy!r}")
+        if fsync not in ("always","everysec","no"): raise ValueError(f"unknown fsync mode {fsync!r}")
+        self.max_bytes = max_bytes  # 0 = 무제한
+        self.policy = policy
+        self.lfu_sample = lfu_sample
+        self.data: "OrderedDict[str, Entry]" = OrderedDict()
+        self.bytes = 0
+        self.seq = 0
+        self.snapshots: Set[Snapshot] = set()
+        self._expiry: List[Tuple[float, str, int]] = []  # (만료 시각, 키, seq) 지연 삭제 힙
+        self.evictions = 0
+        self.on_remove: Optional[Callable[[str], None]] = None  # 삭제/만료/축출 시 fn(key)
+        # 영속화
+        self.path = path
+        self.fsync = fsync
+        self.compact_min_bytes = compact_min_bytes
+        self._segment = 0
+        self._log = None
+        self._lock = None
+        self._log_bytes = 0
+        self._snap_bytes = 0
+        self._dirty = False
+        self._compacting: Optional[asyncio.Task] = None
+        self._task: Optional[asyncio.Task] = None
+
+    # ---- 조회 ----
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def _live(self, key: str, now: Optional[float] = None) -> Optional[Entry]:
+        e = self.data.get(key)
+        if e is not None and e.expires is not None and e.expires <= (now or time.time()):
+            self._remove(key, log=True); return None
+        return e
+
+    def get(self, key: str) -> Optional[str]:
+        e = self._live(key)
+        if e is None: return None
+        e.hits += 1
+        if self.max_bytes: self.data.move_to_end(key)  # 상한 없으면 삽입 순서 유지 (page 커서 안정)
+        return e.value
+
+    def entry(self, key: str) -> Optional[Entry]:
+        return self._live(key)
+
+    def version(self, key: str) -> int:
+        e = self._live(key)
+        return e.version if e is not None else 0
+
+    def snapshot(self) -> Snapshot:
+        snap = Snapshot(self)
+        self.snapshots.add(snap)
+        return snap
+
+    def page(self, start: int, limit: int) -> Tuple[Dict[str, str], Optional[int]]:
+        """삽입/최근 사용 순 오프셋 페이지 → (items, 다음 오프셋 | None)"""
+        now = time.time(); out: Dict[str, str] = {}; i = start
+        for i, (k, e) in enumerate(islice(self.data.items(), start, start + limit), start + 1):
+            if e.expires is None or e.expires > now: out[k] = e.value
+        return out, (i if i < len(self.data) else None)
+
+    # ---- 쓰기 ----
+    def set(self, key: str, value: str, ttl: Optional[float] = None, version: Optional[int] = None,
+            keep_ttl: bool = False) -> int:
+        """→ 새 버전 (지정 없으면 현재 버전 + 1). keep_ttl 이면 기존 만료 시각 유지"""
+        old = self._live(key)
+        if version is None: version = (old.version if old is not None else 0) + 1
+        expires = time.time() + ttl if ttl else (old.expires if keep_ttl and old is not None else None)
+        self._put(key, value, expires, version)
+        self._append(["s", key, value, expires, version])
+        self.expire()
+        self._evict()
+        return version
+
+    def delete(self, key: str) -> bool:
+        if key not in self.data: return False
+        self._remove(key, log=True)
+        return True
+
+    def _put(self, key: str, value: str, expires: Optional[float], version: int) -> None:
+        self._preserve(key)
+        old = self.data.get(key)
+        if old is not None: self.bytes -= old.size
+        self.seq += 1
+        e = self.data[key] = Entry(value, expires, len(key) + len(value) + _ENTRY_OVERHEAD, version, self.seq)
+        if self.max_bytes: self.data.move_to_end(key)
+        self.bytes += e.size
+        if expires is not None: heapq.heappush(self._expiry, (expires, key, e.seq))
+
+    def _remove(self, key: str, log: bool) -> None:
+        self._preserve(key)
+        e = self.data.pop(key, None)
+        if e is None: return
+        self.bytes -= e.size
+        self.seq += 1
+        if log: self._append(["d", key])
+        if self.on_remove is not None: self.on_remove(key)
+
+    def _preserve(self, key: str) -> None:
+        """열린 스냅샷이 보는 엔트리를 바꾸기 전에 보관 (엔트리 객체는 교체만 하므로 참조 보관으로 충분)"""
+        if not self.snapshots: return
+        e = self.data.get(key)
+        if e is None: return
+        for snap in self.snapshots:
+            if e.seq <= snap.seq and key not in snap.undo: snap.undo[key] = e
+
+    def expire(self, budget: int = 64) -> int:
+        """만료 힙에서 최대 budget 개 정리"""
+        now = time.time(); n = 0
+        while self._expiry and self._expiry[0][0] <= now and n < budget:
+            _, key, seq = heapq.heappop(self._expiry)
+            e = self.data.get(key)
+            if e is not None and e.seq == seq:
+                self._remove(key, log=True); n += 1
+        if n: MEM_REMOVED.labels("ttl").inc(n)
+        return n
+
+    def _evict(self) -> None:
+        if not self.max_bytes: return
+        while self.bytes > self.max_bytes and self.data:
+            if self.policy == "lfu":
+                # 방금 쓴 키(꼬리)는 적중 0 이라 표본에서 제외
+                sample = islice(self.data.items(), max(1, min(self.lfu_sample, len(self.data) - 1)))
+                victim = min(sample, key=lambda kv: kv[1].hits)[0]
+            else:
+                victim = next(iter(self.data))
+            self._remove(victim, log=True)
+            self.evictions += 1; MEM_REMOVED.labels(self.policy).inc()
+
+    # ---- 영속화 ----
+    def _seg_path(self, n: int) -> str:
+        return f"{self.path}.{n:06d}.aof"
+
+    def _segments(self) -> List[int]:
+        d, base = os.path.split(os.path.abspath(self.path))
+        out = []
+        for f in os.listdir(d or "."):
+            if f.startswith(base + ".") and f.endswith(".aof"):
+                mid = f[len(base) + 1:-4]
+                if mid.isdigit(): out.append(int(mid))
+        return sorted(out)
+
+    def _apply(self, rec: List[Any], now: float) -> None:
+        if rec[0] == "s":
+            _, key, value, expires, version = rec
+            if expires is not None and expires <= now:
+                self._remove(key, log=False)
+            else:
+                self._put(key, value, expires, version)
+        elif rec[0] == "d":
+            self._remove(rec[1], log=False)
+
+    def load(self) -> None:
+        """스냅샷 + 이후 세그먼트 재생, 새 세그먼트 열기 (동기, 시작 시 1회)"""
+        if not self.path: return
+        t0 = time.monotonic(); now = time.time(); covered = 0; n = 0
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._lock = open(self.path + ".lock", "a")
+        try:
+            fcntl.flock(self._lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            logger.warning(f"{self.path} is locked by another process, running without persistence")
+            self._lock.close(); self._lock = None; self.path = None
+            return
+        snap = self.path + ".snap"
+        if os.path.exists(snap):
+            with open(snap, "rb") as f:
+                header = f.readline()
+                if header: covered = codec.loads(header)[1]
+                for line in f:
+                    self._apply(codec.loads(line), now); n += 1
+            self._snap_bytes = os.path.getsize(snap)
+        segments = self._segments()
+        for seg in segments:
+            if seg <= covered:
+                os.remove(self._seg_path(seg)); continue
+            with open(self._seg_path(seg), "rb") as f:
+                for line in f:
+                    try:
+                        rec = codec.loads(line)
+                    except ValueError:
+                        logger.warning(f"truncated record in {self._seg_path(seg)}, stopping replay of this segment")
+                        break
+                    self._apply(rec, now); n += 1
+        self._evict()
+        self._segment = max([covered] + segments) + 1
+        self._log = open(self._seg_path(self._segment), "ab")
+        self._log_bytes = sum(os.path.getsize(self._seg_path(s)) for s in self._segments() if s < self._segment)
+        logger.info(f"memory store loaded {len(self.data)} keys ({n} records) in {(time.monotonic()-t0)*1000:.0f}ms")
+
+    def _append(self, rec: List[Any]) -> None:
+        if self._log is None: return
+        line = codec.dumpb(rec) + b"\n"
+        self._log.write(line)
+        self._log_bytes += len(line)
+        if self.fsync == "always":
+            self._log.flush(); os.fsync(self._log.fileno())
+        else:
+            self._dirty = True
+
+    def _sync(self) -> None:
+        if self._log is not None and self._dirty:
+            self._dirty = False
+            self._log.flush()
+            if self.fsync != "no": os.fsync(self._log.fileno())
+
+    def _write_snapshot(self, snap: Snapshot, covered: int) -> int:
+        """(스레드) 스냅샷 파일 작성 후 원자적 교체, covered 이하 세그먼트 삭제 → 파일 크기"""
+        tmp = self.path + ".snap.tmp"
+        with open(tmp, "wb") as f:
+            f.write(codec.dumpb(["h", covered]) + b"\n")
+            for k in snap.keys:
+                e = snap.get(k)
+                if e is not None: f.write(codec.dumpb(["s", k, e.value, e.expires, e.version]) + b"\n")
+            f.flush(); os.fsync(f.fileno())
+        os.replace(tmp, self.path + ".snap")
+        for seg in self._segments():
+            if seg <= covered: os.remove(self._seg_path(seg))
+        return os.path.getsize(self.path + ".snap")
+
+    async def compact(self) -> None:
+        """새 세그먼트로 전환 + 그 시점 스냅샷을 스레드에서 기록 (이벤트 루프는 키 목록 복사만)"""
+        if self._log is None: return
+        self._sync(); self._log.close()
+        covered = self._segment
+        self._segment += 1
+        self._log = open(self._seg_path(self._segment), "ab")
+        self._log_bytes = 0
+        with self.snapshot() as snap:
+            self._snap_bytes = await asyncio.to_thread(self._write_snapshot, snap, covered)
+
+    async def _maintain(self) -> None:
+        while True:
+            await asyncio.sleep(1.0)
+            try:
+                while self.expire(1024) == 1024: await asyncio.sleep(0)
+                self._sync()
+                MEM_KEYS.set(len(self.data)); MEM_BYTES.set(self.bytes)
+                if self._log_bytes > max(self.compact_min_bytes, 2 * self._snap_bytes) and (self._compacting is None or self._compacting.done()):
+                    self._compacting = asyncio.create_task(self.compact())
+            except Exception as e:
+                logger.warning(f"memory store maintenance failed: {e}")
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._maintain())
+
+    async def close(self) -> None:
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._compacting: await asyncio.gather(self._compacting, return_exceptions=True)
+        if self._log is not None:
+            self._dirty = True; self._sync()
+            self._log.close(); self._log = None
+        if self._lock is not None:
+            self._lock.close(); self._lock = None
@@ -0,0 +1,156 @@
+# aicp/metrics.py
+"""
+Prometheus 메트릭 정의 (프로세스 전체에서 이 모듈만 등록 → 이름 중복 없음)
+- RPC 단계별 지연: method × tool × phase(queue | limiter | handler | send)
+    queue   : 프레임 수신 → 디스패치 시작 (세션 max_inflight 대기)
+    limiter : 세션/테넌트/도구 레이트리밋 대기
+    handler : 메서드/도구 실행 (버스, SharedState, Redis 포함)
+    send    : 응답 큐 적재 → 소켓 송신 완료 (느린 클라이언트/백프레셔)
+- Redis 명령 지연: instrument_redis(client)
+- 샘플링 트레이스: Tracer (opentelemetry 설치 시 OTel span, 아니면 JSON 로그)
+"""
+import os, time, random, logging
+from typing import Any, Dict, Optional, Tuple
+
+from prometheus_client import Counter, Histogram, Gauge, CollectorRegistry, generate_latest, multiprocess, CONTENT_TYPE_LATEST
+try:
+    from opentelemetry import trace as otel_trace  # optional
+except Exception:
+    otel_trace = None  # type: ignore
+from . import codec
+
+# ---- HTTP / 연결 ----
+HTTP_REQ = Counter("aicp_http_requests_total","HTTP requests",["method","path","status"])
+HTTP_LAT = Histogram("aicp_http_latency_seconds","HTTP latency seconds")
+WS_CONNS = Gauge("aicp_ws_connections","Active WS connections",multiprocess_mode="livesum")
+WS_REJECTED = Counter("aicp_ws_rejected_total","WS upgrades refused before the handshake",["reason"])  # draining | max_connections | unauthorized | not_websocket
+WS_EVICTED = Counter("aicp_ws_evicted_total","WS connections closed by the server",["reason"])  # idle | slow
+ROUTING_OK = Counter("aicp_routing_success_total","Routing success")
+ERRORS = Counter("aicp_errors_total","Errors",["kind"])
+
+# ---- JSON-RPC ----
+_BUCKETS = (.0001,.00025,.0005,.001,.0025,.005,.01,.025,.05,.1,.25,.5,1,2.5,5,10,30)
+RPC_LAT = Histogram("aicp_rpc_phase_seconds","JSON-RPC latency by phase",["method","tool","phase"],buckets=_BUCKETS)
+RPC_INFLIGHT = Gauge("aicp_rpc_inflight","JSON-RPC requests being handled",["method"],multiprocess_mode="livesum")
+SEND_QUEUE = Gauge("aicp_ws_send_queue","Frames waiting in WS send queues",multiprocess_mode="livesum")
+REDIS_LAT = Histogram("aicp_redis_command_seconds","Redis command latency (pipelines as PIPELINE/MULTI)",["command"],buckets=_BUCKETS)
+
+ROUTE_CACHE = Counter("aicp_routing_cache_total","Routing cache lookups",["result"])  # hit | miss
+
+# ---- SharedState 로컬 캐시 ----
+CACHE_HITS = Counter("aicp_state_cache_hits_total","SharedState local cache hits")
+CACHE_MISSES = Counter("aicp_state_cache_misses_total","SharedState local cache misses")
+CACHE_EVICTIONS = Counter("aicp_state_cache_evictions_total","SharedState local cache evictions",["reason"])
+CACHE_BYTES = Gauge("aicp_state_cache_bytes","SharedState local cache size (approx bytes)",multiprocess_mode="livesum")
+
+# ---- SharedState write-behind ----
+WB_PENDING = Gauge("aicp_state_write_pending","Keys waiting in the write-behind buffer",multiprocess_mode="livesum")
+WB_COALESCED = Counter("aicp_state_write_coalesced_total","Writes merged into a pending write for the same key")
+WB_BLOCKED = Counter("aicp_state_write_blocked_total","Writes that waited for space in a full write-behind buffer")
+WB_FLUSH_KEYS = Histogram("aicp_state_write_flush_keys","Keys per write-behind flush",buckets=(1,2,5,10,25,50,100,250,500,1000))
+
+# ---- 블롭 저장소 ----
+BLOB_PUTS = Counter("aicp_blob_puts_total","Blob writes",["result"])  # new | dedup
+BLOB_BYTES = Counter("aicp_blob_bytes_total","Bytes of new blobs before/after compression",["kind"])  # raw | stored
+
+# ---- 내장 메모리 저장소 (Redis 없을 때) ----
+MEM_KEYS = Gauge("aicp_memstore_keys","Keys in the embedded memory store",multiprocess_mode="livesum")
+MEM_BYTES = Gauge("aicp_memstore_bytes","Embedded memory store size (approx bytes)",multiprocess_mode="livesum")
+MEM_REMOVED = Counter("aicp_memstore_removed_total","Keys removed from the embedded memory store",["reason"])
+
+# ---- 구독 ----
+SUB_ACTIVE = Gauge("aicp_subscriptions_active","Active resource subscriptions",multiprocess_mode="livesum")
+SUB_NOTIFY = Counter("aicp_subscription_notifications_total","resources/updated notifications sent")
+SUB_COALESCED = Counter("aicp_subscription_coalesced_total","Updates merged into a pending update for the same key")
+SUB_DROPPED = Counter("aicp_subscription_dropped_total","Pending updates dropped by a full subscriber queue")
+
+_phase_children: Dict[Tuple[str, str, str], Any] = {}
+
+def observe_phase(method: str, tool: str, phase: str, seconds: float) -> None:
+    """labels() 조회를 캐시해 요청당 비용을 줄임"""
+    h = _phase_children.get((method, tool, phase))
+    if h is None: h = _phase_children[(method, tool, phase)] = RPC_LAT.labels(method, tool, phase)
+    h.observe(seconds)
+
+_inflight_children: Dict[str, Any] = {}
+
+def inflight(method: str):
+    g = _inflight_children.get(method)
+    if g is None: g = _inflight_children[method] = RPC_INFLIGHT.labels(method)
+    return g
+
+def render() -> Tuple[bytes, str]:
+    """/metrics 본문. 멀티 워커(PROMETHEUS_MULTIPROC_DIR)면 모든 워커 파일을 합산"""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
+
+def instrument_redis(client):
+    """redis.asyncio 클라이언트의 명령/파이프라인 지연을 REDIS_LAT 에 기록 (pub/sub 연결 제외)"""
+    if client is None or getattr(client, "_aicp_instrumented", False): return client
+    execute_command = client.execute_command
+    async def timed_command(*args, **kw):
+        t = time.perf_counter()
+        try:
+            return await execute_command(*args, **kw)
+        finally:
+            REDIS_LAT.labels(str(args[0]).upper() if args else "?").observe(time.perf_counter() - t)
+    pipeline = client.pipeline
+    def timed_pipeline(*args, **kw):
+        pipe = pipeline(*args, **kw)
+        execute = pipe.execute
+        async def timed_execute(*a, **k):
+            t = time.perf_counter()
+            try:
+                return await execute(*a, **k)
+            finally:
+                REDIS_LAT.labels("MULTI" if pipe.is_transaction else "PIPELINE").observe(time.perf_counter() - t)
+        pipe.execute = timed_execute
+        return pipe
+    client.execute_command = timed_command
+    client.pipeline = timed_pipeline
+    client._aicp_instrumented = True
+    return client
+
+# ---- 트레이스 ----
+trace_logger = logging.getLogger("AICP-TRACE")
+
+class Span:
+    """요청 1건 = span 1개, 단계별 소요(ms)는 속성으로 기록"""
+    __slots__ = ("name","attrs","start","otel")
+
+    def __init__(self, name: str, attrs: Dict[str, Any], otel=None):
+        self.name = name; self.attrs = attrs
+        self.start = time.perf_counter(); self.otel = otel
+
+    def set(self, key: str, value: Any) -> None:
+        self.attrs[key] = value
+        if self.otel is not None: self.otel.set_attribute(key, value)
+
+    def end(self, error: Optional[str] = None) -> None:
+        if self.otel is not None:
+            if error: self.otel.set_attribute("error", error)
+            self.otel.end()
+            return
+        trace_logger.info("span %s", codec.dumps({"name":self.name,"duration_ms":round((time.perf_counter() - self.start) * 1000, 3),
+                                                  "error":error, **self.attrs}))
+
+class Tracer:
+    """
+    sample_rate 비율만 span 생성 (0 이면 호출 비용 = 난수 1회도 없음)
+    - opentelemetry 가 설치되어 있으면 OTel tracer 로 내보냄 (exporter 설정은 OTel SDK 쪽)
+    """
+    def __init__(self, sample_rate: float = 0.0):
+        self.sample_rate = sample_rate
+        self._otel = otel_trace.get_tracer("aicp") if otel_trace is not None and sample_rate > 0 else None
+
+    def start(self, name: str, **attrs: Any) -> Optional[Span]:
+        if self.sample_rate <= 0 or random.random() >= self.sample_rate: return None
+        otel = self._otel.start_span(name, attributes=attrs) if self._otel is not None else None
+        return Span(name, attrs, otel)
+
+    @classmethod
+    def from_env(cls) -> "Tracer":
+        return cls(float(os.getenv("TRACE_SAMPLE_RATE","0")))
@@ -1,69 +1,239 @@
-from typing import Dict, Any, List
+import re, time, random, asyncio, hashlib
+from typing import Dict, Any, List, Optional, Tuple
 from datetime import datetime, timezone
+from .routing_history import RoutingHistory
+from .agent_registry import AgentRegistry
+from .routing_cache import RoutingCache
+from .orchestrator import Orchestrator, SharedStateExecutor, ProgressFn
+from .utils import gen_id
+from . import codec
+
+TASKS = ("analysis","creative","technical","multimodal")
 
 class RoutingEngine:
-    """경량 점수화 라우팅"""
-    def __init__(self):
+    """
+    경량 점수화 라우팅
+    - 키워드 표를 하나의 정규식으로 컴파일 (겹치는 키워드도 찾도록 lookahead)
+    - 에이전트×태스크 점수표와 태스크별 최적 에이전트를 미리 계산
+    - keywords 를 직접 수정했다면 invalidate() (매처 재컴파일 + 전체 재점수),
+      일부 에이전트의 weights 만 바뀌었다면 refresh(agents) (그 에이전트 점수만 재계산). 속성 재할당은 자동 invalidate
+    - signature: 메시지 → 태스크 규칙(키워드 표)의 내용 해시 (레플리카 간 동일, RoutingCache 키 일부)
+    - 점수 = 태스크 적합도 0.7 + 비용 0.15 + 지연 0.1 + load 0.05
+      load 는 점수에서는 거의 순위를 바꾸지 않음 (적합도 우선). 실제 부하 분산은 최고점과 tie_epsilon 이내인
+      후보가 여럿일 때 power-of-two-choices 로 load 가 낮은 쪽을 고르는 단계에서 일어남
+      → 부하를 더 반영하려면 tie_epsilon 을 키움 (0.1 이면 적합도 약 0.14 차이까지 부하로 분산)
+    """
+    def __init__(self, tie_epsilon: float = 0.02):
+        self.tie_epsilon = tie_epsilon
+        self.keywords: Dict[str, List[str]] = {
+            "analysis":   ["analyze","research","compare","insight"],
+            "creative":   ["design","write","story","create"],
+            "technical":  ["code","debug","implement","optimize"],
+            "multimodal": ["image","video","audio"],
+        }
         self.weights = {
             "Claude": {"analysis":0.9,"creative":0.4,"technical":0.5,"multimodal":0.3,"base_cost":0.4,"latency":0.5,"load":0.2},
             "GPT-4":  {"analysis":0.7,"creative":0.9,"technical":0.6,"multimodal":0.5,"base_cost":0.5,"latency":0.6,"load":0.3},
             "Gemini": {"analysis":0.6,"creative":0.6,"technical":0.9,"multimodal":0.9,"base_cost":0.6,"latency":0.6,"load":0.3},
         }
 
+    def __setattr__(self, name, value):
+        super().__setattr__(name, value)
+        if name in ("weights","keywords") and "keywords" in self.__dict__ and "weights" in self.__dict__:
+            self.invalidate()
+
+    def invalidate(self) -> None:
+        """키워드 매처/signature + 점수표 전체 재계산. version 증가"""
+        # 키워드 → 우선순위 (표 순서가 곧 우선순위)
+        prio: Dict[str, int] = {}
+        for i, task in enumerate(TASKS):
+            for k in self.keywords.get(task, []):
+                prio.setdefault(k.lower(), i)
+        self._prio = prio
+        alts = "|".join(re.escape(k) for k in sorted(prio, key=len, reverse=True))
+        self._matcher = re.compile(f"(?=({alts}))") if alts else None
+        self._digits = any(c.isdigit() for k in prio for c in k)
+        self.signature = hashlib.blake2b(codec.dumpb([prio, TASKS]), digest_size=8).hexdigest()
+        self.scores = {task: {a: self.score(a, task) for a in self.weights} for task in TASKS}
+        self.best = {}; self.top = {}
+        for task in TASKS: self._rank(task)
+        self.__dict__["version"] = self.__dict__.get("version", 0) + 1
+
+    def refresh(self, agents) -> None:
+        """weights 가 바뀐(추가/삭제 포함) 에이전트 점수만 재계산 — heartbeat 경로 (매처/signature 는 그대로). version 증가"""
+        for task in TASKS:
+            row = self.scores[task]
+            for a in agents:
+                if a in self.weights: row[a] = self.score(a, task)
+                else: row.pop(a, None)
+            self._rank(task)
+        self.__dict__["version"] += 1
+
+    def _rank(self, task: str) -> None:
+        row = self.scores[task]
+        best = self.best[task] = max(row, key=row.get) if row else None
+        self.top[task] = [a for a, v in row.items() if v >= row[best] - self.tie_epsilon] if row else []
+
     def infer_task(self, text: str, caps: List[str]) -> str:
-        s = (text or "").lower()
-        if any(k in s for k in ["analyze","research","compare","insight"]): return "analysis"
-        if any(k in s for k in ["design","write","story","create"]):       return "creative"
-        if any(k in s for k in ["code","debug","implement","optimize"]):   return "technical"
-        if any(k in s for k in ["image","video","audio"]):                  return "multimodal"
+        if self._matcher is not None and text:
+            best = len(TASKS)
+            for m in self._matcher.finditer(text.lower()):
+                p = self._prio[m.group(1)]
+                if p < best:
+                    best = p
+                    if p == 0: break
+            if best < len(TASKS): return TASKS[best]
         return "analysis" if "analysis" in caps else "creative" if "creative" in caps else "technical" if "technical" in caps else "analysis"
 
+    _DIGITS = str.maketrans("123456789", "000000000")
+
+    def features(self, text: str) -> str:
+        """infer_task 결과를 바꾸지 않는 정규화: 소문자, 공백 압축, (키워드에 숫자가 없으면) 숫자 → 0"""
+        t = " ".join((text or "").lower().split())
+        return t if self._digits else t.translate(self._DIGITS)
+
     def score(self, agent: str, task: str) -> float:
         w = self.weights.get(agent, {"analysis":0.5,"creative":0.5,"technical":0.5,"multimodal":0.5,"base_cost":0.5,"latency":0.5,"load":0.5})
         return w[task]*0.7 + (1-w["base_cost"])*0.15 + (1-w["latency"])*0.1 + (1-w["load"])*0.05
 
-    def pick(self, text: str, caps: List[str]) -> str:
+    def choose(self, task: str) -> str:
+        cands = self.top[task]
+        if len(cands) < 2: return self.best[task]
+        a, b = random.sample(cands, 2)
+        return a if self.weights[a]["load"] <= self.weights[b]["load"] else b
+
+    def route(self, text: str, caps: List[str]) -> Tuple[str, str]:
+        """(agent, task) — 태스크 추론 1회 + 점수표 조회"""
         task = self.infer_task(text, caps)
-        return max(self.weights.keys(), key=lambda a: self.score(a, task))
+        return self.choose(task), task
+
+    def pick(self, text: str, caps: List[str]) -> str:
+        return self.route(text, caps)[0]
+
+    def route_batch(self, items: List[Tuple[str, List[str]]]) -> List[Tuple[str, str]]:
+        choose = self.choose; infer = self.infer_task
+        out = []
+        for text, caps in items:
+            task = infer(text, caps)
+            out.append((choose(task), task))
+        return out
 
 class NeuralBusMCP:
     """Neural Bus 엔진 (MCP 연동)"""
-    def __init__(self, ssot):
+    def __init__(self, ssot, history: Optional[RoutingHistory] = None, executor=None, route_cache: Optional[RoutingCache] = None):
         self.ssot = ssot
         self.routing = RoutingEngine()
-        self.agent_registry: Dict[str, Dict] = {}
-        self.routing_history: List[Dict] = []
+        self.route_cache = route_cache
+        self.agent_registry = AgentRegistry(self.routing, redis=getattr(ssot, "redis", None))
+        self.routing_history = history if history is not None else RoutingHistory()
+        self.orchestrator = Orchestrator(ssot, executor or SharedStateExecutor(ssot), agent_cap=self._agent_cap)
+        self._jobs: Dict[str, Tuple[asyncio.Task, str]] = {}  # job_id -> (task, owner)
+
+    def _agent_cap(self, agent: str) -> int:
+        st = self.agent_registry.agents.get(agent)
+        return st.max_concurrency if st else 2
 
     async def route_message(self, message: str, capabilities: List[str], context: Dict, session_id: str) -> Dict[str, Any]:
-        agent = self.routing.pick(message, capabilities or [])
-        record = {
-            "timestamp": datetime.now(timezone.utc).isoformat(),
-            "session_id": session_id,
-            "message": (message or "")[:100],
-            "selected_agent": agent,
-            "intent": {"primary_task": self.routing.infer_task(message, capabilities or [])}
-        }
-        self.routing_history.append(record)
+        if self.route_cache is None:
+            agent, task = self.routing.route(message, capabilities or [])
+        else:
+            task = self.route_cache.infer_task(self.routing, message or "", capabilities or [])
+            agent = self.routing.choose(task)
+        ts = time.time()
+        self.routing_history.append(ts, session_id, agent, task, (message or "")[:100])
         return {
             "status":"routed",
             "agent": agent,
-            "intent": record["intent"],
+            "intent": {"primary_task": task},
             "suggestion": f"Use {agent} for this request",
-            "timestamp": record["timestamp"]
+            "timestamp": datetime.fromtimestamp(ts, timezone.utc).isoformat()
         }
 
-    async def share_context(self, key: str, value_text: str, session_id: str) -> Dict[str, Any]:
-        await self.ssot.set(key, value_text)
-        return {"status":"shared","key":key}
+    @staticmethod
+    def _batch_item(i: int, m: Any) -> Tuple[str, List[str]]:
+        if isinstance(m, str): return m, []
+        if isinstance(m, dict):
+            text = m.get("message", ""); caps = m.get("target_capabilities") or []
+            if isinstance(text, str) and isinstance(caps, list) and all(isinstance(c, str) for c in caps): return text, caps
+        raise ValueError(f"messages[{i}] must be a string or {{message, target_capabilities}}")
+
+    async def route_batch(self, messages: List[Any], session_id: str) -> Dict[str, Any]:
+        """대량 분류용 (이력에는 기록하지 않음). 항목: 문자열 또는 {message, target_capabilities}. 잘못된 항목이 있으면 ValueError"""
+        items = [self._batch_item(i, m) for i, m in enumerate(messages)]
+        if self.route_cache is None:
+            routed = self.routing.route_batch(items)
+        else:
+            infer = self.route_cache.infer_task; eng = self.routing; routed = []
+            for text, caps in items:
+                task = infer(eng, text, caps)
+                routed.append((eng.choose(task), task))
+        return {"status":"routed","results":[{"agent":a,"primary_task":t} for a,t in routed]}
+
+    async def share_context(self, key: str, value: Any, session_id: str, if_version: Optional[int] = None,
+                            ttl: Optional[float] = None) -> Dict[str, Any]:
+        """value: JSON 값 (SharedState에서 1회 직렬화). if_version 지정 시 CAS, ttl(초) 지정 시 만료"""
+        if if_version is None:
+            version = await self.ssot.set_json(key, value, ttl)
+        else:
+            version = await self.ssot.patch(key, value, "set", if_version, ttl=ttl)
+        return {"status":"shared","key":key,"version":version}
+
+    async def patch_context(self, key: str, patch: Any, kind: str, session_id: str, if_version: Optional[int] = None) -> Dict[str, Any]:
+        """JSON Patch(배열) / Merge Patch(객체) 원자 적용 → 새 버전만 반환 (값 전체를 돌려보내지 않음)"""
+        version = await self.ssot.patch(key, patch, kind, if_version)
+        return {"status":"patched","key":key,"version":version}
 
-    async def orchestrate_collaboration(self, task: str, agents: List[str], session_id: str) -> Dict[str, Any]:
-        if not agents: agents = ["Claude","GPT-4","Gemini"]
-        subtasks = ["1. Understand task","2. Plan approach","3. Execute","4. Review"]
-        assignments = {agents[i%len(agents)]: s for i,s in enumerate(subtasks)}
-        return {"status":"orchestrated","task":task,"assignments":assignments}
+    async def get_context(self, key: str, since_version: Optional[int] = None) -> Dict[str, Any]:
+        if since_version is not None:
+            return dict(await self.ssot.changes_since(key, since_version), key=key)
+        text, version = await self.ssot.get_versioned(key)
+        return {"key":key,"version":version,"value":None if text is None else codec.loads(text)}
+
+    async def orchestrate_collaboration(self, task: str, agents: List[str], session_id: str, steps: Optional[List[Dict[str, Any]]] = None,
+                                        timeout: float = 120.0, wait: bool = False, progress: Optional[ProgressFn] = None,
+                                        owner: Optional[str] = None) -> Dict[str, Any]:
+        """
+        DAG 실행. steps 미지정 시 기본 4단계 직렬 계획
+        - wait=False(기본) 면 job_id 만 돌려주고 백그라운드 실행 (상태/결과는 SharedState jobs/<job_id>)
+        - owner(기본 session_id) 만 cancel_job 으로 취소 가능
+        - progress 는 두 경우 모두 단계가 끝날 때마다 호출
+        """
+        plan = self.orchestrator.plan(task, agents, steps, pick=lambda text: self.routing.pick(text, []))
+        self.orchestrator.validate(plan)
+        job_id = gen_id("job")
+        assignments = [s.to_dict() for s in plan]
+        if not wait:
+            t = asyncio.create_task(self.orchestrator.run(job_id, task, plan, timeout, progress))
+            self._jobs[job_id] = (t, owner or session_id)
+            t.add_done_callback(lambda _: self._jobs.pop(job_id, None))
+            return {"status":"accepted","job_id":job_id,"task":task,"assignments":assignments}
+        out = await self.orchestrator.run(job_id, task, plan, timeout, progress)
+        return dict(out, task=task, assignments=assignments)
+
+    def cancel_job(self, job_id: str, owner: str) -> bool:
+        """다른 소유자의 작업은 없는 것으로 취급"""
+        job = self._jobs.get(job_id)
+        if job is None or job[1] != owner: return False
+        job[0].cancel()
+        return True
 
     async def get_shared_state(self) -> Dict[str, Any]:
         return await self.ssot.dump_all()
 
+    async def get_shared_state_page(self, cursor: Optional[str], limit: int) -> Tuple[Dict[str, Any], Optional[str]]:
+        return await self.ssot.page(cursor, limit)
+
+    async def get_routing_history(self, session_id: Optional[str] = None, agent: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        return self.routing_history.recent(session_id, agent, limit)
+
+    async def register_agent(self, name: str, capabilities: Optional[List[str]] = None, skills: Optional[Dict[str, float]] = None,
+                             max_concurrency: Optional[int] = None, base_cost: Optional[float] = None) -> Dict[str, Any]:
+        agent = await self.agent_registry.register(name, capabilities, skills, max_concurrency, base_cost)
+        return {"status":"registered","agent":agent}
+
+    async def agent_heartbeat(self, name: str, inflight: Optional[int] = None, latency_ms: Optional[float] = None,
+                              latencies_ms: Optional[List[float]] = None) -> Dict[str, Any]:
+        return await self.agent_registry.heartbeat(name, inflight, latency_ms, latencies_ms)
+
     async def get_agent_registry(self) -> Dict[str, Any]:
-        return self.agent_registry
+        return self.agent_registry.snapshot()
@@ -0,0 +1,206 @@
+# aicp/orchestrator.py
+import asyncio, logging, time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger("AICP-ORCH")
+
+DEFAULT_SUBTASKS = ["1. Understand task","2. Plan approach","3. Execute","4. Review"]
+
+ProgressFn = Callable[[int, int, str], Awaitable[None]]
+
+class Step:
+    __slots__ = ("id","agent","task","deps","timeout")
+
+    def __init__(self, id: str, agent: str, task: str, deps: Optional[List[str]] = None, timeout: Optional[float] = None):
+        self.id = id; self.agent = agent; self.task = task
+        self.deps = list(deps or []); self.timeout = timeout
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"step":self.id,"agent":self.agent,"task":self.task,"depends_on":self.deps}
+
+class LocalExecutor:
+    """프로세스 내 에이전트 (스텁/내장용): 에이전트 이름(또는 "*") → async fn(step, inputs)"""
+    stores_results = False
+
+    def __init__(self, handlers: Dict[str, Callable[[Step, Dict[str, Any]], Awaitable[Any]]]):
+        self.handlers = handlers
+
+    async def __call__(self, job_id: str, step: Step, inputs: Dict[str, Any]) -> Any:
+        fn = self.handlers.get(step.agent) or self.handlers.get("*")
+        if fn is None:
+            raise LookupError(f"no executor for agent {step.agent}")
+        return await fn(step, inputs)
+
+class SharedStateExecutor:
+    """
+    SharedState 를 통한 실행 (기본)
+    - jobs/<job>/<step>/request 에 요청 기록 (ttl 초 후 만료) → 에이전트가 share_context 로 .../result 를 쓰면 완료
+    """
+    stores_results = True
+
+    def __init__(self, ssot, poll_min: float = 0.05, poll_max: float = 1.0, ttl: float = 3600.0):
+        self.ssot = ssot
+        self.poll_min = poll_min
+        self.poll_max = poll_max
+        self.ttl = ttl
+
+    async def __call__(self, job_id: str, step: Step, inputs: Dict[str, Any]) -> Any:
+        base = f"jobs/{job_id}/{step.id}"
+        await self.ssot.set_json(base + "/request", {"job_id":job_id,"agent":step.agent,"task":step.task,"inputs":inputs}, self.ttl)
+        delay = self.poll_min
+        while True:
+            val = await self.ssot.get_json(base + "/result")
+            if val is not None: return val
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.poll_max)
+
+class Orchestrator:
+    """
+    DAG 실행 엔진
+    - 의존성이 풀린 단계를 동시에 실행 (에이전트별 동시 실행 상한, hub 전체 공유)
+    - 단계 결과는 SharedState jobs/<job>/<step>/result 에 기록, 후속 단계 inputs 로 전달
+    - 단계 실패 시 그 후속 단계만 건너뜀 (나머지는 계속) → 부분 결과
+    - 작업 전체 timeout, 취소 시 실행 중 단계 취소 후 상태 기록
+    - 종료 시 단계 키(request/result)는 삭제, 결과는 jobs/<job> 에 모아 ttl 초 동안 보관
+    """
+    def __init__(self, ssot, executor, agent_cap: Callable[[str], int] = lambda agent: 2, ttl: float = 3600.0):
+        self.ssot = ssot
+        self.executor = executor
+        self.agent_cap = agent_cap
+        self.ttl = ttl
+        self._slots: Dict[str, asyncio.Semaphore] = {}
+
+    @staticmethod
+    def plan(task: str, agents: List[str], steps: Optional[List[Dict[str, Any]]], pick: Callable[[str], str]) -> List[Step]:
+        """steps 미지정 시 기본 4단계 직렬 계획 (에이전트 순환 배정). 형식 오류는 ValueError"""
+        if not steps:
+            agents = agents or ["Claude","GPT-4","Gemini"]
+            out: List[Step] = []
+            for i, label in enumerate(DEFAULT_SUBTASKS):
+                out.append(Step(f"s{i+1}", agents[i % len(agents)], f"{label}: {task}", [f"s{i}"] if i else []))
+            return out
+        if not isinstance(steps, list):
+            raise ValueError("steps must be an array")
+        out = []
+        for i, s in enumerate(steps):
+            if not isinstance(s, dict):
+                raise ValueError(f"steps[{i}] must be an object")
+            for name in ("id","agent","task"):
+                if s.get(name) is not None and not isinstance(s[name], str):
+                    raise ValueError(f"steps[{i}].{name} must be a string")
+            deps = s.get("depends_on")
+            if deps is not None and (not isinstance(deps, list) or not all(isinstance(d, str) for d in deps)):
+                raise ValueError(f"steps[{i}].depends_on must be an array of strings")
+            timeout = s.get("timeout")
+            if timeout is not None and (not isinstance(timeout, (int, float)) or isinstance(timeout, bool) or timeout <= 0):
+                raise ValueError(f"steps[{i}].timeout must be a positive number")
+            text = s.get("task") or task
+            out.append(Step(s.get("id") or f"s{i+1}", s.get("agent") or pick(text), text, deps, timeout))
+        return out
+
+    @staticmethod
+    def validate(steps: List[Step]) -> None:
+        ids = [s.id for s in steps]
+        if len(set(ids)) != len(ids):
+            raise ValueError("duplicate step id")
+        known = set(ids)
+        for s in steps:
+            missing = [d for d in s.deps if d not in known]
+            if missing: raise ValueError(f"step {s.id} depends on unknown {missing}")
+        # Kahn: 순환 검사
+        indeg = {s.id: len(s.deps) for s in steps}
+        children: Dict[str, List[str]] = {s.id: [] for s in steps}
+        for s in steps:
+            for d in s.deps: children[d].append(s.id)
+        ready = [i for i, n in indeg.items() if n == 0]; seen = 0
+        while ready:
+            i = ready.pop(); seen += 1
+            for c in children[i]:
+                indeg[c] -= 1
+                if indeg[c] == 0: ready.append(c)
+        if seen != len(steps):
+            raise ValueError("steps contain a dependency cycle")
+
+    def _slot(self, agent: str) -> asyncio.Semaphore:
+        sem = self._slots.get(agent)
+        if sem is None:
+            sem = self._slots[agent] = asyncio.Semaphore(max(1, self.agent_cap(agent)))
+        return sem
+
+    async def _run_step(self, job_id: str, step: Step, inputs: Dict[str, Any]) -> Any:
+        async with self._slot(step.agent):
+            if step.timeout: result = await asyncio.wait_for(self.executor(job_id, step, inputs), step.timeout)
+            else: result = await self.executor(job_id, step, inputs)
+        if not getattr(self.executor, "stores_results", False):
+            await self.ssot.set_json(f"jobs/{job_id}/{step.id}/result", result, self.ttl)
+        return result
+
+    async def run(self, job_id: str, task: str, steps: List[Step], timeout: float = 120.0,
+                  progress: Optional[ProgressFn] = None) -> Dict[str, Any]:
+        self.validate(steps)
+        loop = asyncio.get_running_loop()
+        started = loop.time(); deadline = started + timeout
+        results: Dict[str, Any] = {}; errors: Dict[str, str] = {}
+        pending = {s.id: s for s in steps}
+        waiting = {s.id: set(s.deps) for s in steps}
+        running: Dict[asyncio.Task, Step] = {}
+        status = "completed"
+        await self._record(job_id, task, "running", steps, results, errors, timeout + self.ttl)
+        try:
+            while pending or running:
+                for sid in [sid for sid in pending if not waiting[sid]]:
+                    s = pending.pop(sid)
+                    t = asyncio.create_task(self._run_step(job_id, s, {d: results[d] for d in s.deps}))
+                    running[t] = s
+                if not running: break  # 남은 단계는 실패한 선행 단계에 막힘
+                done, _ = await asyncio.wait(running, timeout=max(0.0, deadline - loop.time()), return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    status = "timeout"; break
+                for t in done:
+                    s = running.pop(t)
+                    exc = asyncio.CancelledError("step cancelled") if t.cancelled() else t.exception()
+                    if exc is not None:
+                        errors[s.id] = f"{type(exc).__name__}: {exc}" if str(exc) else type(exc).__name__
+                    else:
+                        results[s.id] = t.result()
+                        for w in waiting.values(): w.discard(s.id)
+                    if progress:
+                        try:
+                            await progress(len(results) + len(errors), len(steps), f"{s.id} ({s.agent}) {'failed' if exc else 'done'}")
+                        except Exception as e:  # 알림 실패(연결 종료 등)는 작업에 영향 없음
+                            logger.debug(f"progress notify failed job={job_id}: {e}")
+        except asyncio.CancelledError:
+            status = "cancelled"
+            raise
+        finally:
+            for t in running: t.cancel()
+            if running: await asyncio.gather(*running, return_exceptions=True)
+            skipped = [s.id for s in steps if s.id not in results and s.id not in errors]
+            if status == "completed" and (errors or skipped):
+                status = "partial" if results else "failed"
+            await asyncio.shield(self._finish(job_id, task, status, steps, results, errors))
+        return {
+            "status": status, "job_id": job_id,
+            "results": results, "errors": errors, "skipped": skipped,
+            "elapsed_ms": round((loop.time() - started) * 1000, 1),
+        }
+
+    async def _record(self, job_id: str, task: str, status: str, steps: List[Step], results: Dict[str, Any], errors: Dict[str, str],
+                      ttl: float, final: bool = False) -> None:
+        state = {
+            "status": status, "task": task, "updated": time.time(),
+            "steps": [dict(s.to_dict(), state="done" if s.id in results else "failed" if s.id in errors else "pending") for s in steps],
+        }
+        if final: state.update(results=results, errors=errors)
+        try:
+            await self.ssot.set_json(f"jobs/{job_id}", state, ttl)
+        except Exception as e:
+            logger.warning(f"job state write failed job={job_id}: {e}")
+
+    async def _finish(self, job_id: str, task: str, status: str, steps: List[Step], results: Dict[str, Any], errors: Dict[str, str]) -> None:
+        """최종 상태(결과 포함) 기록 후 단계 키 정리"""
+        await self._record(job_id, task, status, steps, results, errors, self.ttl, final=True)
+        try:
+            await self.ssot.delete(*(f"jobs/{job_id}/{s.id}/{part}" for s in steps for part in ("request","result")))
+        except Exception as e:
+            logger.warning(f"job cleanup failed job={job_id}: {e}")
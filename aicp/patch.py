@@ -0,0 +1,122 @@
+# aicp/patch.py
+"""
+JSON Patch (RFC 6902) / JSON Merge Patch (RFC 7396)
+- 입력 문서를 변경하지 않음 (경로상의 컨테이너만 얕은 복사)
+"""
+import copy
+from typing import Any, Dict, List
+
+class PatchError(ValueError): ...
+
+_MISSING = object()
+
+def _tokens(path: str) -> List[str]:
+    if path == "": return []
+    if not path.startswith("/"): raise PatchError(f"invalid pointer {path!r}")
+    return [t.replace("~1", "/").replace("~0", "~") for t in path[1:].split("/")]
+
+def _index(arr: List[Any], tok: str, insert: bool = False) -> int:
+    if tok == "-" and insert: return len(arr)
+    if not tok.isdigit() or (tok != "0" and tok.startswith("0")):
+        raise PatchError(f"invalid array index {tok!r}")
+    i = int(tok)
+    if i > len(arr) or (i == len(arr) and not insert):
+        raise PatchError(f"array index {i} out of range")
+    return i
+
+def _equal(a: Any, b: Any) -> bool:
+    """test 비교: JSON 타입 단위로 비교 (1 ≠ true, 숫자는 값으로: 1 == 1.0)"""
+    if isinstance(a, dict):
+        return isinstance(b, dict) and a.keys() == b.keys() and all(_equal(v, b[k]) for k, v in a.items())
+    if isinstance(a, list):
+        return isinstance(b, list) and len(a) == len(b) and all(map(_equal, a, b))
+    if isinstance(a, bool) or isinstance(b, bool): return type(a) is type(b) and a == b
+    if isinstance(a, (int, float)): return isinstance(b, (int, float)) and a == b
+    return type(a) is type(b) and a == b
+
+def _get(doc: Any, path: str) -> Any:
+    for tok in _tokens(path):
+        if isinstance(doc, dict):
+            if tok not in doc: raise PatchError(f"path not found {path!r}")
+            doc = doc[tok]
+        elif isinstance(doc, list):
+            doc = doc[_index(doc, tok)]
+        else:
+            raise PatchError(f"path not found {path!r}")
+    return doc
+
+def _walk(doc: Any, path: str, fn) -> Any:
+    """path 의 부모까지 복사하며 내려가 fn(parent, last_token) 적용 → 새 문서"""
+    toks = _tokens(path)
+    if not toks: return fn(None, None)
+    root = doc = copy.copy(doc)
+    for tok in toks[:-1]:
+        if isinstance(doc, dict):
+            if tok not in doc: raise PatchError(f"path not found {path!r}")
+            child = doc[tok] = copy.copy(doc[tok])
+        elif isinstance(doc, list):
+            i = _index(doc, tok); child = doc[i] = copy.copy(doc[i])
+        else:
+            raise PatchError(f"path not found {path!r}")
+        doc = child
+    if not isinstance(doc, (dict, list)): raise PatchError(f"path not found {path!r}")
+    fn(doc, toks[-1])
+    return root
+
+def _add(doc: Any, path: str, value: Any) -> Any:
+    def op(parent, tok):
+        if parent is None: return value
+        if isinstance(parent, dict): parent[tok] = value
+        else: parent.insert(_index(parent, tok, insert=True), value)
+    return _walk(doc, path, op)
+
+def _remove(doc: Any, path: str) -> Any:
+    def op(parent, tok):
+        if parent is None: raise PatchError("cannot remove the document root")
+        if isinstance(parent, dict):
+            if tok not in parent: raise PatchError(f"path not found {path!r}")
+            del parent[tok]
+        else:
+            del parent[_index(parent, tok)]
+    return _walk(doc, path, op)
+
+def apply_json_patch(doc: Any, ops: List[Dict[str, Any]]) -> Any:
+    """RFC 6902. 하나라도 실패하면 PatchError (부분 적용 없음)"""
+    if not isinstance(ops, list): raise PatchError("JSON Patch must be an array")
+    for o in ops:
+        if not isinstance(o, dict) or not isinstance(o.get("path"), str):
+            raise PatchError(f"invalid operation {o!r}")
+        kind = o.get("op"); path = o["path"]
+        value = o.get("value", _MISSING)
+        if kind in ("add", "replace", "test") and value is _MISSING:
+            raise PatchError(f"{kind} needs a value")
+        if kind == "add":
+            doc = _add(doc, path, value)
+        elif kind == "remove":
+            doc = _remove(doc, path)
+        elif kind == "replace":
+            _get(doc, path)
+            doc = _add(_remove(doc, path), path, value) if path else value
+        elif kind in ("move", "copy"):
+            src = o.get("from")
+            if not isinstance(src, str): raise PatchError(f"{kind} needs from")
+            if kind == "move" and (path + "/").startswith(src + "/") and path != src:
+                raise PatchError("cannot move a value into itself")
+            value = _get(doc, src)
+            if kind == "move": doc = _remove(doc, src)
+            else: value = copy.deepcopy(value)
+            doc = _add(doc, path, value)
+        elif kind == "test":
+            if not _equal(_get(doc, path), value): raise PatchError(f"test failed at {path!r}")
+        else:
+            raise PatchError(f"unknown op {kind!r}")
+    return doc
+
+def merge_patch(doc: Any, patch: Any) -> Any:
+    """RFC 7396"""
+    if not isinstance(patch, dict): return patch
+    out = dict(doc) if isinstance(doc, dict) else {}
+    for k, v in patch.items():
+        if v is None: out.pop(k, None)
+        else: out[k] = merge_patch(out.get(k), v)
+    return out
@@ -0,0 +1,33 @@
+# aicp/profiling.py
+"""
+시간 제한 샘플링 프로파일러 (/debug/profile)
+- 별도 스레드가 interval 마다 대상 스레드(기본: 이벤트 루프 스레드)의 스택을 수집
+- 결과는 collapsed stack 텍스트 ("frame;frame;frame count") → flamegraph.pl / speedscope 로 바로 열람
+- 대상 스레드는 계측하지 않으므로 오버헤드는 샘플링 스레드의 GIL 점유 정도
+"""
+import sys, time, threading
+from collections import Counter
+from typing import Optional
+
+def _stack(frame, max_depth: int) -> str:
+    out = []
+    while frame is not None and len(out) < max_depth:
+        code = frame.f_code
+        out.append(f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ";".join(reversed(out))
+
+def sample(seconds: float, interval: float = 0.005, thread_id: Optional[int] = None, max_depth: int = 64) -> str:
+    """seconds 동안 thread_id 스택 샘플링 → collapsed stack (많은 순). 호출 스레드에서 블로킹 실행"""
+    target = thread_id if thread_id is not None else threading.main_thread().ident
+    counts: Counter = Counter()
+    deadline = time.monotonic() + seconds
+    n = 0
+    while time.monotonic() < deadline:
+        frame = sys._current_frames().get(target)
+        if frame is not None:
+            counts[_stack(frame, max_depth)] += 1; n += 1
+        time.sleep(interval)
+    lines = [f"# samples={n} interval_ms={interval * 1000:g} seconds={seconds:g}"]
+    lines += [f"{stack} {c}" for stack, c in counts.most_common()]
+    return "\n".join(lines) + "\n"
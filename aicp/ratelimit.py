@@ -0,0 +1,138 @@
+# aicp/ratelimit.py
+import time, asyncio, logging, math
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger("AICP-RATELIMIT")
+
+class RateLimited(Exception):
+    def __init__(self, scope: str, retry_after: float):
+        super().__init__(f"rate limited ({scope}), retry after {retry_after:.3f}s")
+        self.scope = scope
+        self.retry_after = retry_after
+
+class RateLimiter:
+    """
+    토큰버킷 (프로세스 로컬)
+    - reserve(): 대기가 max_wait 이내면 토큰을 선점(음수 허용)하고 대기 시간을 돌려줌 → 동시 대기자도 정확히 rate 만큼만 통과
+    """
+    def __init__(self, rate_per_sec: float = 10, burst: int = 20):
+        self.rate = rate_per_sec
+        self.capacity = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def reserve(self, n: int = 1, max_wait: float = math.inf) -> float:
+        """허용 시 대기 시간(>=0), 거부 시 -retry_after (토큰 소비 없음)"""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        wait = (n - self.tokens) / self.rate if self.tokens < n else 0.0
+        if wait > max_wait: return -wait
+        self.tokens -= n
+        return wait
+
+    async def take(self, n: int = 1) -> bool:
+        wait = self.reserve(n)
+        if wait > 0: await asyncio.sleep(wait)
+        return True
+
+# KEYS[1]=bucket, ARGV = rate, capacity, n, max_wait → 대기 시간 문자열 (음수면 거부)
+_LUA_RESERVE = """
+local rate = tonumber(ARGV[1]); local cap = tonumber(ARGV[2])
+local n = tonumber(ARGV[3]); local max_wait = tonumber(ARGV[4])
+local t = redis.call('TIME'); local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local s = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(s[1]) or cap
+local ts = tonumber(s[2]) or now
+tokens = math.min(cap, tokens + math.max(0, now - ts) * rate)
+local wait = 0
+if tokens < n then wait = (n - tokens) / rate end
+if wait > max_wait then return tostring(-wait) end
+tokens = tokens - n
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil((cap - tokens) / rate * 1000) + 1000)
+return tostring(wait)
+"""
+
+class RedisRateLimiter:
+    """Redis Lua 스크립트 기반 분산 토큰버킷 (레플리카 간 공유). Redis 오류 시 로컬 버킷으로 폴백"""
+    def __init__(self, redis, key: str, rate_per_sec: float, burst: int, script=None):
+        self.redis = redis
+        self.key = key
+        self.rate = rate_per_sec
+        self.capacity = burst
+        self.script = script or redis.register_script(_LUA_RESERVE)
+        self.fallback = RateLimiter(rate_per_sec, burst)
+
+    async def reserve(self, n: int = 1, max_wait: float = math.inf) -> float:
+        try:
+            mw = max_wait if math.isfinite(max_wait) else 1e9
+            return float(await self.script(keys=[self.key], args=[self.rate, self.capacity, n, mw]))
+        except Exception as e:
+            logger.warning(f"redis rate limit failed, using local bucket: {e}")
+            return self.fallback.reserve(n, max_wait)
+
+class RateLimits:
+    """
+    세션/테넌트/도구 단위 레이트리밋
+    - session: 세션마다 로컬 버킷 (세션은 한 레플리카에만 존재)
+    - tenant, (tenant, tool): Redis 가 있으면 분산 버킷, 없으면 로컬
+    - mode="wait": max_wait 이내면 대기 후 통과, 초과 시 거부 / mode="reject": 즉시 거부 (RateLimited.retry_after)
+    """
+    key_prefix = "aicp:rl:"
+
+    def __init__(self, session: Tuple[float, int] = (10, 20), tenant: Optional[Tuple[float, int]] = None,
+                 tools: Optional[Dict[str, Tuple[float, int]]] = None, redis=None, mode: str = "wait", max_wait: float = 2.0):
+        self.session = session
+        self.tenant = tenant
+        self.tools = tools or {}
+        self.redis = redis
+        self.max_wait = 0.0 if mode == "reject" else max_wait
+        self._script = redis.register_script(_LUA_RESERVE) if redis else None
+        self._shared: Dict[Tuple[str, str], object] = {}
+
+    @staticmethod
+    def parse_tools(spec: str) -> Dict[str, Tuple[float, int]]:
+        """"route_batch=1:2,orchestrate_collaboration=2:5" → {tool: (rate, burst)}"""
+        out: Dict[str, Tuple[float, int]] = {}
+        for part in filter(None, (p.strip() for p in (spec or "").split(","))):
+            name, _, rb = part.partition("=")
+            rate, _, burst = rb.partition(":")
+            out[name.strip()] = (float(rate), int(burst or max(1, math.ceil(float(rate)))))
+        return out
+
+    def session_bucket(self) -> RateLimiter:
+        return RateLimiter(*self.session)
+
+    def _bucket(self, scope: str, ident: str, conf: Tuple[float, int]):
+        b = self._shared.get((scope, ident))
+        if b is None:
+            if self.redis:
+                b = RedisRateLimiter(self.redis, f"{self.key_prefix}{scope}:{ident}", conf[0], conf[1], self._script)
+            else:
+                b = RateLimiter(*conf)
+            self._shared[(scope, ident)] = b
+        return b
+
+    async def _reserve(self, scope: str, bucket) -> float:
+        wait = bucket.reserve(1, self.max_wait)
+        if asyncio.iscoroutine(wait): wait = await wait
+        if wait < 0: raise RateLimited(scope, -wait)
+        return wait
+
+    async def acquire_session(self, limiter: RateLimiter) -> None:
+        """세션 버킷만 (인증 전: 테넌트 미확정)"""
+        wait = await self._reserve("session", limiter)
+        if wait > 0: await asyncio.sleep(wait)
+
+    async def acquire(self, limiter: RateLimiter, tenant: str = "default", tool: Optional[str] = None) -> None:
+        """모든 해당 버킷을 통과할 때까지 대기(최대 max_wait) 또는 RateLimited"""
+        if tool is None:
+            wait = await self._reserve("session", limiter)
+            if self.tenant:
+                wait = max(wait, await self._reserve("tenant", self._bucket("tenant", tenant, self.tenant)))
+        else:
+            conf = self.tools.get(tool)
+            if conf is None: return
+            wait = await self._reserve("tool", self._bucket("tool", f"{tenant}:{tool}", conf))
+        if wait > 0: await asyncio.sleep(wait)
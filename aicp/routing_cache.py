@@ -0,0 +1,59 @@
+# aicp/routing_cache.py
+"""
+라우팅 결정 캐시 (길고 반복/템플릿화된 메시지 대비)
+- 키: RoutingEngine.features(메시지) + 정렬된 capabilities + engine.signature → blake2b
+- 값: 메시지에 의존하는 단계(태스크 추론) 결과. 에이전트 선택은 매번 최신 weights/load 로 계산
+  → 부하/지연 변경은 캐시를 비우지 않아도 즉시 반영, 키워드/점수 규칙이 바뀌면 signature 가 바뀌어 전체 무효화
+- min_length 자 미만 메시지는 캐시를 거치지 않음: 짧은 메시지는 정규화+해시+조회가 태스크 추론보다 비쌈
+  (benchmarks.micro pick_long / pick_long_cached 로 확인)
+- 프로세스 로컬 LRU + TTL 만 사용 (Redis 왕복은 태스크 추론보다 항상 느림)
+"""
+import time, hashlib
+from collections import OrderedDict
+from typing import List, Optional
+
+from .metrics import ROUTE_CACHE
+
+_HIT, _MISS = ROUTE_CACHE.labels("hit"), ROUTE_CACHE.labels("miss")
+
+class RoutingCache:
+    def __init__(self, capacity: int = 10000, ttl: float = 300.0, min_length: int = 256):
+        self.capacity = capacity
+        self.ttl = ttl
+        self.min_length = min_length
+        self.entries: OrderedDict = OrderedDict()  # key -> (만료 monotonic, 태스크)
+        self.signature = ""
+
+    def key(self, features: str, caps: List[str], signature: str) -> str:
+        if signature != self.signature:  # 규칙 변경 → 이전 키는 다시 쓰이지 않으므로 바로 비움
+            self.entries.clear(); self.signature = signature
+        h = hashlib.blake2b(digest_size=16)
+        h.update(signature.encode()); h.update(b"\0")
+        h.update("\x1f".join(sorted(map(str, caps))).encode()); h.update(b"\0")
+        h.update(features.encode())
+        return h.hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        e = self.entries.get(key)
+        if e is None or e[0] < time.monotonic():
+            if e is not None: del self.entries[key]
+            return None
+        self.entries.move_to_end(key)
+        _HIT.inc()
+        return e[1]
+
+    def put(self, key: str, value: str) -> None:
+        """새로 계산한 결과 저장 (miss 로 집계)"""
+        _MISS.inc()
+        self.entries[key] = (time.monotonic() + self.ttl, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.capacity: self.entries.popitem(last=False)
+
+    def infer_task(self, engine, text: str, caps: List[str]) -> str:
+        """engine.infer_task 와 같은 결과. min_length 이상일 때만 캐시 경유"""
+        if len(text) < self.min_length: return engine.infer_task(text, caps)
+        key = self.key(engine.features(text), caps, engine.signature)
+        task = self.get(key)
+        if task is None:
+            task = engine.infer_task(text, caps); self.put(key, task)
+        return task
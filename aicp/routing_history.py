@@ -0,0 +1,174 @@
+# aicp/routing_history.py
+import sys, asyncio, logging
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any, Deque, Dict, List, Optional, Protocol
+
+from . import codec
+
+try:
+    import asyncpg  # optional
+except Exception:  # asyncpg 미설치 시
+    asyncpg = None  # type: ignore
+
+logger = logging.getLogger("AICP-HISTORY")
+
+class RoutingRecord:
+    __slots__ = ("seq", "ts", "session_id", "agent", "task", "message")
+
+    def __init__(self, seq: int, ts: float, session_id: str, agent: str, task: str, message: str):
+        self.seq = seq; self.ts = ts
+        self.session_id = session_id; self.agent = agent
+        self.task = task; self.message = message
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "timestamp": datetime.fromtimestamp(self.ts, timezone.utc).isoformat(),
+            "session_id": self.session_id,
+            "message": self.message,
+            "selected_agent": self.agent,
+            "intent": {"primary_task": self.task},
+        }
+
+class HistorySink(Protocol):
+    async def write(self, records: List[RoutingRecord]) -> None: ...
+    async def close(self) -> None: ...
+
+class FileSink:
+    """로컬 append-only JSONL"""
+    def __init__(self, path: str):
+        self.path = path
+
+    def _append(self, data: bytes) -> None:
+        with open(self.path, "ab") as f:
+            f.write(data)
+
+    async def write(self, records: List[RoutingRecord]) -> None:
+        data = b"".join(codec.dumpb(r.to_dict()) + b"\n" for r in records)
+        await asyncio.to_thread(self._append, data)
+
+    async def close(self) -> None: ...
+
+class PostgresSink:
+    """docker/initdb/init.sql 의 state_logs 테이블로 COPY (key = routing:<session_id>)"""
+    def __init__(self, dsn: str):
+        if asyncpg is None:
+            raise RuntimeError("asyncpg not installed")
+        self.dsn = dsn
+        self.pool = None
+
+    async def write(self, records: List[RoutingRecord]) -> None:
+        if self.pool is None:
+            self.pool = await asyncpg.create_pool(self.dsn, min_size=1, max_size=2)
+        rows = [(f"routing:{r.session_id}", codec.dumps(r.to_dict()), datetime.fromtimestamp(r.ts, timezone.utc)) for r in records]
+        async with self.pool.acquire() as conn:
+            await conn.copy_records_to_table("state_logs", records=rows, columns=["key","value","created_at"])
+
+    async def close(self) -> None:
+        if self.pool is not None:
+            await self.pool.close()
+
+class RoutingHistory:
+    """
+    라우팅 이력 링버퍼
+    - 고정 용량, __slots__ 레코드, 에이전트/태스크/세션 이름 intern
+    - session_id / agent 보조 인덱스 (seq deque, 덮어쓸 때 앞에서 제거)
+    - sink 지정 시 백그라운드로 배치 저장 (버퍼 초과분은 버림)
+    """
+    def __init__(self, capacity: int = 10000, sink: Optional[HistorySink] = None,
+                 flush_interval: float = 1.0, flush_batch: int = 500, max_pending: int = 50000):
+        self.capacity = max(1, capacity)
+        self.ring: List[Optional[RoutingRecord]] = [None] * self.capacity
+        self.seq = 0
+        self.by_session: Dict[str, Deque[int]] = {}
+        self.by_agent: Dict[str, Deque[int]] = {}
+        self.sink = sink
+        self.flush_interval = flush_interval
+        self.flush_batch = flush_batch
+        self.pending: Deque[RoutingRecord] = deque(maxlen=max_pending)
+        self.dropped = 0
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return min(self.seq, self.capacity)
+
+    def __iter__(self):
+        for s in range(max(0, self.seq - self.capacity), self.seq):
+            yield self.ring[s % self.capacity]
+
+    def append(self, ts: float, session_id: str, agent: str, task: str, message: str) -> RoutingRecord:
+        seq = self.seq
+        slot = seq % self.capacity
+        old = self.ring[slot]
+        if old is not None:
+            self._unindex(self.by_session, old.session_id, old.seq)
+            self._unindex(self.by_agent, old.agent, old.seq)
+        rec = RoutingRecord(seq, ts, sys.intern(session_id or ""), sys.intern(agent), sys.intern(task), message)
+        self.ring[slot] = rec
+        self.by_session.setdefault(rec.session_id, deque()).append(seq)
+        self.by_agent.setdefault(rec.agent, deque()).append(seq)
+        self.seq = seq + 1
+        if self.sink is not None:
+            if len(self.pending) == self.pending.maxlen: self.dropped += 1
+            self.pending.append(rec)
+            if len(self.pending) >= self.flush_batch: self._wake.set()
+        return rec
+
+    @staticmethod
+    def _unindex(index: Dict[str, Deque[int]], name: str, seq: int) -> None:
+        q = index.get(name)
+        if q and q[0] == seq:
+            q.popleft()
+            if not q: del index[name]
+
+    def recent(self, session_id: Optional[str] = None, agent: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        """최신순 조회. session_id/agent 둘 다 주면 더 작은 인덱스를 기준으로 필터"""
+        if session_id is None and agent is None:
+            seqs = range(self.seq - 1, max(-1, self.seq - 1 - min(limit, len(self))), -1)
+            return [self.ring[s % self.capacity].to_dict() for s in seqs]
+        qs = [q for q in (self.by_session.get(session_id) if session_id is not None else None,
+                          self.by_agent.get(agent) if agent is not None else None) if q is not None]
+        if len(qs) < (session_id is not None) + (agent is not None):
+            return []
+        out: List[Dict[str, Any]] = []
+        for s in reversed(min(qs, key=len)):
+            rec = self.ring[s % self.capacity]
+            if (session_id is None or rec.session_id == session_id) and (agent is None or rec.agent == agent):
+                out.append(rec.to_dict())
+                if len(out) >= limit: break
+        return out
+
+    # ---- spill ----
+    async def start(self) -> None:
+        if self.sink is not None and self._task is None:
+            self._task = asyncio.create_task(self._flush_loop())
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self.sink is not None:
+            await self.flush()
+            await self.sink.close()
+
+    async def flush(self) -> None:
+        while self.pending:
+            n = min(self.flush_batch, len(self.pending))
+            batch = [self.pending.popleft() for _ in range(n)]
+            try:
+                await self.sink.write(batch)
+            except Exception as e:
+                logger.warning(f"history spill failed ({len(batch)} records dropped): {e}")
+                self.dropped += len(batch)
+                return
+
+    async def _flush_loop(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self.flush()
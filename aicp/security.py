@@ -1,7 +1,9 @@
 # aicp/security.py
-import time, asyncio, os, jwt
-from dataclasses import dataclass
-from typing import List
+import os, jwt, time, asyncio, hashlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, FrozenSet, Iterable, List, Optional, Tuple
 
 class AuthError(Exception): ...
 
@@ -11,41 +13,148 @@ class Claims:
     tenant: str
     roles: List[str]
     scopes: List[str]
+    exp: Optional[float] = None
+    scope_set: FrozenSet[str] = field(init=False, repr=False, compare=False)
 
-def verify_jwt(token: str, secret: str, audience: str | None = None) -> Claims:
+    def __post_init__(self):
+        self.scope_set = frozenset(self.scopes)
+
+def _claims(decoded: Dict) -> Claims:
+    return Claims(
+        sub=decoded["sub"],
+        tenant=decoded.get("tenant","default"),
+        roles=decoded.get("roles",[]),
+        scopes=decoded.get("scopes",[]),
+        exp=decoded.get("exp"),
+    )
+
+def verify_jwt(token: str, secret: str, audience: str | None = None, algorithms: Optional[List[str]] = None) -> Claims:
     try:
-        decoded = jwt.decode(token, secret, algorithms=["HS256"], audience=audience, options={"require": ["exp","sub"]})
-        return Claims(
-            sub=decoded["sub"],
-            tenant=decoded.get("tenant","default"),
-            roles=decoded.get("roles",[]),
-            scopes=decoded.get("scopes",[]),
-        )
+        decoded = jwt.decode(token, secret, algorithms=algorithms or ["HS256"], audience=audience, options={"require": ["exp","sub"]})
+        return _claims(decoded)
     except Exception as e:
         raise AuthError(str(e))
 
-def require_scopes(claims: Claims, needed: list[str]):
-    if not set(needed).issubset(set(claims.scopes)):
-        raise AuthError(f"insufficient_scope: need {needed} have {claims.scopes}")
-
-class RateLimiter:
-    """간단 토큰버킷 레이트리밋 (세션 단위)"""
-    def __init__(self, rate_per_sec: float, burst: int = 20):
-        self.rate = rate_per_sec
-        self.capacity = burst
-        self.tokens = burst
-        self.updated = time.monotonic()
-
-    async def take(self, n: int = 1):
-        now = time.monotonic()
-        delta = now - self.updated
-        self.updated = now
-        self.tokens = min(self.capacity, self.tokens + delta * self.rate)
-        if self.tokens >= n:
-            self.tokens -= n
-            return True
-        # 부족하면 필요한 만큼만 대기
-        wait = (n - self.tokens) / self.rate
-        await asyncio.sleep(max(wait, 0))
-        self.tokens = 0
-        return True
+def require_scopes(claims: Claims, needed: Iterable[str]):
+    needed = needed if isinstance(needed, frozenset) else frozenset(needed)
+    if not needed <= claims.scope_set:
+        raise AuthError(f"insufficient_scope: need {sorted(needed)} have {claims.scopes}")
+
+# 도구별 필요 scope (TOOL_SCOPES 로 덮어쓰기 가능)
+DEFAULT_TOOL_SCOPES: Dict[str, FrozenSet[str]] = {
+    "route_to_agent": frozenset({"route"}),
+    "route_batch": frozenset({"route"}),
+    "register_agent": frozenset({"agent"}),
+    "agent_heartbeat": frozenset({"agent"}),
+    "share_context": frozenset({"context:write"}),
+    "patch_context": frozenset({"context:write"}),
+    "orchestrate_collaboration": frozenset({"orchestrate"}),
+    "cancel_collaboration": frozenset({"orchestrate"}),
+    "upload_blob": frozenset({"context:write"}),
+}
+
+def parse_tool_scopes(spec: str) -> Dict[str, FrozenSet[str]]:
+    """"share_context=context:write;route_batch=route bulk" → {tool: frozenset(scopes)}"""
+    out: Dict[str, FrozenSet[str]] = {}
+    for part in filter(None, (p.strip() for p in (spec or "").split(";"))):
+        name, _, scopes = part.partition("=")
+        out[name.strip()] = frozenset(scopes.split())
+    return out
+
+_ASYMMETRIC = ("RS","PS","ES","Ed")
+
+class TokenVerifier:
+    """
+    JWT 검증 + 캐시
+    - 검증 결과를 토큰 해시(sha256) 키 LRU 에 보관, exp 지나면 폐기
+    - 같은 토큰 동시 검증은 하나로 합침 (재접속 폭주 대비)
+    - 검증 실패도 fail_ttl 초 동안 캐시 → 같은 잘못된 토큰 반복으로 서명 검증을 강제할 수 없음
+    - 비대칭 서명(RS/PS/ES/EdDSA)은 스레드풀에서 검증해 이벤트 루프를 막지 않음
+    """
+    def __init__(self, key: str, algorithms: Optional[List[str]] = None, audience: Optional[str] = None,
+                 cache_size: int = 10000, offload: Optional[bool] = None, workers: int = 4,
+                 tool_scopes: Optional[Dict[str, FrozenSet[str]]] = None, fail_ttl: float = 10.0):
+        self.key = key
+        self.algorithms = algorithms or ["HS256"]
+        self.audience = audience
+        self.cache_size = cache_size
+        self.offload = any(a.startswith(_ASYMMETRIC) for a in self.algorithms) if offload is None else offload
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="jwt") if self.offload else None
+        self.tool_scopes = DEFAULT_TOOL_SCOPES if tool_scopes is None else tool_scopes
+        self.fail_ttl = fail_ttl
+        self._cache: "OrderedDict[bytes, Claims]" = OrderedDict()
+        self._failed: "OrderedDict[bytes, Tuple[float, str]]" = OrderedDict()  # digest -> (만료 monotonic, 사유)
+        self._pending: Dict[bytes, asyncio.Future] = {}
+
+    @staticmethod
+    def _bearer(token: str) -> str:
+        token = (token or "").strip()
+        return token[7:].strip() if token[:7].lower() == "bearer " else token
+
+    def _cached(self, digest: bytes) -> Optional[Claims]:
+        claims = self._cache.get(digest)
+        if claims is None: return None
+        if claims.exp is not None and claims.exp <= time.time():
+            del self._cache[digest]
+            return None
+        self._cache.move_to_end(digest)
+        return claims
+
+    async def verify(self, token: str) -> Claims:
+        token = self._bearer(token)
+        if not token: raise AuthError("missing token")
+        digest = hashlib.sha256(token.encode()).digest()
+        claims = self._cached(digest)
+        if claims is not None: return claims
+        failed = self._failed.get(digest)
+        if failed is not None:
+            if failed[0] > time.monotonic(): raise AuthError(failed[1])
+            del self._failed[digest]
+        fut = self._pending.get(digest)
+        if fut is not None:
+            return await asyncio.shield(fut)
+        fut = self._pending[digest] = asyncio.get_running_loop().create_future()
+        try:
+            if self.pool is not None:
+                claims = await asyncio.get_running_loop().run_in_executor(self.pool, verify_jwt, token, self.key, self.audience, self.algorithms)
+            else:
+                claims = verify_jwt(token, self.key, self.audience, self.algorithms)
+            self._cache[digest] = claims
+            if len(self._cache) > self.cache_size: self._cache.popitem(last=False)
+            fut.set_result(claims)
+            return claims
+        except BaseException as e:
+            if isinstance(e, AuthError) and self.fail_ttl > 0:
+                self._failed[digest] = (time.monotonic() + self.fail_ttl, str(e))
+                if len(self._failed) > self.cache_size: self._failed.popitem(last=False)
+            fut.set_exception(e if isinstance(e, AuthError) else AuthError(str(e) or type(e).__name__))
+            fut.exception()  # 대기자가 없어도 경고 방지
+            raise
+        finally:
+            del self._pending[digest]
+
+    def check_tool(self, claims: Claims, tool: str) -> None:
+        needed = self.tool_scopes.get(tool)
+        if needed: require_scopes(claims, needed)
+
+    def close(self) -> None:
+        if self.pool is not None: self.pool.shutdown(wait=False)
+
+    @classmethod
+    def from_env(cls) -> Optional["TokenVerifier"]:
+        """JWT_REQUIRED=true 일 때만 생성. 비대칭 키는 JWT_PUBLIC_KEY(PEM 파일 경로)"""
+        if os.getenv("JWT_REQUIRED","false").lower() not in ("1","true","yes"): return None
+        algorithms = [a.strip() for a in os.getenv("JWT_ALGORITHMS","HS256").split(",") if a.strip()]
+        key_path = os.getenv("JWT_PUBLIC_KEY")
+        if key_path:
+            with open(key_path) as f: key = f.read()
+        else:
+            key = os.getenv("JWT_SECRET")
+        if not key:
+            raise AuthError("JWT_REQUIRED=true but neither JWT_SECRET nor JWT_PUBLIC_KEY is set")
+        spec = os.getenv("TOOL_SCOPES")
+        return cls(key, algorithms, os.getenv("JWT_AUDIENCE") or None,
+                   cache_size=int(os.getenv("JWT_CACHE_SIZE","10000")),
+                   workers=int(os.getenv("JWT_WORKERS","4")),
+                   fail_ttl=float(os.getenv("JWT_FAIL_TTL","10")),
+                   tool_scopes=parse_tool_scopes(spec) if spec is not None else None)
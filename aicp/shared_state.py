@@ -1,40 +1,520 @@
-from typing import Dict, Optional
+import os, time, random, asyncio, logging
+from collections import deque, OrderedDict
+from itertools import islice
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+from . import codec
+from .state_cache import LocalCache
+from .mem_store import MemoryStore
+from .blobs import BlobStore, ref_digest, refs_in
+from .patch import PatchError, apply_json_patch, merge_patch
+from .metrics import WB_PENDING, WB_COALESCED, WB_BLOCKED, WB_FLUSH_KEYS
 try:
     from redis.asyncio import Redis  # optional
 except Exception:  # redis 미설치 시
     Redis = None  # type: ignore
 
+logger = logging.getLogger("AICP-SSOT")
+
+class VersionConflict(Exception):
+    def __init__(self, key: str, version: int):
+        super().__init__(f"version conflict on {key!r} (current {version})")
+        self.key = key
+        self.version = version
+
+# KEYS = value, 버전 해시, 패치 로그 / ARGV = 필드(키), 기대 버전, 새 값, 로그 항목 필드('"type":..,"patch":..'), 로그 길이, TTL(ms, 0=유지)
+# 기대 버전이 현재 버전과 같을 때만 쓰기 → {1, 새 버전} / 아니면 {0, 현재 버전}
+_LUA_CAS = """
+local cur = tonumber(redis.call('HGET', KEYS[2], ARGV[1]) or '0')
+if cur ~= tonumber(ARGV[2]) then return {0, cur} end
+local ttl = tonumber(ARGV[6])
+if ttl > 0 then redis.call('SET', KEYS[1], ARGV[3], 'PX', ttl)
+elseif ttl == 0 then redis.call('SET', KEYS[1], ARGV[3], 'KEEPTTL')
+else redis.call('SET', KEYS[1], ARGV[3]) end
+local nv = redis.call('HINCRBY', KEYS[2], ARGV[1], 1)
+if ARGV[4] == '' then redis.call('DEL', KEYS[3]) else
+  redis.call('RPUSH', KEYS[3], '{"v":' .. nv .. ',' .. ARGV[4] .. '}')
+  redis.call('LTRIM', KEYS[3], -tonumber(ARGV[5]), -1)
+end
+return {1, nv}
+"""
+
+class _Pending:
+    """write-behind 버퍼 항목: 키의 최신 값 + 플러시 결과(버전)를 기다리는 쓰기들"""
+    __slots__ = ("value","ttl","waiters")
+
+    def __init__(self):
+        self.value = ""; self.ttl: Optional[float] = None
+        self.waiters: List[asyncio.Future] = []
+
 class SharedState:
     """
     SSoT (Single Source of Truth)
     - Redis가 있으면 Redis 백엔드 사용
-    - 없으면 메모리 딕셔너리로 폴백
+    - 없으면 내장 MemoryStore 로 폴백 (TTL, 바이트 상한 축출, 스냅샷 영속화 — mem_store.py)
+    - 전체 조회는 SCAN + MGET 배치 (KEYS 미사용)
+    - cache 지정 시(Redis 전용) 로컬 read-through 캐시, 레플리카 간 무효화는 pub/sub
+    - watchers: 이 프로세스의 쓰기마다 fn(key, value_text) 호출 (삭제, 내장 저장소의 만료/축출은 value_text="null")
+    - cache 또는 publish_changes 면 쓰기마다 change_channel 로 "node|key" 만 발행 (값은 받는 쪽이 필요할 때 조회)
+    - 키별 버전(쓰기마다 +1) + 최근 패치 로그(log_size): patch() 는 CAS, changes_since() 는 diff 만 반환
+      (set() 은 로그를 비움 → 그 이전 버전에서는 전체 값)
+    - write_window>0 (Redis 전용) write-behind: 창 안의 같은 키 set() 은 마지막 값만 남기고 MULTI 파이프라인 1회로 배치 플러시
+      write_ack="flush": 플러시 후 응답(병합된 쓰기는 같은 버전) / "buffer": 버퍼 적재 즉시 응답(버전 None, 실패 시 재시도)
+      버퍼가 write_buffer 키를 넘으면 새 키 쓰기는 대기(backpressure). get() 은 버퍼 값을 읽고, patch/버전 조회/전체 조회는 먼저 플러시
+    - blobs + blob_threshold: 그보다 긴 값은 BlobStore 에 두고 참조({"$blob": ...})만 저장 (dump/구독/캐시는 참조만 전달)
+      patch() 는 JSON 블롭 참조를 풀어 적용한 뒤 다시 분리. 참조되지 않는 블롭은 blob_gc_interval 마다 회수
+    - set/patch(ttl=초) 키 만료. ttl 없는 patch() 는 기존 TTL 유지, set() 은 해제. 메모리 백엔드에서 만료/축출된 키는 버전이 0 부터 다시 시작
     """
-    def __init__(self, redis: Optional["Redis"] = None):
+    change_channel = "aicp:ssot:changes"
+
+    def __init__(self, redis: Optional["Redis"] = None, scan_count: int = 500, cache: Optional[LocalCache] = None,
+                 log_size: int = 100, mem: Optional[MemoryStore] = None, write_window: float = 0.0,
+                 write_ack: str = "flush", write_buffer: int = 10000, write_batch: int = 500,
+                 blobs: Optional[BlobStore] = None, blob_threshold: int = 0, blob_gc_interval: float = 3600.0):
         self.redis = redis
-        self.mem: Dict[str, str] = {}
+        self.mem = mem if mem is not None else MemoryStore()
+        self.logs: Dict[str, deque] = {}  # 메모리 백엔드 패치 로그
         self.key_prefix = "aicp:ssot:"
+        self.version_key = "aicp:ssot-ver"  # key_prefix* SCAN 에 걸리지 않는 이름
+        self.log_prefix = "aicp:ssot-log:"
+        self.log_size = log_size
+        self._cas = redis.register_script(_LUA_CAS) if redis else None
+        self._patching: Dict[str, List[Any]] = {}  # key -> [Lock, 사용 수]
+        self.scan_count = scan_count
+        self.cache = cache if redis else None
+        self.node_id = os.urandom(6).hex()
+        self.watchers: List[Callable[[str, str], None]] = []
+        self.mem.on_remove = self._removed
+        self.publish_changes = False
+        self._listener: Optional[asyncio.Task] = None
+        self._closing = False
+        # write-behind
+        if write_ack not in ("flush","buffer"): raise ValueError(f"unknown write_ack {write_ack!r}")
+        self.write_window = write_window if redis else 0.0
+        self.write_ack = write_ack
+        self.write_buffer = write_buffer
+        self.write_batch = write_batch
+        self._pending: "OrderedDict[str, _Pending]" = OrderedDict()
+        self._flushing: Dict[str, _Pending] = {}
+        self._flush_lock = asyncio.Lock()
+        self._wake = asyncio.Event()
+        self._space = asyncio.Event()
+        self._flusher: Optional[asyncio.Task] = None
+        # 큰 값 분리
+        self.blobs = blobs
+        self.blob_threshold = blob_threshold if blobs else 0
+        self.blob_gc_interval = blob_gc_interval
+        self._blob_gc: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        if not self.redis: await self.mem.start()
+        if self.cache and self._listener is None:
+            self._listener = asyncio.create_task(self._listen_invalidations())
+        if self.blobs and self.blob_gc_interval > 0 and self._blob_gc is None:
+            self._blob_gc = asyncio.create_task(self._collect_loop())
+
+    async def close(self) -> None:
+        self._closing = True
+        for task in (self._listener, self._blob_gc):
+            if task: task.cancel()
+        await asyncio.gather(*(t for t in (self._listener, self._blob_gc) if t), return_exceptions=True)
+        self._listener = self._blob_gc = None
+        if self._flusher:
+            async with self._flush_lock:  # 진행 중인 배치는 끝까지 기록한 뒤 중단
+                self._flusher.cancel()
+                await asyncio.gather(self._flusher, return_exceptions=True)
+            self._flusher = None
+        if self._pending: await self.flush()
+        if not self.redis: await self.mem.close()
+
+    async def _listen_invalidations(self) -> None:
+        """다른 레플리카의 쓰기 알림("node|key") 수신 → 로컬 캐시 무효화"""
+        # redis-py 의 get_message(timeout) 는 취소를 삼키고 None 을 돌려줄 수 있음 → _closing 으로도 종료
+        while not self._closing:
+            ps = self.redis.pubsub()
+            try:
+                await ps.subscribe(self.change_channel)
+                self.cache.clear()  # 구독 공백 동안 놓친 무효화 대비
+                while not self._closing:
+                    m = await ps.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                    if m is None: continue
+                    origin, _, key = self._s(m["data"]).partition("|")
+                    if origin != self.node_id: self.cache.invalidate(key)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"invalidation listener error: {e}")
+                self.cache.clear()
+                await asyncio.sleep(1.0)
+            finally:
+                await ps.aclose()
+
+    @staticmethod
+    def _s(v: Any) -> str:
+        return v if isinstance(v, str) else v.decode()
 
-    async def set(self, key: str, value_text: str) -> None:
+    def _split(self, rkeys) -> Tuple[Dict[str, str], List[str], List[Tuple[str, Any]]]:
+        """SCAN 결과 → (캐시 적중분, MGET 대상 redis 키, (키, 토큰) 목록)"""
+        n = len(self.key_prefix)
+        keys = [self._s(k)[n:] for k in rkeys]
+        if not self.cache:
+            return {}, [self.key_prefix + k for k in keys], [(k, None) for k in keys]
+        hits: Dict[str, str] = {}; need: List[str] = []; pending: List[Tuple[str, Any]] = []
+        for k in keys:
+            v = self.cache.get(k)
+            if v is not None:
+                hits[k] = v
+            else:
+                need.append(self.key_prefix + k); pending.append((k, self.cache.token(k)))
+        return hits, need, pending
+
+    def _merge(self, hits: Dict[str, str], pending: List[Tuple[str, Any]], vals) -> Dict[str, str]:
+        for (k, token), v in zip(pending, vals):
+            if v is None: continue
+            v = self._s(v)
+            hits[k] = v
+            if self.cache: self.cache.fill(k, v, token)
+        return hits
+
+    async def set(self, key: str, value_text: str, ttl: Optional[float] = None) -> Optional[int]:
+        """무조건 쓰기 → 새 버전 (write_ack="buffer" 면 None). ttl(초) 지정 시 만료"""
+        if self.blob_threshold and len(value_text) >= self.blob_threshold: value_text = await self._offload(value_text)
+        if self.write_window:
+            return await self._buffer(key, value_text, ttl)
         if self.redis:
-            await self.redis.set(self.key_prefix + key, value_text)
+            pipe = self.redis.pipeline(transaction=True)
+            pipe.set(self.key_prefix + key, value_text, px=int(ttl * 1000) if ttl else None)
+            pipe.hincrby(self.version_key, key, 1)
+            pipe.delete(self.log_prefix + key)
+            self._announce(pipe, key)
+            version = (await pipe.execute())[1]
+            self._written(key, value_text)
+            return version
+        version = self.mem.set(key, value_text, ttl)
+        self.logs.pop(key, None)
+        self._written(key, value_text)
+        return version
+
+    # ---- write-behind ----
+    async def _buffer(self, key: str, value_text: str, ttl: Optional[float]) -> Optional[int]:
+        while (p := self._pending.get(key)) is None and len(self._pending) >= self.write_buffer:
+            WB_BLOCKED.inc()
+            self._space.clear(); self._wake.set()
+            await self._space.wait()
+        if p is None:
+            p = self._pending[key] = _Pending(); WB_PENDING.inc()
+            if len(self._pending) == 1 or len(self._pending) >= self.write_batch: self._wake.set()
         else:
-            self.mem[key] = value_text
+            WB_COALESCED.inc()
+        p.value = value_text; p.ttl = ttl
+        if self._flusher is None: self._flusher = asyncio.create_task(self._flush_loop())
+        if self.write_ack == "buffer": return None
+        fut = asyncio.get_running_loop().create_future()
+        p.waiters.append(fut)
+        return await fut
+
+    async def _flush_loop(self) -> None:
+        while True:
+            await self._wake.wait()
+            if len(self._pending) < self.write_batch: await asyncio.sleep(self.write_window)
+            self._wake.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.warning(f"write-behind flush failed: {e}")
+                await asyncio.sleep(min(1.0, self.write_window * 10))
+                if self._pending: self._wake.set()
+
+    async def flush(self) -> None:
+        """버퍼 전체를 write_batch 키씩 MULTI 파이프라인으로 기록. 실패 시 flush 대기자에게 예외, buffer 모드는 재적재"""
+        async with self._flush_lock:
+            while self._pending:
+                batch: Dict[str, _Pending] = {}
+                while self._pending and len(batch) < self.write_batch:
+                    k, p = self._pending.popitem(last=False); batch[k] = p
+                WB_PENDING.dec(len(batch)); self._space.set()
+                self._flushing = batch
+                try:
+                    versions = await self._write_batch(batch)
+                except Exception as e:
+                    for k, p in reversed(list(batch.items())):
+                        for f in p.waiters:
+                            if not f.done(): f.set_exception(e)
+                        if self.write_ack == "buffer" and k not in self._pending:
+                            self._pending[k] = p; self._pending.move_to_end(k, last=False); WB_PENDING.inc()
+                    raise
+                finally:
+                    self._flushing = {}
+                WB_FLUSH_KEYS.observe(len(batch))
+                for (k, p), v in zip(batch.items(), versions):
+                    self._written(k, p.value)
+                    for f in p.waiters:
+                        if not f.done(): f.set_result(v)
+
+    async def _write_batch(self, batch: Dict[str, _Pending]) -> List[int]:
+        """MSET(+TTL 키는 SET PX) → 키별 HINCRBY/로그 삭제/알림, 1 RTT → 키별 새 버전"""
+        pipe = self.redis.pipeline(transaction=True)
+        plain = {self.key_prefix + k: p.value for k, p in batch.items() if not p.ttl}
+        n = 1 if plain else 0
+        if plain: pipe.mset(plain)
+        for k, p in batch.items():
+            if p.ttl: pipe.set(self.key_prefix + k, p.value, px=int(p.ttl * 1000)); n += 1
+        for k in batch: pipe.hincrby(self.version_key, k, 1)
+        for k, p in batch.items():
+            pipe.delete(self.log_prefix + k)
+            self._announce(pipe, k)
+        return [int(v) for v in (await pipe.execute())[n:n + len(batch)]]
+
+    async def _settle(self, key: Optional[str] = None) -> None:
+        """key(없으면 전체)의 버퍼된 쓰기를 먼저 기록 — 버전/CAS/전체 조회 일관성"""
+        if key is None:
+            if self._pending or self._flushing: await self.flush()
+        elif key in self._pending or key in self._flushing:
+            await self.flush()
+
+    # ---- 블롭 ----
+    async def _offload(self, value_text: str) -> str:
+        if ref_digest(value_text): return value_text
+        return codec.dumps(await self.blobs.put(value_text.encode()))
+
+    async def _resolve(self, value_text: Optional[str]) -> Optional[str]:
+        """값 전체가 JSON 블롭 참조면 원문으로 (patch 적용용)"""
+        if value_text is None or not self.blobs: return value_text
+        digest = ref_digest(value_text)
+        if digest is None or '"type":"application/json"' not in value_text: return value_text
+        data = await self.blobs.get(digest)
+        if data is None: raise PatchError(f"blob {digest} is missing")
+        return data.decode()
+
+    async def collect_blobs(self, grace: float = 3600.0) -> int:
+        """어떤 값에서도(중첩 포함) 참조되지 않고 grace 초 넘게 갱신되지 않은 블롭 삭제 → 삭제 수"""
+        since = time.time() - grace  # 스캔 시작 전 기준: 스캔 중 새로 저장된 블롭은 회수하지 않음
+        live = set()
+        async for chunk in self.iter_items():
+            live |= refs_in(chunk.values())
+        return await self.blobs.sweep(live, since)
+
+    async def _collect_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.blob_gc_interval)
+            try:
+                n = await self.collect_blobs(self.blob_gc_interval)
+                if n: logger.info(f"collected {n} unreferenced blobs")
+            except Exception as e:
+                logger.warning(f"blob collection failed: {e}")
+
+    def _announce(self, pipe, key: str) -> bool:
+        """레플리카 알림(무효화/변경) 명령을 파이프라인에 추가. 추가했으면 True"""
+        if not (self.cache or self.publish_changes): return False
+        pipe.publish(self.change_channel, f"{self.node_id}|{key}")
+        return True
+
+    def _written(self, key: str, value_text: str) -> None:
+        """쓰기 후처리: 로컬 캐시 갱신, watchers"""
+        if self.cache:
+            self.cache.invalidate(key)
+            self.cache.put(key, value_text)
+        for fn in self.watchers: fn(key, value_text)
+
+    def _removed(self, key: str) -> None:
+        """삭제/만료/축출 후처리: 다른 레플리카 구독자가 받는 것과 같은 null 변경으로 watchers 호출"""
+        self.logs.pop(key, None)
+        if self.cache: self.cache.invalidate(key)
+        for fn in self.watchers: fn(key, "null")
+
+    async def get_versioned(self, key: str) -> Tuple[Optional[str], int]:
+        """(값, 버전). 키가 없으면 (None, 0)"""
+        if self.write_window: await self._settle(key)
+        if self.redis:
+            pipe = self.redis.pipeline(transaction=True)
+            pipe.get(self.key_prefix + key)
+            pipe.hget(self.version_key, key)
+            val, ver = await pipe.execute()
+            return (None if val is None else self._s(val)), int(ver or 0)
+        e = self.mem.entry(key)
+        return (None, 0) if e is None else (e.value, e.version)
+
+    async def patch(self, key: str, patch: Any, kind: str = "json-patch", if_version: Optional[int] = None,
+                    retries: int = 16, ttl: Optional[float] = None) -> int:
+        """
+        JSON Patch / Merge Patch 원자 적용 → 새 버전
+        - if_version 지정 시 CAS: 현재 버전이 다르면 VersionConflict
+        - 미지정 시 동시 쓰기와 충돌하면 최신 값에 다시 적용 (retries 회)
+        - kind="set": patch 를 값 전체로 교체 (CAS 쓰기용). set() 과 같이 로그를 비우고 ttl 미지정 시 만료 해제
+        - 같은 프로세스의 같은 키 패치는 직렬화 (CAS 재시도는 레플리카 간 경합에만)
+        """
+        slot = self._patching.get(key)
+        if slot is None: slot = self._patching[key] = [asyncio.Lock(), 0]
+        slot[1] += 1
+        try:
+            async with slot[0]:
+                return await self._patch(key, patch, kind, if_version, retries, ttl)
+        finally:
+            slot[1] -= 1
+            if not slot[1]: del self._patching[key]
+
+    async def _patch(self, key: str, patch: Any, kind: str, if_version: Optional[int], retries: int,
+                     ttl: Optional[float]) -> int:
+        if kind == "json-patch":
+            fn = lambda doc: apply_json_patch(doc, patch); entry = {"type":kind,"patch":patch}
+        elif kind == "merge-patch":
+            fn = lambda doc: merge_patch(doc, patch); entry = {"type":kind,"patch":patch}
+        elif kind == "set":
+            fn = lambda doc: patch; entry = None
+        else:
+            raise PatchError(f"unknown patch kind {kind!r}")
+        for attempt in range(max(1, retries)):
+            if attempt: await asyncio.sleep(random.uniform(0, 0.001 * (1 << min(attempt, 6))))
+            text, version = await self.get_versioned(key)
+            if if_version is not None and version != if_version:
+                raise VersionConflict(key, version)
+            if entry is None: doc = None  # 전체 교체: 현재 값을 읽지 않음
+            else:
+                if self.blobs: text = await self._resolve(text)
+                try:
+                    doc = None if text is None else codec.loads(text)
+                except ValueError as e:
+                    raise PatchError(f"stored value of {key!r} is not JSON: {e}")
+            new_text = codec.dumps(fn(doc))
+            if self.blob_threshold and len(new_text) >= self.blob_threshold: new_text = await self._offload(new_text)
+            if not self.redis:
+                # 메모리: 블롭 처리(await) 중 다른 쓰기가 끼었으면 재시도, 이후 쓰기까지는 await 없음 → 원자적
+                if self.blobs and self.mem.version(key) != version: continue
+                version = self.mem.set(key, new_text, ttl, version=version + 1, keep_ttl=entry is not None)
+                if entry is None:
+                    self.logs.pop(key, None)
+                else:
+                    q = self.logs.get(key)
+                    if q is None: q = self.logs[key] = deque(maxlen=self.log_size)
+                    q.append({"v":version, **entry})
+                self._written(key, new_text)
+                return version
+            ok, version = await self._cas(keys=[self.key_prefix + key, self.version_key, self.log_prefix + key],
+                                          args=[key, version, new_text, "" if entry is None else codec.dumps(entry)[1:-1], self.log_size,
+                                                int(ttl * 1000) if ttl else 0 if entry is not None else -1])
+            if ok:
+                pipe = self.redis.pipeline(transaction=False)
+                if self._announce(pipe, key): await pipe.execute()
+                self._written(key, new_text)
+                return int(version)
+            if if_version is not None:
+                raise VersionConflict(key, int(version))
+        raise VersionConflict(key, int(version))
+
+    async def changes_since(self, key: str, since: int) -> Dict[str, Any]:
+        """
+        since 이후 변경
+        - {"version": v, "patches": [{"v": n, "type": "json-patch"|"merge-patch", "patch": ...}, ...]} (로그로 이어 붙일 수 있을 때)
+        - {"version": v, "value": ...} (로그가 잘렸거나 set() 으로 초기화된 경우)
+        """
+        if self.write_window: await self._settle(key)
+        if self.redis:
+            pipe = self.redis.pipeline(transaction=True)
+            pipe.hget(self.version_key, key)
+            pipe.lrange(self.log_prefix + key, 0, -1)
+            ver, entries = await pipe.execute()
+            version = int(ver or 0)
+            entries = [codec.loads(e) for e in entries]
+        else:
+            version = self.mem.version(key)
+            entries = list(self.logs.get(key, ()))
+        if since >= version:
+            return {"version":version,"patches":[]}
+        needed = [e for e in entries if e["v"] > since]
+        if needed and needed[0]["v"] == since + 1 and needed[-1]["v"] == version:
+            return {"version":version,"patches":needed}
+        text, version = await self.get_versioned(key)
+        return {"version":version,"value":None if text is None else codec.loads(text)}
+
+    async def set_json(self, key: str, value: Any, ttl: Optional[float] = None) -> Optional[int]:
+        return await self.set(key, codec.dumps(value), ttl)
+
+    async def delete(self, *keys: str) -> int:
+        """키 삭제 (버전/패치 로그 포함) → 삭제된 수"""
+        if not keys: return 0
+        if self.write_window:
+            for k in keys: await self._settle(k)
+        if self.redis:
+            pipe = self.redis.pipeline(transaction=True)
+            pipe.delete(*(self.key_prefix + k for k in keys))
+            pipe.hdel(self.version_key, *keys)
+            pipe.delete(*(self.log_prefix + k for k in keys))
+            if self.cache or self.publish_changes:
+                for k in keys: pipe.publish(self.change_channel, f"{self.node_id}|{k}")
+            n = int((await pipe.execute())[0])
+            for k in keys: self._removed(k)
+            return n
+        return sum(self.mem.delete(k) for k in keys)
 
     async def get(self, key: str) -> Optional[str]:
+        if self._pending or self._flushing:
+            p = self._pending.get(key) or self._flushing.get(key)
+            if p is not None: return p.value
         if self.redis:
+            token = None
+            if self.cache:
+                hit = self.cache.get(key)
+                if hit is not None: return hit
+                token = self.cache.token(key)
             val = await self.redis.get(self.key_prefix + key)
             if val is None: return None
-            return val if isinstance(val, str) else val.decode()
+            val = self._s(val)
+            if self.cache: self.cache.fill(key, val, token)
+            return val
         return self.mem.get(key)
 
+    async def get_json(self, key: str) -> Any:
+        val = await self.get(key)
+        return None if val is None else codec.loads(val)
+
+    async def iter_items(self, batch: Optional[int] = None) -> AsyncIterator[Dict[str, str]]:
+        """스냅샷을 청크(dict) 단위로 스트리밍. 다음 SCAN과 현재 MGET을 한 파이프라인으로 묶어 배치당 1 RTT"""
+        batch = batch or self.scan_count
+        if self.write_window: await self._settle()
+        if not self.redis:
+            # 버전 스냅샷: 값 복사 없이 시작 시점 상태를 청크 사이 쓰기와 무관하게 일관되게 읽음
+            with self.mem.snapshot() as snap:
+                it = snap.items()
+                while chunk := dict(islice(it, batch)):
+                    yield chunk
+            return
+        match = self.key_prefix + "*"
+        cursor, keys = await self.redis.scan(0, match=match, count=batch)
+        while True:
+            hits, need, pending = self._split(keys)
+            res: List[Any] = []
+            if need or cursor:
+                pipe = self.redis.pipeline(transaction=False)
+                if need: pipe.mget(need)
+                if cursor: pipe.scan(cursor, match=match, count=batch)
+                res = await pipe.execute()
+            chunk = self._merge(hits, pending, res[0] if need else [])
+            if chunk: yield chunk
+            if not cursor: break
+            cursor, keys = res[-1]
+
+    async def page(self, cursor: Optional[str] = None, limit: int = 100) -> Tuple[Dict[str, str], Optional[str]]:
+        """
+        커서 기반 페이지 조회 → (items, next_cursor). next_cursor가 None이면 끝
+        - Redis: SCAN 커서 (COUNT는 힌트라 limit을 약간 넘을 수 있음, 중복 가능)
+        - 메모리: 삽입 순서 오프셋 (STATE_MEM_MAX_MB 설정 시 최근 사용 순 → 조회로 순서가 바뀌어 중복/누락 가능)
+        """
+        start = int(cursor or 0)
+        if start < 0: raise ValueError("invalid cursor")
+        if self.write_window: await self._settle()
+        if not self.redis:
+            items, end = self.mem.page(start, limit)
+            return items, (None if end is None else str(end))
+        out: Dict[str, str] = {}
+        c = start
+        while True:
+            c, keys = await self.redis.scan(c, match=self.key_prefix + "*", count=limit)
+            hits, need, pending = self._split(keys)
+            out.update(self._merge(hits, pending, await self.redis.mget(need) if need else []))
+            if not c or len(out) >= limit: break
+        return out, (str(c) if c else None)
+
     async def dump_all(self) -> Dict[str, str]:
-        if self.redis:
-            out: Dict[str,str] = {}
-            keys = await self.redis.keys(self.key_prefix + "*")
-            for k in keys:
-                k_str = k if isinstance(k, str) else k.decode()
-                v = await self.redis.get(k_str)
-                out[k_str.replace(self.key_prefix,"")] = v if isinstance(v,str) else (v.decode() if v else "")
-            return out
-        return dict(self.mem)
+        out: Dict[str, str] = {}
+        async for chunk in self.iter_items():
+            out.update(chunk)
+        return out
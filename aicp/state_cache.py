@@ -0,0 +1,72 @@
+# aicp/state_cache.py
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from .metrics import CACHE_HITS, CACHE_MISSES, CACHE_EVICTIONS, CACHE_BYTES
+
+_ENTRY_OVERHEAD = 96  # dict/tuple/str 헤더 근사치
+
+class LocalCache:
+    """
+    SharedState 읽기 캐시 (프로세스 로컬)
+    - LRU + 바이트 상한 + TTL (무효화 유실 대비 안전망)
+    - 키별 버전: 읽기 시작 시 token() → fill() 때 그 사이 무효화됐으면 채우지 않음
+    """
+    def __init__(self, max_bytes: int = 64<<20, ttl: float = 30.0, max_versions: int = 100_000):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.max_versions = max_versions
+        self.entries: "OrderedDict[str, Tuple[str, float, int]]" = OrderedDict()  # key -> (value, expires, size)
+        self.versions: Dict[str, int] = {}
+        self.epoch = 0
+        self.bytes = 0
+
+    def get(self, key: str) -> Optional[str]:
+        e = self.entries.get(key)
+        if e is None:
+            CACHE_MISSES.inc(); return None
+        if e[1] < time.monotonic():
+            self._drop(key); CACHE_EVICTIONS.labels("ttl").inc(); CACHE_MISSES.inc()
+            return None
+        self.entries.move_to_end(key)
+        CACHE_HITS.inc()
+        return e[0]
+
+    def token(self, key: str) -> Tuple[int, int]:
+        return (self.epoch, self.versions.get(key, 0))
+
+    def fill(self, key: str, value: str, token: Tuple[int, int]) -> bool:
+        if token != self.token(key): return False
+        self.put(key, value)
+        return True
+
+    def put(self, key: str, value: str) -> None:
+        self._drop(key)
+        size = len(key) + len(value) + _ENTRY_OVERHEAD
+        if size > self.max_bytes: return
+        self.entries[key] = (value, time.monotonic() + self.ttl, size)
+        self.bytes += size
+        while self.bytes > self.max_bytes:
+            _, (_, _, sz) = self.entries.popitem(last=False)
+            self.bytes -= sz
+            CACHE_EVICTIONS.labels("size").inc()
+        CACHE_BYTES.set(self.bytes)
+
+    def invalidate(self, key: str) -> None:
+        self._drop(key)
+        self.versions[key] = self.versions.get(key, 0) + 1
+        if len(self.versions) > self.max_versions:
+            # 버전 테이블 상한: epoch 증가로 진행 중인 모든 fill 을 무효화하고 비움
+            self.versions.clear(); self.epoch += 1
+
+    def clear(self) -> None:
+        self.entries.clear(); self.versions.clear()
+        self.epoch += 1; self.bytes = 0
+        CACHE_BYTES.set(0)
+
+    def _drop(self, key: str) -> None:
+        e = self.entries.pop(key, None)
+        if e is not None:
+            self.bytes -= e[2]
+            CACHE_BYTES.set(self.bytes)
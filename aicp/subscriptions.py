@@ -0,0 +1,163 @@
+# aicp/subscriptions.py
+"""
+SharedState 변경 구독 (MCP resources/subscribe)
+- 세션별 키 접두사 필터, 변경분만 notifications/resources/updated 로 푸시 (O(변경), 전체 덤프 폴링 대체)
+- 구독자별 bounded 큐 + 키 단위 병합: 느린 소비자는 키마다 최신 값만 받음
+- 큐가 max_keys 를 넘으면 가장 오래된 키를 버리고 truncated=true 로 알림 → 클라이언트가 resources/read 로 재동기화
+- 레플리카 간 전달: SharedState 가 Redis pub/sub(change_channel)로 변경 키만 발행,
+  허브는 구독 중인 키일 때만 값을 MGET 으로 조회 (구독자가 없으면 값 전송 없음)
+"""
+import asyncio, logging
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from . import codec
+from .codec import Raw
+from .metrics import SUB_ACTIVE, SUB_NOTIFY, SUB_COALESCED, SUB_DROPPED
+
+logger = logging.getLogger("AICP-SUBS")
+
+NotifyFn = Callable[[Dict[str, Any]], Awaitable[None]]
+
+def _updated(uri: str, changes: Dict[str, bytes], truncated: bool) -> Dict[str, Any]:
+    # 값은 이미 JSON 텍스트 → 재직렬화 없이 이어붙임
+    body = b",".join(codec.dumpb(k) + b":" + v for k, v in changes.items())
+    params = b'{"uri":' + codec.dumpb(uri) + b',"changes":{' + body + b"}" + (b',"truncated":true' if truncated else b"") + b"}"
+    return {"jsonrpc":"2.0","method":"notifications/resources/updated","params":Raw(params)}
+
+class Subscriber:
+    """세션 1개: uri → 접두사, 대기 중 변경(키 → 최신 값), 송신 태스크"""
+    __slots__ = ("session_id","notify","prefixes","pending","truncated","max_keys","wake","task")
+
+    def __init__(self, session_id: str, notify: NotifyFn, max_keys: int):
+        self.session_id = session_id
+        self.notify = notify
+        self.prefixes: Dict[str, str] = {}
+        self.pending: "OrderedDict[str, bytes]" = OrderedDict()
+        self.truncated = False
+        self.max_keys = max_keys
+        self.wake = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+
+    def matches(self, key: str) -> bool:
+        return any(key.startswith(p) for p in self.prefixes.values())
+
+    def offer(self, key: str, value: bytes) -> None:
+        if key in self.pending:
+            self.pending.move_to_end(key); SUB_COALESCED.inc()
+        self.pending[key] = value
+        if len(self.pending) > self.max_keys:
+            self.pending.popitem(last=False); self.truncated = True; SUB_DROPPED.inc()
+        self.wake.set()
+
+    def resync(self) -> None:
+        """변경 유실 가능(구독 채널 재연결 등) → 다음 알림에 truncated 표시"""
+        self.truncated = True
+        self.wake.set()
+
+    async def run(self) -> None:
+        while True:
+            await self.wake.wait(); self.wake.clear()
+            pending, self.pending = self.pending, OrderedDict()
+            truncated, self.truncated = self.truncated, False
+            for uri, prefix in list(self.prefixes.items()):
+                changes = {k: v for k, v in pending.items() if k.startswith(prefix)}
+                if not changes and not truncated: continue
+                # 송신 큐가 차면 여기서 대기 → 그동안 들어온 변경은 pending 에서 병합
+                await self.notify(_updated(uri, changes, truncated))
+                SUB_NOTIFY.inc()
+
+class SubscriptionHub:
+    """
+    구독 허브 (프로세스당 1개)
+    - 로컬 쓰기: SharedState.watchers 콜백으로 즉시 수신
+    - 다른 레플리카 쓰기: Redis change_channel 구독 (자기 node_id 메시지는 무시), 알림을 모아 fetch_batch 키씩 MGET
+    """
+    def __init__(self, ssot, max_keys: int = 1000, max_per_session: int = 64, fetch_batch: int = 500):
+        self.ssot = ssot
+        self.max_keys = max_keys
+        self.max_per_session = max_per_session
+        self.fetch_batch = fetch_batch
+        self.subs: Dict[str, Subscriber] = {}
+        self._listener: Optional[asyncio.Task] = None
+        self._closing = False
+        ssot.watchers.append(self._on_change)
+
+    async def start(self) -> None:
+        if self.ssot.redis and self._listener is None:
+            self.ssot.publish_changes = True
+            self._listener = asyncio.create_task(self._listen())
+
+    async def close(self) -> None:
+        self._closing = True
+        if self._listener:
+            self._listener.cancel()
+            await asyncio.gather(self._listener, return_exceptions=True)
+            self._listener = None
+        for sid in list(self.subs): self.drop(sid)
+
+    def subscribe(self, session_id: str, notify: NotifyFn, uri: str, prefix: str = "") -> None:
+        sub = self.subs.get(session_id)
+        if sub is None:
+            sub = self.subs[session_id] = Subscriber(session_id, notify, self.max_keys)
+            sub.task = asyncio.create_task(sub.run())
+        if uri not in sub.prefixes:
+            if len(sub.prefixes) >= self.max_per_session:
+                raise ValueError(f"too many subscriptions (max {self.max_per_session})")
+            SUB_ACTIVE.inc()
+        sub.prefixes[uri] = prefix
+
+    def unsubscribe(self, session_id: str, uri: str) -> bool:
+        sub = self.subs.get(session_id)
+        if sub is None or sub.prefixes.pop(uri, None) is None: return False
+        SUB_ACTIVE.dec()
+        if not sub.prefixes: self.drop(session_id)
+        return True
+
+    def drop(self, session_id: str) -> None:
+        sub = self.subs.pop(session_id, None)
+        if sub is None: return
+        SUB_ACTIVE.dec(len(sub.prefixes))
+        if sub.task: sub.task.cancel()
+
+    def _on_change(self, key: str, value_text: str) -> None:
+        value = None
+        for sub in self.subs.values():
+            if sub.matches(key):
+                if value is None: value = value_text.encode()
+                sub.offer(key, value)
+
+    def _wanted(self, key: str) -> bool:
+        return any(sub.matches(key) for sub in self.subs.values())
+
+    async def _fetch(self, keys: List[str]) -> None:
+        """다른 레플리카가 바꾼 키의 현재 값 조회 → 구독자에게 전달 (삭제/만료된 키는 null)"""
+        ssot = self.ssot
+        vals = await ssot.redis.mget([ssot.key_prefix + k for k in keys])
+        for k, v in zip(keys, vals): self._on_change(k, "null" if v is None else ssot._s(v))
+
+    async def _listen(self) -> None:
+        """change_channel 메시지: "node|key" """
+        ssot = self.ssot
+        # redis-py 의 get_message(timeout) 는 취소를 삼키고 None 을 돌려줄 수 있음 → _closing 으로도 종료
+        while not self._closing:
+            ps = ssot.redis.pubsub()
+            try:
+                await ps.subscribe(ssot.change_channel)
+                for sub in self.subs.values(): sub.resync()  # 구독 공백 동안 놓친 변경 대비
+                while not self._closing:
+                    m = await ps.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                    keys: Dict[str, None] = {}
+                    while m is not None:  # 이미 도착한 알림은 모아서 1회 조회
+                        origin, _, key = ssot._s(m["data"]).partition("|")
+                        if origin != ssot.node_id and self._wanted(key): keys[key] = None
+                        if len(keys) >= self.fetch_batch: break
+                        m = await ps.get_message(ignore_subscribe_messages=True, timeout=0)
+                    if keys: await self._fetch(list(keys))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"change listener error: {e}")
+                await asyncio.sleep(1.0)
+            finally:
+                await ps.aclose()
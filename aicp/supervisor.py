@@ -0,0 +1,148 @@
+# aicp/supervisor.py
+"""
+멀티 프로세스 워커 모드
+
+    WORKERS=4 python -m aicp.supervisor
+
+- 워커 N개를 fork, 각 워커가 SO_REUSEPORT 로 같은 WS/HTTP 포트를 바인딩 (커널이 연결 분산)
+- UVLOOP=1 이면 워커에서 uvloop 사용
+- 세션 상태는 워커 로컬, 전역 상태는 SharedState/Redis 경유
+  → 워커 2개 이상이면 REDIS_URL 필수 (ALLOW_LOCAL_STATE=1 이면 경고 후 워커별 메모리 상태로 실행)
+- Prometheus: PROMETHEUS_MULTIPROC_DIR 로 워커 메트릭을 합산 (어느 워커의 /metrics 든 전체 값)
+- SIGHUP: 롤링 재시작 (새 워커 ready 확인 후 기존 워커 SIGTERM → drain)
+- SIGTERM/SIGINT: 모든 워커 drain 후 종료
+- 종료한 워커는 재기동. stable_after 초 안에 연달아 죽으면 지수 백오프 (최대 backoff_max 초)
+"""
+# 주의: prometheus_client 는 import 시점에 멀티프로세스 모드를 결정하므로
+# 이 모듈은 PROMETHEUS_MULTIPROC_DIR 설정 전까지 aicp.mcp_server 를 import 하지 않는다.
+import os, sys, time, signal, shutil, logging, tempfile
+import multiprocessing as mp
+from typing import Dict, List, Optional
+
+logging.basicConfig(level=os.getenv("LOG_LEVEL","INFO"))
+logger = logging.getLogger("AICP-SUPERVISOR")
+
+_ctx = mp.get_context("fork")
+
+def _worker(ready) -> None:
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)
+    from aicp import mcp_server
+    mcp_server.run(reuse_port=True, on_ready=ready.set)
+
+class Supervisor:
+    def __init__(self, workers: int, drain_timeout: float = 30.0, ready_timeout: float = 30.0,
+                 backoff_base: float = 0.5, backoff_max: float = 30.0, stable_after: float = 10.0):
+        self.n = max(1, workers)
+        self.drain_timeout = drain_timeout
+        self.ready_timeout = ready_timeout
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.stable_after = stable_after
+        self.workers: Dict[int, mp.Process] = {}
+        self.started: Dict[int, float] = {}  # pid -> 시작 시각 (monotonic)
+        self._crashes = 0  # 연속 조기 종료 수
+        self._respawns: List[float] = []  # 예약된 재기동 시각
+        self._stopping = False
+        self._reload = False
+        self._own_prom_dir = False
+
+    def _prepare_metrics_dir(self) -> None:
+        d = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+        if not d:
+            d = tempfile.mkdtemp(prefix="aicp-prom-")
+            os.environ["PROMETHEUS_MULTIPROC_DIR"] = d
+            self._own_prom_dir = True
+        os.makedirs(d, exist_ok=True)
+        for f in os.listdir(d):  # 이전 실행의 잔여 파일 제거
+            if f.endswith(".db"): os.remove(os.path.join(d, f))
+
+    def _spawn(self, wait_ready: bool = False) -> Optional[mp.Process]:
+        ready = _ctx.Event()
+        p = _ctx.Process(target=_worker, args=(ready,), daemon=False)
+        p.start()
+        self.workers[p.pid] = p
+        self.started[p.pid] = time.monotonic()
+        logger.info(f"worker started pid={p.pid}")
+        if wait_ready and not ready.wait(self.ready_timeout):
+            logger.error(f"worker pid={p.pid} not ready after {self.ready_timeout}s")
+            return None
+        return p
+
+    def _stop(self, procs: List[mp.Process]) -> None:
+        for p in procs:
+            if p.is_alive(): p.terminate()  # SIGTERM → 워커 drain
+        deadline = time.monotonic() + self.drain_timeout + 5
+        for p in procs:
+            p.join(max(0.0, deadline - time.monotonic()))
+            if p.is_alive():
+                logger.warning(f"worker pid={p.pid} did not drain in time, killing")
+                p.kill(); p.join()
+            self._reap(p)
+
+    def _reap(self, p: mp.Process) -> None:
+        from prometheus_client import multiprocess
+        self.workers.pop(p.pid, None)
+        self.started.pop(p.pid, None)
+        multiprocess.mark_process_dead(p.pid)
+
+    def _backoff(self, lived: float) -> float:
+        """재기동 지연: 안정적으로 돌다 죽었으면 0, 조기 종료가 이어지면 base * 2^(n-1) (최대 backoff_max)"""
+        self._crashes = 0 if lived >= self.stable_after else self._crashes + 1
+        return min(self.backoff_max, self.backoff_base * 2 ** (self._crashes - 1)) if self._crashes else 0.0
+
+    def _check_workers(self) -> None:
+        now = time.monotonic()
+        for p in list(self.workers.values()):
+            if not p.is_alive():
+                lived = now - self.started.get(p.pid, now)
+                self._reap(p)
+                delay = self._backoff(lived)
+                logger.warning(f"worker pid={p.pid} exited code={p.exitcode} after {lived:.1f}s, restarting in {delay:.1f}s")
+                self._respawns.append(now + delay)
+        due = [t for t in self._respawns if t <= now]
+        if due:
+            self._respawns = [t for t in self._respawns if t > now]
+            for _ in due: self._spawn()
+
+    def _rolling_restart(self) -> None:
+        logger.info("rolling restart")
+        for old in list(self.workers.values()):
+            if self._stopping: return
+            if self._spawn(wait_ready=True) is None:
+                logger.error("rolling restart aborted (new worker not ready)")
+                return
+            self._stop([old])
+        logger.info("rolling restart complete")
+
+    def run(self) -> None:
+        self._prepare_metrics_dir()
+        signal.signal(signal.SIGTERM, lambda *_: setattr(self, "_stopping", True))
+        signal.signal(signal.SIGINT, lambda *_: setattr(self, "_stopping", True))
+        signal.signal(signal.SIGHUP, lambda *_: setattr(self, "_reload", True))
+        logger.info(f"starting {self.n} workers (pid={os.getpid()})")
+        for _ in range(self.n): self._spawn()
+        try:
+            while not self._stopping:
+                time.sleep(0.5)
+                self._check_workers()
+                if self._reload:
+                    self._reload = False
+                    self._rolling_restart()
+        finally:
+            logger.info("stopping workers")
+            self._stop(list(self.workers.values()))
+            if self._own_prom_dir:
+                shutil.rmtree(os.environ["PROMETHEUS_MULTIPROC_DIR"], ignore_errors=True)
+
+def main() -> Optional[int]:
+    workers = int(os.getenv("WORKERS","0")) or (os.cpu_count() or 1)
+    if workers > 1 and not os.getenv("REDIS_URL"):
+        if os.getenv("ALLOW_LOCAL_STATE","0").lower() not in ("1","true","yes"):
+            logger.error(f"{workers} workers without REDIS_URL would each keep separate state; set REDIS_URL, WORKERS=1 or ALLOW_LOCAL_STATE=1")
+            return 2
+        logger.warning(f"{workers} workers without REDIS_URL: shared state, registry and rate limits are per worker")
+    Supervisor(workers, drain_timeout=float(os.getenv("DRAIN_TIMEOUT","30")),
+               backoff_max=float(os.getenv("RESTART_BACKOFF_MAX","30"))).run()
+
+if __name__ == "__main__":
+    sys.exit(main())
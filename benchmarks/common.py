@@ -0,0 +1,67 @@
+# benchmarks/common.py
+"""
+벤치마크 공통: 백분위, RSS, 기준선(JSON) 저장/비교
+- 기준선 파일이 없으면 이번 결과로 생성, 있으면 비교 후 회귀 시 exit 1
+- 지표 이름 규칙: *_ms, *_mb, errors → 낮을수록 좋음 / 그 외(rps, ops_s) → 높을수록 좋음
+"""
+import os, sys, json, math, resource
+from typing import Dict, List, Optional
+
+def percentile(sorted_vals: List[float], p: float) -> float:
+    if not sorted_vals: return float("nan")
+    k = min(len(sorted_vals) - 1, max(0, math.ceil(p / 100 * len(sorted_vals)) - 1))
+    return sorted_vals[k]
+
+def summarize(lat_s: List[float], elapsed: float) -> Dict[str, float]:
+    """지연(초) 목록 → p50/p99/p999(ms), rps"""
+    v = sorted(lat_s)
+    return {
+        "count": len(v),
+        "rps": round(len(v) / elapsed, 1) if elapsed > 0 else 0.0,
+        "p50_ms": round(percentile(v, 50) * 1000, 3),
+        "p99_ms": round(percentile(v, 99) * 1000, 3),
+        "p999_ms": round(percentile(v, 99.9) * 1000, 3),
+    }
+
+def rss_mb() -> float:
+    """현재 RSS (Linux /proc), 없으면 최대 RSS"""
+    try:
+        with open("/proc/self/statm") as f:
+            return round(int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1 << 20), 1)
+    except (OSError, ValueError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return round(peak / (1 << 20 if sys.platform == "darwin" else 1 << 10), 1)
+
+def _lower_is_better(name: str) -> bool:
+    return name.endswith(("_ms", "_mb")) or name == "errors"
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]], tolerance: float) -> List[str]:
+    """기준선 대비 tolerance(비율) 이상 나빠진 지표 목록"""
+    out: List[str] = []
+    for group, metrics in results.items():
+        base = baseline.get(group) or {}
+        for name, val in metrics.items():
+            ref = base.get(name)
+            if name == "count" or not isinstance(ref, (int, float)) or math.isnan(val): continue
+            if not ref:
+                if name == "errors" and val: out.append(f"{group}.errors: {val} vs baseline 0")
+                continue
+            worse = val > ref * (1 + tolerance) if _lower_is_better(name) else val < ref * (1 - tolerance)
+            if worse: out.append(f"{group}.{name}: {val} vs baseline {ref} (tolerance {tolerance:.0%})")
+    return out
+
+def report(results: Dict[str, Dict[str, float]], baseline_path: Optional[str], tolerance: float, update: bool = False) -> int:
+    """결과 출력 + 기준선 처리 → 종료 코드. 기준선에 없는 그룹(새 구성)은 추가만 하고 비교하지 않음"""
+    print(json.dumps(results, indent=2))
+    if not baseline_path: return 0
+    try:
+        with open(baseline_path) as f: baseline = json.load(f)
+    except FileNotFoundError:
+        baseline = {}
+    fresh = {g: m for g, m in results.items() if update or g not in baseline}
+    if fresh:
+        with open(baseline_path, "w") as f: json.dump(dict(baseline, **fresh), f, indent=2, sort_keys=True)
+        print(f"baseline written: {baseline_path} ({', '.join(fresh)})", file=sys.stderr)
+    regressions = compare({g: m for g, m in results.items() if g not in fresh}, baseline, tolerance)
+    for r in regressions: print(f"REGRESSION {r}", file=sys.stderr)
+    return 1 if regressions else 0
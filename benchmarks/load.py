@@ -0,0 +1,179 @@
+# benchmarks/load.py
+"""
+MCP 허브 부하 생성기
+
+    python -m benchmarks.load --sessions 2000 --duration 15
+    python -m benchmarks.load --redis redis://localhost:6379/15          # 로컬 redis-server 백엔드
+    python -m benchmarks.load --url ws://localhost:8765/mcp              # 이미 떠 있는 서버
+    python -m benchmarks.load --mix route=60,share=20,read=15,orchestrate=5 --baseline benchmarks/baseline.json
+
+- 기본: 같은 프로세스에 MCPWebSocketServer 를 127.0.0.1 임의 포트로 띄움 (레이트리밋 해제, orchestrate 는 로컬 echo 실행기)
+- 세션마다 요청 1개씩 닫힌 루프(closed loop)로 전송 → 지연 = 송신~응답 수신
+- 결과: 전체/작업별 p50/p99/p999(ms), rps, 오류 수, RSS(MB, 내장 서버일 때는 서버+클라이언트 합)
+- --url 모드의 orchestrate 는 wait=false (에이전트 없이도 즉시 응답)
+"""
+import argparse, asyncio, itertools, logging, random, resource, sys, time
+from typing import Any, Dict, List, Optional, Tuple
+
+import websockets
+
+from aicp import codec
+from .common import report, rss_mb, summarize
+
+OPS = ("route", "share", "read", "orchestrate")
+MESSAGES = [
+    "Please analyze this dataset and compare the results",
+    "Write a short story about a lighthouse",
+    "Debug this code and optimize the query",
+    "Describe this image",
+]
+
+def parse_mix(spec: str) -> Dict[str, float]:
+    mix: Dict[str, float] = {}
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        name, _, w = part.partition("=")
+        if name not in OPS: raise SystemExit(f"unknown op {name!r} (choose from {', '.join(OPS)})")
+        mix[name] = float(w or 1)
+    if not mix or sum(mix.values()) <= 0: raise SystemExit("empty mix")
+    return mix
+
+def _request(op: str, rid: int, rnd: random.Random, keys: int, external: bool) -> Dict[str, Any]:
+    if op == "route":
+        params = {"name":"route_to_agent","arguments":{"message":rnd.choice(MESSAGES)}}
+        method = "tools/call"
+    elif op == "share":
+        params = {"name":"share_context","arguments":{"context_key":f"bench/{rnd.randrange(keys)}","context_value":{"n":rid,"tags":["a","b"]}}}
+        method = "tools/call"
+    elif op == "read":
+        params = {"uri":"aicp://shared-state","limit":100}
+        method = "resources/read"
+    else:
+        params = {"name":"orchestrate_collaboration","arguments":{"task":"bench task","steps":[
+            {"id":"a","agent":"Claude","task":"plan"},{"id":"b","agent":"GPT-4","task":"do","depends_on":["a"]}],
+            "timeout":1 if external else 10,"wait":not external}}
+        method = "tools/call"
+    return {"jsonrpc":"2.0","id":rid,"method":method,"params":params}
+
+async def _session(url: str, deadline: float, mix: Dict[str, float], keys: int, external: bool, seed: int,
+                   lat: Dict[str, List[float]], errors: Dict[str, int], connect: List[float]) -> None:
+    rnd = random.Random(seed)
+    ops, weights = list(mix), list(mix.values())
+    t0 = time.perf_counter()
+    try:
+        ws = await websockets.connect(url, max_size=1 << 20, open_timeout=30)
+    except Exception:
+        errors["connect"] = errors.get("connect", 0) + 1
+        return
+    connect.append(time.perf_counter() - t0)
+    try:
+        await ws.send(codec.dumps({"jsonrpc":"2.0","id":0,"method":"initialize","params":{"clientInfo":{"name":"bench","version":"0"}}}))
+        await ws.recv()
+        rid = 0
+        while time.perf_counter() < deadline:
+            rid += 1
+            op = rnd.choices(ops, weights)[0]
+            data = codec.dumps(_request(op, rid, rnd, keys, external))
+            t = time.perf_counter()
+            await ws.send(data)
+            resp = codec.loads(await ws.recv())
+            lat[op].append(time.perf_counter() - t)
+            if "error" in resp: errors[op] = errors.get(op, 0) + 1
+    except websockets.ConnectionClosed:
+        errors["closed"] = errors.get("closed", 0) + 1
+    finally:
+        await ws.close()
+
+async def _start_server(redis_url: Optional[str], max_inflight: int) -> Tuple[Any, str, Any]:
+    from aicp.shared_state import SharedState
+    from aicp.neural_bus import NeuralBusMCP
+    from aicp.orchestrator import LocalExecutor
+    from aicp.ratelimit import RateLimits
+    from aicp.mcp_server import AICPMCPBridge, MCPWebSocketServer, HttpApp
+    from aiohttp import web
+    for name in ("AICP-MCP", "websockets", "aiohttp.access"): logging.getLogger(name).setLevel(logging.WARNING)  # 세션별 open/close 로그 생략
+    redis = None
+    if redis_url:
+        from redis.asyncio import Redis
+        redis = Redis.from_url(redis_url, decode_responses=True)
+        await redis.ping()
+        # 이전 실행 잔여 키 제거 (벤치 전용 DB 사용 권장)
+        await redis.flushdb()
+    async def echo(step, inputs): return {"agent":step.agent,"task":step.task}
+    bus = NeuralBusMCP(SharedState(redis=redis), executor=LocalExecutor({"*": echo}))
+    bridge = AICPMCPBridge(bus, limits=RateLimits(session=(1e9, 1 << 30)))
+    server = MCPWebSocketServer(bridge, max_inflight=max_inflight)
+    runner = web.AppRunner(HttpApp(ws=server).make(), access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0, backlog=4096)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"ws://127.0.0.1:{port}/mcp", redis
+
+async def run(a: argparse.Namespace) -> Dict[str, Dict[str, float]]:
+    mix = parse_mix(a.mix)
+    runner = redis = None
+    url = a.url
+    if url is None:
+        runner, url, redis = await _start_server(a.redis, a.max_inflight)
+    lat: Dict[str, List[float]] = {op: [] for op in mix}
+    errors: Dict[str, int] = {}
+    connect: List[float] = []
+    rss_before = rss_mb()
+    start = time.perf_counter()
+    deadline = start + a.ramp + a.duration
+    tasks = []
+    # 연결 폭주를 피해 ramp 초 동안 나눠 접속
+    for i in range(a.sessions):
+        tasks.append(asyncio.create_task(_session(url, deadline, mix, a.keys, a.url is not None, a.seed + i, lat, errors, connect)))
+        if a.ramp and (i + 1) % 100 == 0: await asyncio.sleep(a.ramp * 100 / a.sessions)
+    rss_peak = rss_mb()
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - start
+    rss_after = rss_mb()
+    if runner is not None:
+        await runner.cleanup()
+    if redis is not None:
+        await redis.aclose()
+    backend = "external" if a.url else ("redis" if a.redis else "memory")
+    overall = summarize(list(itertools.chain.from_iterable(lat.values())), elapsed)
+    out: Dict[str, Any] = dict(overall, errors=sum(errors.values()), sessions=len(connect),
+                               connect_p99_ms=summarize(connect, 1)["p99_ms"],
+                               rss_mb=max(rss_peak, rss_after), rss_delta_mb=round(max(rss_peak, rss_after) - rss_before, 1))
+    for op, vals in lat.items():
+        s = summarize(vals, elapsed)
+        out[f"{op}_rps"] = s["rps"]; out[f"{op}_p99_ms"] = s["p99_ms"]
+    if errors: print(f"errors: {errors}", file=sys.stderr)
+    mix_key = ",".join(f"{k}={v:g}" for k, v in mix.items())
+    return {f"load:{backend}:{a.sessions}:{mix_key}": out}
+
+def _raise_nofile(need: int) -> None:
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    want = min(hard, max(soft, need))
+    if want > soft: resource.setrlimit(resource.RLIMIT_NOFILE, (want, hard))
+    if want < need: print(f"warning: RLIMIT_NOFILE {want} < {need}, raise ulimit -n", file=sys.stderr)
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--sessions", type=int, default=1000)
+    ap.add_argument("--duration", type=float, default=10.0, help="seconds of load after ramp-up")
+    ap.add_argument("--ramp", type=float, default=2.0, help="seconds to open all sessions")
+    ap.add_argument("--mix", default="route=70,share=15,read=10,orchestrate=5")
+    ap.add_argument("--keys", type=int, default=1000, help="distinct share_context keys")
+    ap.add_argument("--url", help="target an already running server instead of an in-process one")
+    ap.add_argument("--redis", help="in-process server uses this Redis (FLUSHDB on start; use a scratch db)")
+    ap.add_argument("--max-inflight", type=int, default=32)
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--uvloop", action="store_true")
+    ap.add_argument("--baseline", help="JSON baseline (created if missing)")
+    ap.add_argument("--tolerance", type=float, default=0.2, help="allowed regression ratio")
+    ap.add_argument("--update", action="store_true", help="overwrite baseline with this run")
+    a = ap.parse_args()
+    _raise_nofile(a.sessions * (1 if a.url else 2) + 256)
+    if a.uvloop:
+        import uvloop
+        uvloop.install()
+    results = asyncio.run(run(a))
+    return report(results, a.baseline, a.tolerance, a.update)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,111 @@
+# benchmarks/micro.py
+"""
+마이크로 벤치마크 (ops/s, 높을수록 좋음)
+
+    python -m benchmarks.micro [--baseline benchmarks/baseline.json] [--tolerance 0.2] [--update]
+
+- RoutingEngine.pick / route_batch, RoutingCache 경유 pick (짧은 메시지는 캐시 우회, 긴 템플릿 메시지는 정규화 + 해시 + 조회)
+- 메시지 decode(codec.loads) / encode(codec.encode_response, Raw 결과 포함)
+- JSON Patch 적용
+"""
+import argparse, sys, time
+from typing import Callable, Dict
+
+from aicp import codec
+from aicp.codec import Raw
+from aicp.neural_bus import RoutingEngine
+from aicp.routing_cache import RoutingCache
+from aicp.patch import apply_json_patch
+from .common import report
+
+MESSAGES = [
+    "Please analyze this dataset and compare the quarterly insight",
+    "Write a short story about a robot",
+    "Debug this code and optimize the hot loop",
+    "Describe the image and the audio track",
+    "hello there, nothing to match in this one at all",
+]
+
+# 번호만 다른 긴 템플릿 메시지 (지원 티켓 등)
+LONG_MESSAGES = [
+    f"Ticket #{i}: the customer reports that the export page stalls after signing in, the spinner keeps going "
+    f"and nothing is rendered; they attached logs from session {i * 7919} and ask us to debug it. " * 3
+    for i in range(50)
+]
+
+def bench(fn: Callable[[], object], min_time: float, repeat: int = 3) -> float:
+    """min_time 초 이상 반복 → ops/s (repeat 회 중 최고값, 잡음 완화)"""
+    n = 1
+    while True:
+        t0 = time.perf_counter()
+        for _ in range(n): fn()
+        dt = time.perf_counter() - t0
+        if dt >= min_time: break
+        n = n * 2 if dt < min_time / 10 else int(n * min_time / dt * 1.1) + 1
+    best = n / dt
+    for _ in range(repeat - 1):
+        t0 = time.perf_counter()
+        for _ in range(n): fn()
+        best = max(best, n / (time.perf_counter() - t0))
+    return round(best, 1)
+
+def run(min_time: float) -> Dict[str, float]:
+    eng = RoutingEngine()
+    msgs = iter(MESSAGES * 1000)
+    def pick():
+        nonlocal msgs
+        try: m = next(msgs)
+        except StopIteration: msgs = iter(MESSAGES * 1000); m = next(msgs)
+        eng.pick(m, [])
+    cache = RoutingCache()
+    def pick_cached():
+        nonlocal msgs
+        try: m = next(msgs)
+        except StopIteration: msgs = iter(MESSAGES * 1000); m = next(msgs)
+        eng.choose(cache.infer_task(eng, m, []))
+    longs = iter(LONG_MESSAGES * 100)
+    def pick_long():
+        nonlocal longs
+        try: m = next(longs)
+        except StopIteration: longs = iter(LONG_MESSAGES * 100); m = next(longs)
+        eng.pick(m, [])
+    def pick_long_cached():
+        nonlocal longs
+        try: m = next(longs)
+        except StopIteration: longs = iter(LONG_MESSAGES * 100); m = next(longs)
+        eng.choose(cache.infer_task(eng, m, []))
+    batch = [(m, []) for m in MESSAGES] * 200  # 1000 건
+    request = codec.dumpb({"jsonrpc":"2.0","id":42,"method":"tools/call","params":{"name":"route_to_agent",
+                           "arguments":{"message":MESSAGES[0],"target_capabilities":["analysis"]}}})
+    payload = {"status":"routed","agent":"Claude","intent":{"primary_task":"analysis"},"suggestion":"Use Claude for this request",
+               "timestamp":"2025-01-01T00:00:00+00:00"}
+    text = codec.dumpb(codec.dumps(payload))
+    doc = {"items": list(range(1000)), "meta": {"title": "t", "tags": ["a", "b"]}}
+    ops = [{"op":"add","path":"/items/-","value":1},{"op":"replace","path":"/meta/title","value":"x"}]
+    return {
+        "pick_ops_s": bench(pick, min_time),
+        "pick_cached_ops_s": bench(pick_cached, min_time),
+        "pick_long_ops_s": bench(pick_long, min_time),
+        "pick_long_cached_ops_s": bench(pick_long_cached, min_time),
+        "route_batch_1k_ops_s": bench(lambda: eng.route_batch(batch), min_time),
+        "decode_request_ops_s": bench(lambda: codec.loads(request), min_time),
+        # tools/call 응답 경로: payload 직렬화 → text 이스케이프 → envelope 이어붙이기
+        "encode_response_ops_s": bench(lambda: codec.encode_response({"jsonrpc":"2.0","id":42,"result":Raw(
+            b'{"content":[{"type":"text","text":' + codec.dumpb(codec.dumps(payload)) + b'}]}')}), min_time),
+        "encode_raw_only_ops_s": bench(lambda: codec.encode_response({"jsonrpc":"2.0","id":42,"result":Raw(
+            b'{"content":[{"type":"text","text":' + text + b'}]}')}), min_time),
+        "json_patch_ops_s": bench(lambda: apply_json_patch(doc, ops), min_time),
+    }
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--min-time", type=float, default=0.5, help="seconds per benchmark")
+    ap.add_argument("--baseline", help="JSON baseline (created if missing)")
+    ap.add_argument("--tolerance", type=float, default=0.2, help="allowed regression ratio")
+    ap.add_argument("--update", action="store_true", help="overwrite baseline with this run")
+    a = ap.parse_args()
+    results = {f"micro:{codec.BACKEND}": run(a.min_time)}
+    return report(results, a.baseline, a.tolerance, a.update)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,5 +1,5 @@
 #!/usr/bin/env bash
 set -e
-URL="${1:-http://localhost:8080/health}"
+URL="${1:-http://localhost:8765/health}"
 echo "Checking $URL ..."
 curl -fsS "$URL" && echo "OK" || (echo "FAILED" && exit 1)
@@ -186,7 +186,7 @@ print_connection_info() {
     echo "  ws://localhost:8765/mcp"
     echo ""
     echo -e "${GREEN}테스트:${NC}"
-    echo "  curl http://localhost:8080/health"
+    echo "  curl http://localhost:8765/health"
     echo ""
 }
 
@@ -0,0 +1,131 @@
+import asyncio, base64, json, os
+
+import fakeredis
+from fakeredis import aioredis
+
+from aicp import codec
+from aicp.blobs import BlobStore, ref_digest
+from aicp.shared_state import SharedState
+from aicp.neural_bus import NeuralBusMCP
+from aicp.ratelimit import RateLimits
+from aicp.mcp_server import AICPMCPBridge, MCPSession
+
+CHUNK = 64
+
+def stores(tmp_path):
+    """(디스크, fakeredis) 백엔드 — Redis 블롭은 bytes 응답 클라이언트"""
+    return [lambda: BlobStore(directory=str(tmp_path / "blobs"), chunk_size=CHUNK),
+            lambda: BlobStore(redis=aioredis.FakeRedis(server=fakeredis.FakeServer()), chunk_size=CHUNK)]
+
+async def stored(store: BlobStore) -> int:
+    if store.redis is not None: return len(await store.redis.keys(store.prefix + "*"))
+    return sum(len(files) for _, _, files in os.walk(store.directory))
+
+# ---- BlobStore ----
+def test_same_content_is_stored_once(tmp_path):
+    async def main(store):
+        data = b"abc" * 100
+        a = await store.put(data); b = await store.put(data, "text/plain")
+        await store.put(b"other")
+        return a, b, await stored(store)
+    for make in stores(tmp_path):
+        a, b, n = asyncio.run(main(make()))
+        assert a["$blob"] == b["$blob"] and a["size"] == 300 and b["type"] == "text/plain"
+        assert n == 2
+
+def test_ranged_reads(tmp_path):
+    texts = b"".join(b"%04d," % i for i in range(200))  # 압축됨
+    noise = os.urandom(500)  # 압축 이득 없음 → 원문 청크
+    async def main(store):
+        out = []
+        for data in (texts, noise):
+            digest = (await store.put(data))["$blob"]
+            meta = await store.stat(digest)
+            reads = [await store.read(digest, off, n) for off, n in ((0, 10), (CHUNK - 3, 10), (100, 3 * CHUNK), (490, 100), (len(data), 5))]
+            out.append((data, meta, reads, await store.get(digest)))
+        missing = await store.read("sha256:" + "0" * 64), await store.read("../../etc/passwd")
+        return out, missing
+    for make in stores(tmp_path):
+        out, missing = asyncio.run(main(make()))
+        for data, meta, reads, whole in out:
+            assert meta["n"] == -(-len(data) // CHUNK) and whole == data
+            assert reads == [(data[0:10], len(data)), (data[CHUNK - 3:CHUNK + 7], len(data)), (data[100:100 + 3 * CHUNK], len(data)),
+                             (data[490:590], len(data)), (b"", len(data))]
+        assert out[0][1]["codec"] != "none" and out[1][1]["codec"] == "none"
+        assert missing == (None, None)
+
+# ---- SharedState ----
+def backends(tmp_path):
+    def redis():
+        server = fakeredis.FakeServer()
+        return SharedState(redis=aioredis.FakeRedis(server=server, decode_responses=True), blob_threshold=200, blob_gc_interval=0,
+                           blobs=BlobStore(redis=aioredis.FakeRedis(server=server), chunk_size=CHUNK))
+    return [lambda: SharedState(blobs=BlobStore(directory=str(tmp_path / "blobs"), chunk_size=CHUNK), blob_threshold=200, blob_gc_interval=0),
+            redis]
+
+def test_large_values_are_offloaded_and_patchable(tmp_path):
+    async def main(ssot):
+        v1 = await ssot.set_json("doc", {"items": list(range(100))})
+        ref1 = await ssot.get("doc")
+        v2 = await ssot.patch("doc", [{"op":"add","path":"/items/-","value":100}, {"op":"add","path":"/name","value":"x"}])
+        ref2 = await ssot.get("doc")
+        small = await ssot.set_json("small", {"a": 1})
+        return v1, v2, ref1, ref2, json.loads(await ssot.blobs.get(ref_digest(ref2))), await ssot.get("small")
+    for make in backends(tmp_path):
+        v1, v2, ref1, ref2, doc, small = asyncio.run(main(make()))
+        assert (v1, v2) == (1, 2)
+        assert ref_digest(ref1) and ref_digest(ref2) and ref1 != ref2
+        assert json.loads(ref2)["type"] == "application/json"
+        assert doc == {"items": list(range(101)), "name": "x"}
+        assert small == '{"a":1}'  # 임계값 미만은 그대로
+
+def test_collect_removes_only_unreferenced_blobs(tmp_path):
+    async def main(ssot):
+        await ssot.set_json("a", {"v": "a" * 300})
+        await ssot.set_json("b", {"v": "b" * 300})
+        nested = await ssot.blobs.put(b"n" * 300)
+        await ssot.set_json("c", {"attachment": nested})  # 중첩 참조도 살아 있음
+        orphan = ref_digest(await ssot.get("b"))
+        await ssot.set_json("b", {"v": "short"})
+        kept = await ssot.collect_blobs(grace=3600)  # grace 이내는 회수하지 않음
+        removed = await ssot.collect_blobs(grace=-1)
+        return kept, removed, await ssot.blobs.stat(orphan), await ssot.blobs.get(ref_digest(await ssot.get("a"))), await ssot.blobs.get(nested["$blob"])
+    for make in backends(tmp_path):
+        kept, removed, orphan, a, nested = asyncio.run(main(make()))
+        assert kept == 0 and removed == 1 and orphan is None
+        assert json.loads(a) == {"v": "a" * 300} and nested == b"n" * 300
+
+# ---- upload_blob / aicp://blob ----
+def make_bridge(tmp_path, **kw):
+    ssot = SharedState(blobs=BlobStore(directory=str(tmp_path / "blobs"), chunk_size=CHUNK), blob_gc_interval=0)
+    return AICPMCPBridge(NeuralBusMCP(ssot), limits=RateLimits(session=(1e9, 1 << 30)), **kw)
+
+def rpc(bridge, session, method, params):
+    resp = asyncio.run(bridge.handle({"jsonrpc":"2.0","id":1,"method":method,"params":params}, session))
+    return codec.loads(codec.encode_response(resp))
+
+def upload(bridge, session, **args):
+    out = rpc(bridge, session, "tools/call", {"name":"upload_blob","arguments":args})
+    return json.loads(out["result"]["content"][0]["text"]) if "result" in out else out["error"]
+
+def test_upload_in_parts_and_read_range(tmp_path):
+    bridge = make_bridge(tmp_path); session = MCPSession(session_id="s1")
+    part = upload(bridge, session, data=base64.b64encode(b"\x00" * 100).decode(), encoding="base64", final=False)
+    ref = upload(bridge, session, data=base64.b64encode(b"\x01" * 100).decode(), encoding="base64", upload_id=part["upload_id"])
+    assert part["received"] == 100 and ref["size"] == 200 and ref["type"] == "application/octet-stream"
+    assert not session.uploads
+    out = rpc(bridge, session, "resources/read", {"uri":f"aicp://blob/{ref['$blob']}?offset=90&length=20"})["result"]["contents"][0]
+    assert base64.b64decode(out["blob"]) == b"\x00" * 10 + b"\x01" * 10 and out["size"] == 200
+    assert rpc(bridge, session, "resources/read", {"uri":f"aicp://blob/{ref['$blob']}?offset=-1"})["error"]["code"] == -32602
+    assert rpc(bridge, session, "resources/read", {"uri":"aicp://blob/sha256:" + "0" * 64})["error"]["code"] == -32602
+
+def test_abandoned_uploads_are_bounded(tmp_path):
+    bridge = make_bridge(tmp_path, max_blob=150, max_uploads=2); session = MCPSession(session_id="s1")
+    ids = [upload(bridge, session, data="x" * 10, final=False)["upload_id"] for _ in range(2)]
+    assert upload(bridge, session, data="x", final=False)["code"] == -32000  # 세션당 진행 중 업로드 상한
+    assert upload(bridge, session, data="x" * 200, upload_id=ids[0])["code"] == -32000  # 크기 초과 → 업로드 폐기
+    assert list(session.uploads) == [ids[1]]
+    assert upload(bridge, session, data="x" * 10, upload_id=ids[0])["code"] == -32602
+    assert "upload_id" in upload(bridge, session, data="x", final=False)  # 자리가 다시 생김
+    # 업로드는 세션에 묶임: 다른 세션에서는 이어 쓸 수 없음
+    assert upload(bridge, MCPSession(session_id="s2"), data="x", upload_id=ids[1])["code"] == -32602
@@ -0,0 +1,133 @@
+import asyncio, json
+
+import websockets
+from aiohttp import web
+
+from aicp import codec
+from aicp.shared_state import SharedState
+from aicp.neural_bus import NeuralBusMCP
+from aicp.ratelimit import RateLimits
+from aicp.mcp_server import AICPMCPBridge, MCPSession, MCPMessage, MCPWebSocketServer, HttpApp
+
+def make_bridge(**kw) -> AICPMCPBridge:
+    return AICPMCPBridge(NeuralBusMCP(SharedState()), limits=RateLimits(session=(1e9, 1 << 30)), **kw)
+
+def call(bridge, msg):
+    """송신되는 바이트 그대로 다시 파싱 (Raw 결과 포함)"""
+    resp = asyncio.run(bridge.handle(msg, MCPSession(session_id="s1")))
+    return None if resp is None else codec.loads(codec.encode_response(resp))
+
+def tool(bridge, name, arguments):
+    return call(bridge, {"jsonrpc":"2.0","id":1,"method":"tools/call","params":{"name":name,"arguments":arguments}})
+
+# ---- JSON-RPC 2.0 ----
+def test_error_responses_carry_null_id():
+    assert MCPMessage(error={"code":-32700,"message":"Parse error"}).to_dict()["id"] is None
+    bridge = make_bridge()
+    assert call(bridge, [])["id"] is None
+    assert call(bridge, [1]) == [{"jsonrpc":"2.0","error":{"code":-32600,"message":"Invalid Request"},"id":None}]
+    assert call(bridge, {"jsonrpc":"2.0","id":None,"method":"nope"})["id"] is None
+
+def test_notifications_get_no_response():
+    assert call(make_bridge(), {"jsonrpc":"2.0","method":"tools/list"}) is None
+
+def test_batch_elements_count_against_max_inflight():
+    async def main():
+        bridge = make_bridge()
+        active = peak = 0
+        handle = bridge.handle_one
+        async def slow(msg, session):
+            nonlocal active, peak
+            active += 1; peak = max(peak, active)
+            await asyncio.sleep(0.02)
+            active -= 1
+            return await handle(msg, session)
+        bridge.handle_one = slow
+        server = MCPWebSocketServer(bridge, max_inflight=3)
+        runner = web.AppRunner(HttpApp(ws=server).make()); await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0); await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        try:
+            async with websockets.connect(f"ws://127.0.0.1:{port}/mcp") as ws:
+                await ws.send(json.dumps([{"jsonrpc":"2.0","id":i,"method":"tools/list"} for i in range(10)]))
+                out = json.loads(await ws.recv())
+        finally:
+            await runner.cleanup()
+        return peak, sorted(r["id"] for r in out)
+    peak, ids = asyncio.run(main())
+    assert peak <= 3
+    assert ids == list(range(10))
+
+# ---- Invalid params ----
+def test_ws_batch_nested_array_is_invalid_request():
+    async def main():
+        server = MCPWebSocketServer(make_bridge())
+        runner = web.AppRunner(HttpApp(ws=server).make()); await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0); await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        try:
+            async with websockets.connect(f"ws://127.0.0.1:{port}/mcp") as ws:
+                await ws.send(json.dumps([[{"jsonrpc":"2.0","id":1,"method":"tools/list"}], {"jsonrpc":"2.0","id":2,"method":"tools/list"}]))
+                return json.loads(await asyncio.wait_for(ws.recv(), 2))
+        finally:
+            await runner.cleanup()
+    out = asyncio.run(main())
+    bridge_out = call(make_bridge(), [[{"jsonrpc":"2.0","id":1,"method":"tools/list"}]])
+    assert bridge_out == [{"jsonrpc":"2.0","error":{"code":-32600,"message":"Invalid Request"},"id":None}]
+    assert len(out) == 2 and out[0] == bridge_out[0] and out[1]["id"] == 2  # WS 와 HTTP 경로가 같은 결과
+
+def test_non_object_params_are_invalid():
+    bridge = make_bridge()
+    assert call(bridge, {"jsonrpc":"2.0","id":1,"method":"tools/call","params":[1, 2]})["error"]["code"] == -32602
+    assert call(bridge, {"jsonrpc":"2.0","id":1,"method":"initialize","params":{"clientInfo":"x"}})["error"]["code"] == -32602
+    assert call(bridge, {"jsonrpc":"2.0","id":1,"method":"tools/call","params":{"name":["x"]}})["error"]["code"] == -32602
+    assert call(bridge, {"jsonrpc":"2.0","id":1,"method":"prompts/get","params":{"name":{}}})["error"]["code"] == -32602
+    assert call(bridge, {"jsonrpc":"2.0","id":1,"method":"resources/read","params":{"uri":5}})["error"]["code"] == -32602
+
+def test_non_object_arguments_are_invalid():
+    bridge = make_bridge()
+    assert call(bridge, {"jsonrpc":"2.0","id":1,"method":"tools/call","params":{"name":"route_to_agent","arguments":"hi"}})["error"]["code"] == -32602
+    assert tool(bridge, "route_to_agent", {"message":5})["error"]["code"] == -32602
+    assert tool(bridge, "route_to_agent", {"message":"hi","target_capabilities":[None]})["error"]["code"] == -32602
+    assert tool(bridge, "agent_heartbeat", {"name":"a","inflight":"many"})["error"]["code"] == -32602
+    assert tool(bridge, "register_agent", {"name":"a","skills":{"code":"high"}})["error"]["code"] == -32602
+
+def test_share_context_requires_key():
+    bridge = make_bridge()
+    assert tool(bridge, "share_context", {"context_value":1})["error"] == {"code":-32602,"message":"context_key is required"}
+    text = tool(bridge, "share_context", {"context_key":"k","context_value":1})["result"]["content"][0]["text"]
+    assert json.loads(text)["status"] == "shared"
+
+def test_route_batch_validates_items():
+    bridge = make_bridge()
+    err = tool(bridge, "route_batch", {"messages":["hi", None, 5]})["error"]
+    assert err["code"] == -32602 and "messages[1]" in err["message"]
+    assert tool(bridge, "route_batch", {"messages":[{"message":"x","target_capabilities":"code"}]})["error"]["code"] == -32602
+    out = json.loads(tool(bridge, "route_batch", {"messages":["write code", {"message":"analyze data"}]})["result"]["content"][0]["text"])
+    assert len(out["results"]) == 2
+
+# ---- drain ----
+def test_drain_stops_listening_before_waiting_for_sessions():
+    async def main():
+        server = MCPWebSocketServer(make_bridge())
+        runner = web.AppRunner(HttpApp(ws=server).make()); await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0); await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        try:
+            async with websockets.connect(f"ws://127.0.0.1:{port}/mcp") as ws:
+                drain = asyncio.create_task(server.drain(0.5, runner.sites))
+                await asyncio.sleep(0.05)
+                try:
+                    await asyncio.open_connection("127.0.0.1", port); refused = False
+                except OSError:
+                    refused = True
+                await ws.send(json.dumps({"jsonrpc":"2.0","id":1,"method":"tools/list"}))  # 기존 세션은 계속 동작
+                served = "result" in json.loads(await ws.recv())
+                await drain
+                await asyncio.sleep(0.05)
+                return refused, served, ws.close_code, server.conns
+        finally:
+            await runner.cleanup()
+    refused, served, code, conns = asyncio.run(main())
+    assert refused and served
+    assert code == 1001 and not conns
@@ -0,0 +1,97 @@
+import asyncio, os, time
+
+from aicp.mem_store import MemoryStore
+
+def opened(path, **kw) -> MemoryStore:
+    store = MemoryStore(path=str(path), **kw); store.load()
+    return store
+
+def reopen(store: MemoryStore, **kw) -> MemoryStore:
+    path = store.path
+    asyncio.run(store.close())
+    return opened(path, **kw)
+
+# ---- 영속화 ----
+def test_aof_replay(tmp_path):
+    store = opened(tmp_path / "state")
+    store.set("a", '"1"'); store.set("a", '"2"'); store.set("b", '"x"'); store.set("c", '"y"')
+    store.delete("b")
+    store = reopen(store)
+    assert store.get("a") == '"2"' and store.version("a") == 2
+    assert store.get("b") is None and store.get("c") == '"y"'
+    store.set("a", '"3"')
+    assert reopen(store).version("a") == 3
+
+def test_snapshot_then_segments(tmp_path):
+    store = opened(tmp_path / "state")
+    for i in range(50): store.set(f"k{i}", str(i))
+    asyncio.run(store.compact())
+    store.set("k0", "100"); store.delete("k1"); store.set("new", "1")
+    segments = store._segments()
+    store = reopen(store)
+    assert segments == [2] and os.path.exists(str(tmp_path / "state") + ".snap")  # 스냅샷에 포함된 세그먼트는 삭제
+    assert len(store) == 50 and store.get("k0") == "100" and store.get("k1") is None and store.get("new") == "1"
+    assert store.version("k0") == 2 and store.version("k2") == 1
+
+def test_truncated_tail_is_ignored(tmp_path):
+    store = opened(tmp_path / "state")
+    store.set("a", "1")
+    seg = store._seg_path(store._segment)
+    asyncio.run(store.close())
+    with open(seg, "ab") as f: f.write(b'["s","b","2"')  # 기록 도중 중단
+    store = opened(tmp_path / "state")
+    assert store.get("a") == "1" and store.get("b") is None
+
+def test_ttl_survives_restart(tmp_path):
+    store = opened(tmp_path / "state")
+    store.set("short", "1", ttl=0.2); store.set("long", "2", ttl=60); store.set("forever", "3")
+    expires = store.entry("long").expires
+    asyncio.run(store.close())
+    time.sleep(0.3)
+    store = opened(tmp_path / "state")
+    assert store.get("short") is None
+    assert store.get("long") == "2" and store.entry("long").expires == expires
+    assert store.entry("forever").expires is None
+
+def test_second_process_runs_without_persistence(tmp_path):
+    first = opened(tmp_path / "state")
+    second = opened(tmp_path / "state")
+    assert first._log is not None and second.path is None and second._log is None
+    asyncio.run(first.close())
+
+# ---- TTL / 축출 ----
+def test_expired_keys_are_removed():
+    removed = []
+    store = MemoryStore(); store.on_remove = removed.append
+    store.set("a", "1", ttl=0.05); store.set("b", "2", ttl=60)
+    time.sleep(0.06)
+    assert store.expire() == 1 and removed == ["a"] and len(store) == 1
+
+def test_lru_eviction():
+    store = MemoryStore(max_bytes=3 * 123)  # 키 2자 + 값 1자 + 오버헤드 120
+    for k in ("k0", "k1", "k2"): store.set(k, "x")
+    store.get("k0")  # 최근 사용
+    store.set("k3", "x")
+    assert sorted(store.data) == ["k0", "k2", "k3"] and store.evictions == 1
+    assert store.bytes <= store.max_bytes
+
+def test_lfu_eviction():
+    store = MemoryStore(max_bytes=3 * 123, policy="lfu")
+    for k in ("k0", "k1", "k2"): store.set(k, "x")
+    for _ in range(3): store.get("k0"); store.get("k2")
+    store.get("k1")
+    store.set("k3", "x")
+    assert sorted(store.data) == ["k0", "k2", "k3"]
+
+# ---- 스냅샷 (undo) ----
+def test_snapshot_sees_point_in_time_view():
+    store = MemoryStore()
+    store.set("a", "1"); store.set("b", "2")
+    with store.snapshot() as snap:
+        store.set("a", "10"); store.delete("b"); store.set("c", "3")
+        assert dict(snap.items()) == {"a": "1", "b": "2"}
+        assert snap.get("c") is None and snap.get("a").version == 1
+        assert set(snap.undo) == {"a", "b"}  # 바뀐 키만 보관
+    store.set("a", "11")
+    assert not store.snapshots and not snap.undo.get("c")
+    assert dict(store.snapshot().items()) == {"a": "11", "c": "3"}
@@ -0,0 +1,43 @@
+import asyncio, json, logging
+
+import fakeredis
+from fakeredis import aioredis
+from prometheus_client import REGISTRY
+
+from aicp.metrics import Tracer, observe_phase, instrument_redis
+from aicp.mcp_server import MCPSession
+from test_mcp_bridge import make_bridge
+
+def sample(name, **labels) -> float:
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+def test_observe_phase_records_histogram():
+    labels = {"method":"test/phase","tool":"t","phase":"handler"}
+    before = sample("aicp_rpc_phase_seconds_count", **labels), sample("aicp_rpc_phase_seconds_sum", **labels)
+    observe_phase("test/phase", "t", "handler", 0.25); observe_phase("test/phase", "t", "handler", 0.5)
+    assert sample("aicp_rpc_phase_seconds_count", **labels) - before[0] == 2
+    assert sample("aicp_rpc_phase_seconds_sum", **labels) - before[1] == 0.75
+
+def test_instrument_redis_records_commands_and_pipelines():
+    async def main():
+        redis = instrument_redis(aioredis.FakeRedis(server=fakeredis.FakeServer(), decode_responses=True))
+        assert instrument_redis(redis) is redis  # 두 번 감싸지 않음
+        await redis.set("k", "v"); await redis.get("k")
+        pipe = redis.pipeline(transaction=True); pipe.get("k"); await pipe.execute()
+        pipe = redis.pipeline(transaction=False); pipe.get("k"); await pipe.execute()
+    names = ("SET", "GET", "MULTI", "PIPELINE")
+    before = [sample("aicp_redis_command_seconds_count", command=c) for c in names]
+    asyncio.run(main())
+    assert [sample("aicp_redis_command_seconds_count", command=c) - b for c, b in zip(names, before)] == [1, 1, 1, 1]
+
+def test_tracer_samples_and_logs_spans(caplog):
+    assert Tracer(0.0).start("x") is None
+    bridge = make_bridge(); bridge.tracer = Tracer(1.0)
+    with caplog.at_level(logging.INFO, logger="AICP-TRACE"):
+        asyncio.run(bridge.handle({"jsonrpc":"2.0","id":1,"method":"tools/call",
+                                   "params":{"name":"route_to_agent","arguments":{"message":"write code"}}}, MCPSession(session_id="s1")))
+    spans = [json.loads(r.getMessage().split(" ", 1)[1]) for r in caplog.records if r.name == "AICP-TRACE"]
+    assert len(spans) == 1
+    span = spans[0]
+    assert span["name"] == "tools/call" and span["tool"] == "route_to_agent" and span["session"] == "s1"
+    assert span["error"] is None and span["duration_ms"] >= 0 and "limiter_ms" in span and "handler_ms" in span
@@ -0,0 +1,111 @@
+import asyncio
+
+from aicp import codec
+from aicp.shared_state import SharedState
+from aicp.neural_bus import NeuralBusMCP
+from aicp.orchestrator import Orchestrator, LocalExecutor, Step
+
+def diamond():
+    return [Step("a","x","a"), Step("b","x","b",["a"]), Step("c","y","c",["a"]), Step("d","x","d",["b","c"])]
+
+def run(handler, steps, timeout=5.0):
+    async def main():
+        ssot = SharedState()
+        orch = Orchestrator(ssot, LocalExecutor({"*": handler}), agent_cap=lambda agent: 4, ttl=60)
+        out = await orch.run("job1", "t", steps, timeout)
+        return out, await ssot.dump_all()
+    return asyncio.run(main())
+
+# ---- DAG ----
+def test_steps_run_in_dependency_order():
+    order = []
+    async def handler(step, inputs):
+        order.append(step.id)
+        await asyncio.sleep(0.01)
+        return {"step": step.id, "inputs": sorted(inputs)}
+    out, state = run(handler, diamond())
+    assert out["status"] == "completed" and not out["errors"] and not out["skipped"]
+    assert order[0] == "a" and order[-1] == "d" and set(order[1:3]) == {"b","c"}
+    assert out["results"]["d"] == {"step":"d","inputs":["b","c"]}
+    # 단계 키는 정리되고 결과는 작업 기록에 남음
+    assert list(state) == ["jobs/job1"]
+    record = codec.loads(state["jobs/job1"])
+    assert record["status"] == "completed" and record["results"] == out["results"]
+
+def test_failure_skips_only_dependents():
+    async def handler(step, inputs):
+        if step.id == "b": raise RuntimeError("boom")
+        return step.id
+    out, _ = run(handler, diamond())
+    assert out["status"] == "partial"
+    assert out["errors"] == {"b": "RuntimeError: boom"}
+    assert set(out["results"]) == {"a","c"} and out["skipped"] == ["d"]
+
+def test_job_timeout_cancels_running_steps():
+    cancelled = []
+    async def handler(step, inputs):
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(step.id); raise
+    out, state = run(handler, [Step("a","x","a"), Step("b","x","b",["a"])], timeout=0.05)
+    assert out["status"] == "timeout" and cancelled == ["a"]
+    assert out["skipped"] == ["a","b"] and list(state) == ["jobs/job1"]
+
+def test_step_timeout_is_an_error():
+    async def handler(step, inputs):
+        await asyncio.sleep(10 if step.id == "a" else 0)
+    out, _ = run(handler, [Step("a","x","a",timeout=0.02), Step("b","x","b")])
+    assert out["status"] == "partial" and out["errors"] == {"a": "TimeoutError"}
+
+def test_invalid_plans_are_rejected():
+    for steps in ([Step("a","x","a"), Step("a","x","b")], [Step("a","x","a",["z"])], [Step("a","x","a",["b"]), Step("b","x","b",["a"])]):
+        try:
+            Orchestrator.validate(steps)
+        except ValueError:
+            continue
+        raise AssertionError(steps)
+
+# ---- 백그라운드 작업 취소 ----
+def test_cancel_requires_owner():
+    async def main():
+        started = asyncio.Event()
+        async def handler(step, inputs):
+            started.set(); await asyncio.sleep(10)
+        ssot = SharedState()
+        bus = NeuralBusMCP(ssot, executor=LocalExecutor({"*": handler}))
+        out = await bus.orchestrate_collaboration("t", ["x"], "s1", steps=[{"id":"a"}], owner="session:s1")
+        await started.wait()
+        job_id = out["job_id"]
+        denied = bus.cancel_job(job_id, "session:s2")
+        allowed = bus.cancel_job(job_id, "session:s1")
+        for _ in range(100):
+            if job_id not in bus._jobs: break
+            await asyncio.sleep(0.01)
+        return out["status"], denied, allowed, await ssot.get_json(f"jobs/{job_id}")
+    status, denied, allowed, record = asyncio.run(main())
+    assert status == "accepted"
+    assert not denied and allowed
+    assert record["status"] == "cancelled" and record["results"] == {}
+
+def test_background_job_reports_progress():
+    async def main():
+        seen = []
+        async def handler(step, inputs): return step.id
+        async def progress(done, total, message): seen.append((done, total))
+        bus = NeuralBusMCP(SharedState(), executor=LocalExecutor({"*": handler}))
+        out = await bus.orchestrate_collaboration("t", ["x"], "s1", steps=[{"id":"a"},{"id":"b","depends_on":["a"]}], progress=progress)
+        for _ in range(100):
+            if out["job_id"] not in bus._jobs: break
+            await asyncio.sleep(0.01)
+        return out["status"], seen
+    assert asyncio.run(main()) == ("accepted", [(1, 2), (2, 2)])
+
+# ---- 인자 검증 ----
+def test_malformed_arguments_are_invalid_params():
+    from test_mcp_bridge import make_bridge, tool
+    bridge = make_bridge()
+    for args in ({"task":"t","steps":["a"]}, {"task":"t","steps":"a"}, {"task":"t","agents":"ab"}, {"task":5},
+                 {"task":"t","steps":[{"id":"a","timeout":"1"}]}, {"task":"t","steps":[{"id":1}]},
+                 {"task":"t","steps":[{"id":"a","depends_on":"b"}]}, {"task":"t","timeout":-1}):
+        assert tool(bridge, "orchestrate_collaboration", args)["error"]["code"] == -32602, args
@@ -0,0 +1,147 @@
+import asyncio, json
+
+import fakeredis
+from fakeredis import aioredis
+
+from aicp.patch import PatchError, apply_json_patch, merge_patch
+from aicp.shared_state import SharedState, VersionConflict
+from test_mcp_bridge import make_bridge, tool
+
+def fails(doc, ops):
+    try:
+        apply_json_patch(doc, ops)
+    except PatchError:
+        return True
+    return False
+
+# ---- RFC 6902 ----
+def test_json_patch_ops():
+    doc = {"a": {"b": [1, 2]}, "c": "x"}
+    out = apply_json_patch(doc, [
+        {"op":"add","path":"/a/b/1","value":9},
+        {"op":"add","path":"/a/b/-","value":3},
+        {"op":"remove","path":"/c"},
+        {"op":"replace","path":"/a/b/0","value":0},
+        {"op":"copy","from":"/a/b","path":"/d"},
+        {"op":"move","from":"/a","path":"/e"},
+        {"op":"add","path":"/k~1v","value":{"~":1}},
+        {"op":"test","path":"/k~1v/~0","value":1},
+    ])
+    assert out == {"d": [0, 9, 2, 3], "e": {"b": [0, 9, 2, 3]}, "k/v": {"~": 1}}
+    assert doc == {"a": {"b": [1, 2]}, "c": "x"}  # 입력은 그대로
+    assert out["d"] is not out["e"]["b"]  # copy 는 깊은 복사
+    assert apply_json_patch(doc, [{"op":"replace","path":"","value":5}]) == 5
+
+def test_json_patch_errors():
+    doc = {"a": [1], "n": None}
+    assert fails(doc, [{"op":"remove","path":"/zz"}])
+    assert fails(doc, [{"op":"add","path":"/a/5","value":1}])
+    assert fails(doc, [{"op":"add","path":"/a/01","value":1}])
+    assert fails(doc, [{"op":"replace","path":"/zz","value":1}])
+    assert fails(doc, [{"op":"move","from":"/a","path":"/a/0"}])
+    assert fails(doc, [{"op":"add","path":"a","value":1}])
+    assert fails(doc, [{"op":"add","path":"/b"}])
+    assert fails(doc, [{"op":"frob","path":"/a"}])
+    assert fails(doc, {"op":"add"})
+    # 중간 실패 시 부분 적용 없음
+    assert fails(doc, [{"op":"add","path":"/b","value":1}, {"op":"test","path":"/b","value":2}]) and doc == {"a": [1], "n": None}
+
+def test_test_op_compares_json_types():
+    doc = {"i": 1, "f": 1.0, "t": True, "l": [1, {"x": 0}], "n": None}
+    assert not fails(doc, [{"op":"test","path":"/l","value":[1, {"x": 0}]}, {"op":"test","path":"/n","value":None}])
+    assert fails(doc, [{"op":"test","path":"/i","value":True}])
+    assert fails(doc, [{"op":"test","path":"/t","value":1}])
+    assert not fails(doc, [{"op":"test","path":"/i","value":1.0}, {"op":"test","path":"/f","value":1}])  # 숫자는 값으로 비교
+    assert fails(doc, [{"op":"test","path":"/f","value":True}])
+    assert fails(doc, [{"op":"test","path":"/i","value":"1"}])
+    assert fails(doc, [{"op":"test","path":"/l","value":[True, {"x": False}]}])
+    assert fails(doc, [{"op":"test","path":"/l/1","value":{"x": 0, "y": 1}}])
+
+# ---- RFC 7396 ----
+def test_merge_patch():
+    doc = {"title": "Goodbye!", "author": {"givenName": "John", "familyName": "Doe"}, "tags": ["example", "sample"]}
+    patch = {"title": "Hello!", "phoneNumber": "+01-123-456-7890", "author": {"familyName": None}, "tags": ["example"]}
+    assert merge_patch(doc, patch) == {"title": "Hello!", "author": {"givenName": "John"}, "tags": ["example"], "phoneNumber": "+01-123-456-7890"}
+    assert doc["author"] == {"givenName": "John", "familyName": "Doe"}
+    assert merge_patch({"a": "b"}, {"a": {"bb": None}}) == {"a": {}}
+    assert merge_patch({"a": "b"}, ["c"]) == ["c"]
+    assert merge_patch(None, {"a": 1}) == {"a": 1}
+
+# ---- SharedState: CAS / since_version ----
+def backends():
+    return [lambda: SharedState(), lambda: SharedState(redis=aioredis.FakeRedis(server=fakeredis.FakeServer(), decode_responses=True))]
+
+def test_cas_version_conflict():
+    async def main(ssot):
+        v1 = await ssot.set_json("k", {"n": 0})
+        v2 = await ssot.patch("k", {"n": 1}, "merge-patch", if_version=v1)
+        try:
+            await ssot.patch("k", {"n": 2}, "merge-patch", if_version=v1)
+        except VersionConflict as e:
+            conflict = e.version
+        return v1, v2, conflict, await ssot.get_json("k")
+    for make in backends():
+        assert asyncio.run(main(make())) == (1, 2, 2, {"n": 1})
+
+def test_concurrent_patches_are_not_lost():
+    async def main(ssot):
+        await ssot.set_json("k", [])
+        await asyncio.gather(*(ssot.patch("k", [{"op":"add","path":"/-","value":i}]) for i in range(20)))
+        return await ssot.get_versioned("k")
+    for make in backends():
+        text, version = asyncio.run(main(make()))
+        assert sorted(json.loads(text)) == list(range(20)) and version == 21
+
+def test_changes_since_returns_patches_or_value():
+    async def main(ssot):
+        await ssot.set_json("k", {"a": 1})
+        await ssot.patch("k", {"b": 2}, "merge-patch")
+        await ssot.patch("k", [{"op":"remove","path":"/a"}])
+        diff = await ssot.changes_since("k", 1)
+        current = await ssot.changes_since("k", 3)
+        await ssot.set_json("k", {"c": 3})  # set() 은 로그를 비움 → 전체 값
+        reset = await ssot.changes_since("k", 3)
+        return diff, current, reset
+    for make in backends():
+        diff, current, reset = asyncio.run(main(make()))
+        assert diff == {"version": 3, "patches": [
+            {"v": 2, "type": "merge-patch", "patch": {"b": 2}},
+            {"v": 3, "type": "json-patch", "patch": [{"op":"remove","path":"/a"}]}]}
+        assert current == {"version": 3, "patches": []}
+        assert reset == {"version": 4, "value": {"c": 3}}
+
+def test_cas_set_matches_plain_set():
+    async def main(ssot):
+        await ssot.set_json("k", {"a": 1}, ttl=60)
+        await ssot.patch("k", {"b": 2}, "merge-patch")
+        v = await ssot.patch("k", {"c": 3}, "set", if_version=2)  # share_context(if_version=...)
+        reset = await ssot.changes_since("k", 2)
+        await ssot.patch("k", {"d": 4}, "merge-patch")
+        logged = await ssot.changes_since("k", 3)
+        await ssot.patch("k", {"e": 5}, "set", if_version=4, ttl=30)
+        if ssot.redis:
+            return v, reset, logged, await ssot.redis.llen(ssot.log_prefix + "k"), await ssot.redis.pttl(ssot.key_prefix + "k")
+        return v, reset, logged, len(ssot.logs.get("k", ())), ssot.mem.entry("k").expires
+    for make in backends():
+        v, reset, logged, log_len, ttl = asyncio.run(main(make()))
+        assert v == 3 and reset == {"version": 3, "value": {"c": 3}}  # 로그를 비움 → 전체 값
+        assert logged == {"version": 4, "patches": [{"v": 4, "type": "merge-patch", "patch": {"d": 4}}]}
+        assert log_len == 0
+        assert ttl is not None and ttl > 0  # ttl 지정 시 만료 설정
+    async def persist(ssot):  # ttl 미지정 CAS set 은 set() 과 같이 만료 해제
+        await ssot.set_json("k", 1, ttl=60)
+        await ssot.patch("k", 2, "set", if_version=1)
+        return await ssot.redis.pttl(ssot.key_prefix + "k") if ssot.redis else ssot.mem.entry("k").expires
+    assert [asyncio.run(persist(make())) for make in backends()] == [None, -1]
+
+# ---- 도구 오류 코드 ----
+def test_patch_context_errors():
+    bridge = make_bridge()
+    asyncio.run(bridge.bus.ssot.set("raw", "not json"))
+    assert tool(bridge, "patch_context", {"context_key":"raw","patch":{"a":1}})["error"]["code"] == -32602
+    tool(bridge, "share_context", {"context_key":"k","context_value":{"a":1}})
+    assert tool(bridge, "patch_context", {"context_key":"k","patch":[{"op":"test","path":"/a","value":True}]})["error"]["code"] == -32602
+    err = tool(bridge, "patch_context", {"context_key":"k","patch":{"a":2},"if_version":5})["error"]
+    assert err["code"] == -32009 and err["data"] == {"version": 1}
+    out = json.loads(tool(bridge, "patch_context", {"context_key":"k","patch":{"a":2},"if_version":1})["result"]["content"][0]["text"])
+    assert out["version"] == 2
@@ -0,0 +1,90 @@
+import asyncio
+
+import fakeredis
+from fakeredis import aioredis
+
+from aicp.ratelimit import RateLimiter, RateLimits, RateLimited
+
+def fake(server=None):
+    return aioredis.FakeRedis(server=server or fakeredis.FakeServer(), decode_responses=True)
+
+async def attempt(limits: RateLimits, limiter=None, tenant="default", tool=None):
+    """통과하면 None, 거부되면 RateLimited"""
+    try:
+        await limits.acquire(limiter or RateLimiter(1e9, 1 << 30), tenant, tool)
+    except RateLimited as e:
+        return e
+
+def rejected(*args, **kw):
+    return asyncio.run(attempt(*args, **kw))
+
+# ---- 로컬 토큰버킷 ----
+def test_burst_then_refill():
+    b = RateLimiter(rate_per_sec=10, burst=3)
+    assert [b.reserve(1, 0) for _ in range(3)] == [0.0, 0.0, 0.0]
+    retry = b.reserve(1, 0)
+    assert 0.09 < -retry <= 0.1  # 거부는 토큰을 쓰지 않음
+    b.updated -= 0.25  # 0.25초 경과 → 2.5개 충전
+    assert b.reserve(1, 0) == 0.0 and b.reserve(1, 0) == 0.0
+    assert b.reserve(1, 0) < 0
+
+def test_refill_is_capped_at_burst():
+    b = RateLimiter(rate_per_sec=10, burst=2)
+    b.updated -= 60
+    assert b.reserve(2, 0) == 0.0 and b.reserve(1, 0) < 0
+
+def test_wait_reserves_ahead_for_concurrent_callers():
+    b = RateLimiter(rate_per_sec=10, burst=1)
+    waits = [b.reserve(1) for _ in range(3)]
+    assert waits[0] == 0.0
+    assert abs(waits[1] - 0.1) < 0.01 and abs(waits[2] - 0.2) < 0.01
+
+def test_reject_mode_reports_retry_after():
+    limits = RateLimits(session=(10, 2), mode="reject")
+    session = limits.session_bucket()
+    assert rejected(limits, session) is None and rejected(limits, session) is None
+    err = rejected(limits, session)
+    assert err.scope == "session" and 0.09 < err.retry_after <= 0.1
+
+def test_tool_limits_are_per_tenant_and_tool():
+    limits = RateLimits(tools=RateLimits.parse_tools("route_batch=1:2"), mode="reject")
+    assert limits.tools == {"route_batch": (1.0, 2)}
+    assert [rejected(limits, tool="route_batch") for _ in range(2)] == [None, None]
+    assert rejected(limits, tool="route_batch").scope == "tool"
+    assert rejected(limits, tenant="other", tool="route_batch") is None
+    assert rejected(limits, tool="route_to_agent") is None  # 한도 없는 도구
+
+# ---- Redis 분산 버킷 ----
+def test_tenant_bucket_is_shared_across_replicas():
+    async def main():
+        server = fakeredis.FakeServer()
+        a = RateLimits(tenant=(1, 3), redis=fake(server), mode="reject")
+        b = RateLimits(tenant=(1, 3), redis=fake(server), mode="reject")
+        return [await attempt(x) for x in (a, b, a, b)], await attempt(b, tenant="t2")
+    results, other = asyncio.run(main())
+    assert results[:3] == [None, None, None]
+    assert results[3].scope == "tenant" and 0.5 < results[3].retry_after <= 1.0
+    assert other is None
+
+def test_redis_bucket_refills():
+    async def main():
+        limits = RateLimits(tools={"t": (50, 1)}, redis=fake(), mode="reject")
+        first, second = await attempt(limits, tool="t"), await attempt(limits, tool="t")
+        await asyncio.sleep(0.05)
+        return first, second, await attempt(limits, tool="t")
+    first, second, third = asyncio.run(main())
+    assert first is None and second is not None and third is None
+
+def test_redis_wait_mode_and_fallback():
+    async def main():
+        limits = RateLimits(tools={"t": (20, 1)}, redis=fake(), max_wait=1.0)
+        loop = asyncio.get_running_loop(); start = loop.time()
+        for _ in range(3): await limits.acquire(RateLimiter(), tool="t")
+        elapsed = loop.time() - start
+        bucket = limits._shared[("tool", "default:t")]
+        async def down(**kw): raise ConnectionError("redis down")
+        bucket.script = down  # Redis 오류 → 로컬 버킷
+        return elapsed, await bucket.reserve(1, 0), await bucket.reserve(1, 0)
+    elapsed, first, second = asyncio.run(main())
+    assert 0.08 < elapsed < 0.5
+    assert first == 0.0 and second < 0
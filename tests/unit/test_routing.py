@@ -0,0 +1,59 @@
+import asyncio
+
+from aicp.neural_bus import RoutingEngine, TASKS
+from aicp.agent_registry import AgentRegistry
+from aicp.routing_cache import RoutingCache
+
+def full_tables(engine: RoutingEngine):
+    """invalidate() 로 처음부터 계산한 점수표 (비교 기준)"""
+    ref = RoutingEngine(engine.tie_epsilon)
+    ref.weights = {a: dict(w) for a, w in engine.weights.items()}
+    return ref.scores, ref.best, {t: sorted(v) for t, v in ref.top.items()}
+
+def test_infer_task_keyword_priority():
+    engine = RoutingEngine()
+    assert engine.infer_task("please debug and analyze this", []) == "analysis"
+    assert engine.infer_task("write some code", []) == "creative"
+    assert engine.infer_task("hello", ["technical"]) == "technical"
+
+def test_heartbeat_refreshes_scores_without_recompiling():
+    async def main():
+        engine = RoutingEngine()
+        reg = AgentRegistry(engine)
+        matcher, signature, version = engine._matcher, engine.signature, engine.version
+        await reg.register("Local", capabilities=["code"], skills={"technical":1.0}, base_cost=0.1)
+        await reg.heartbeat("Local", inflight=4, latency_ms=100)
+        await reg.heartbeat("Claude", inflight=8, latency_ms=4000)
+        return engine, matcher, signature, version
+    engine, matcher, signature, version = asyncio.run(main())
+    assert engine._matcher is matcher and engine.signature == signature
+    assert engine.version > version
+    assert engine.weights["Local"]["load"] == 0.5
+    assert engine.best["technical"] == "Local"
+    scores, best, top = full_tables(engine)
+    assert engine.scores == scores and engine.best == best
+    assert {t: sorted(v) for t, v in engine.top.items()} == top
+
+def test_expired_agents_are_removed_or_restored():
+    async def main():
+        engine = RoutingEngine()
+        reg = AgentRegistry(engine, ttl=30)
+        await reg.register("Local", skills={"creative":1.0})
+        await reg.heartbeat("GPT-4", inflight=8)
+        for st in reg.agents.values(): st.updated -= 60
+        reg._expire()
+        return engine
+    engine = asyncio.run(main())
+    assert "Local" not in engine.weights and all("Local" not in engine.scores[t] for t in TASKS)
+    assert engine.weights["GPT-4"]["load"] == 0.3  # 정적 값 복원
+    assert engine.best["creative"] == "GPT-4"
+
+def test_routing_cache_only_for_long_messages():
+    engine = RoutingEngine(); cache = RoutingCache(min_length=64)
+    assert cache.infer_task(engine, "debug this", []) == "technical" and not cache.entries
+    long = "ticket 17: the export page stalls after sign in, please " + "look into it " * 5 + "and debug"
+    assert cache.infer_task(engine, long, []) == engine.infer_task(long, []) == "technical"
+    assert len(cache.entries) == 1
+    assert cache.infer_task(engine, long.replace("17", "42"), []) == "technical" and len(cache.entries) == 1  # 숫자만 다른 템플릿
+    engine.keywords = dict(engine.keywords, analysis=["analyze", "debug"])  # 규칙 변경 → signature 변경
+    assert cache.infer_task(engine, long, []) == "analysis" and len(cache.entries) == 1
@@ -0,0 +1,50 @@
+import asyncio, json
+
+from aicp.routing_history import RoutingHistory, FileSink
+
+def filled(capacity, rows):
+    h = RoutingHistory(capacity=capacity)
+    for i, (session, agent) in enumerate(rows): h.append(float(i), session, agent, "task", f"m{i}")
+    return h
+
+def messages(records):
+    return [r["message"] for r in records]
+
+# ---- 링버퍼 ----
+def test_ring_keeps_last_capacity_records():
+    h = filled(3, [("s1", "a")] * 5)
+    assert len(h) == 3 and [r.message for r in h] == ["m2", "m3", "m4"]
+    assert messages(h.recent()) == ["m4", "m3", "m2"]
+    assert messages(h.recent(limit=2)) == ["m4", "m3"]
+
+def test_evicted_records_leave_the_indexes():
+    h = filled(3, [("s1", "a"), ("s2", "b"), ("s1", "a"), ("s3", "a"), ("s3", "c")])
+    assert set(h.by_session) == {"s1", "s3"} and list(h.by_session["s1"]) == [2]
+    assert set(h.by_agent) == {"a", "c"} and list(h.by_agent["a"]) == [2, 3]
+    assert h.recent(session_id="s2") == [] and h.recent(agent="b") == []
+    assert sum(map(len, h.by_session.values())) == sum(map(len, h.by_agent.values())) == len(h)
+
+def test_recent_filters():
+    h = filled(10, [("s1", "a"), ("s1", "b"), ("s2", "a"), ("s1", "a"), ("s2", "b")])
+    assert messages(h.recent(session_id="s1")) == ["m3", "m1", "m0"]
+    assert messages(h.recent(agent="a")) == ["m3", "m2", "m0"]
+    assert messages(h.recent(session_id="s1", agent="a")) == ["m3", "m0"]
+    assert messages(h.recent(session_id="s1", agent="a", limit=1)) == ["m3"]
+    assert h.recent(session_id="s1", agent="zz") == [] and h.recent(session_id="nope") == []
+    rec = h.recent(limit=1)[0]
+    assert rec["session_id"] == "s2" and rec["selected_agent"] == "b" and rec["intent"] == {"primary_task": "task"}
+
+# ---- sink ----
+def test_file_sink_flushes_on_close(tmp_path):
+    path = tmp_path / "history.jsonl"
+    async def main():
+        h = RoutingHistory(capacity=2, sink=FileSink(str(path)), flush_interval=60, flush_batch=1000)
+        await h.start()
+        for i in range(5): h.append(float(i), "s1", "a", "task", f"m{i}")
+        written = path.exists()
+        await h.close()
+        return written, h.pending, h.dropped
+    written, pending, dropped = asyncio.run(main())
+    lines = [json.loads(l) for l in path.read_text().splitlines()]
+    assert not written and not pending and dropped == 0  # flush_interval 전에는 기록하지 않음
+    assert [l["message"] for l in lines] == ["m0", "m1", "m2", "m3", "m4"]  # 링에서 밀려난 기록도 저장
@@ -0,0 +1,133 @@
+import asyncio, json, time
+
+import jwt
+import websockets
+from aiohttp import web
+
+from aicp import security
+from aicp.security import AuthError, TokenVerifier
+from aicp.shared_state import SharedState
+from aicp.neural_bus import NeuralBusMCP
+from aicp.ratelimit import RateLimits
+from aicp.mcp_server import AICPMCPBridge, MCPSession, MCPWebSocketServer, HttpApp
+
+SECRET = "test-secret"
+
+def token(sub="u1", exp=60, **claims) -> str:
+    return jwt.encode(dict(claims, sub=sub, exp=int(time.time() + exp)), SECRET, algorithm="HS256")
+
+def counting(monkeypatch, delay=0.0):
+    """verify_jwt 호출 수 집계"""
+    calls = []
+    verify = security.verify_jwt
+    def spy(*args):
+        calls.append(args[0]); time.sleep(delay)
+        return verify(*args)
+    monkeypatch.setattr(security, "verify_jwt", spy)
+    return calls
+
+async def rejected(verifier, tok):
+    try:
+        await verifier.verify(tok)
+    except AuthError as e:
+        return str(e)
+
+# ---- TokenVerifier ----
+def test_cache_hit_and_lru(monkeypatch):
+    calls = counting(monkeypatch)
+    async def main():
+        v = TokenVerifier(SECRET, cache_size=2)
+        a, b, c = token("a"), token("b"), token("c")
+        first = await v.verify("Bearer " + a)
+        again = await v.verify(a)
+        await v.verify(b); await v.verify(c)  # a 축출
+        await v.verify(a)
+        return first, again
+    first, again = asyncio.run(main())
+    assert first is again and first.sub == "a"
+    assert len(calls) == 4
+
+def test_expired_claims_are_reverified(monkeypatch):
+    calls = counting(monkeypatch)
+    async def main():
+        v = TokenVerifier(SECRET)
+        tok = token()
+        claims = await v.verify(tok)
+        claims.exp = time.time() - 1  # 캐시 항목 만료
+        fresh = await v.verify(tok)
+        return claims, fresh, await rejected(v, token(exp=-10))
+    claims, fresh, expired = asyncio.run(main())
+    assert fresh is not claims and len(calls) == 3
+    assert "expired" in expired
+
+def test_concurrent_verifications_are_coalesced(monkeypatch):
+    calls = counting(monkeypatch, delay=0.05)
+    async def main():
+        v = TokenVerifier(SECRET, offload=True)
+        try:
+            tok = token()
+            out = await asyncio.gather(*(v.verify(tok) for _ in range(5)))
+            bad = await asyncio.gather(*(rejected(v, "not-a-jwt") for _ in range(3)))
+            return out, bad
+        finally:
+            v.close()
+    out, bad = asyncio.run(main())
+    assert all(c is out[0] for c in out) and all(bad)
+    assert len(calls) == 2
+
+def test_failed_tokens_are_cached_briefly(monkeypatch):
+    calls = counting(monkeypatch)
+    async def main():
+        v = TokenVerifier(SECRET, fail_ttl=0.05)
+        first = [await rejected(v, "not-a-jwt") for _ in range(3)]
+        await asyncio.sleep(0.06)
+        return first, await rejected(v, "not-a-jwt")
+    first, later = asyncio.run(main())
+    assert all(first) and later and len(calls) == 2
+
+# ---- 브리지 ----
+def make_bridge(**kw) -> AICPMCPBridge:
+    kw.setdefault("limits", RateLimits(session=(1e9, 1 << 30)))
+    return AICPMCPBridge(NeuralBusMCP(SharedState()), auth=TokenVerifier(SECRET), **kw)
+
+def rpc(bridge, session, method, params):
+    return asyncio.run(bridge.handle({"jsonrpc":"2.0","id":1,"method":method,"params":params}, session))
+
+def test_tool_scopes_are_enforced():
+    bridge = make_bridge(); session = MCPSession(session_id="s1")
+    assert rpc(bridge, session, "tools/list", {})["error"]["code"] == -32001  # initialize 전
+    assert "result" in rpc(bridge, session, "initialize", {"authorization":"Bearer " + token(scopes=["route"], tenant="t1")})
+    assert session.tenant == "t1"
+    routed = rpc(bridge, session, "tools/call", {"name":"route_to_agent","arguments":{"message":"write code"}})
+    denied = rpc(bridge, session, "tools/call", {"name":"share_context","arguments":{"context_key":"k","context_value":1}})
+    assert "result" in routed and denied["error"]["code"] == -32003
+    session.claims.exp = time.time() - 1
+    assert rpc(bridge, session, "tools/list", {})["error"]["code"] == -32001 and session.claims is None
+
+def test_initialize_token_checks_are_rate_limited():
+    bridge = make_bridge(limits=RateLimits(session=(0.01, 2), mode="reject"))
+    session = MCPSession(session_id="s1", limiter=bridge.limits.session_bucket())
+    codes = [rpc(bridge, session, "initialize", {"authorization":f"bad-{i}"})["error"]["code"] for i in range(3)]
+    assert codes == [-32001, -32001, -32029]
+
+def test_bad_handshake_token_gets_401():
+    async def main():
+        server = MCPWebSocketServer(make_bridge())
+        runner = web.AppRunner(HttpApp(ws=server).make()); await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0); await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        url = f"ws://127.0.0.1:{port}/mcp"
+        try:
+            try:
+                await websockets.connect(url, extra_headers={"Authorization":"Bearer nope"})
+                status = None
+            except websockets.exceptions.InvalidStatusCode as e:
+                status = e.status_code
+            async with websockets.connect(url, extra_headers={"Authorization":"Bearer " + token()}) as ws:
+                await ws.send(json.dumps({"jsonrpc":"2.0","id":1,"method":"tools/list"}))
+                ok = json.loads(await ws.recv())
+            return status, ok, len(server.conns)
+        finally:
+            await runner.cleanup()
+    status, ok, conns = asyncio.run(main())
+    assert status == 401 and "result" in ok and conns == 0
@@ -0,0 +1,100 @@
+import asyncio
+
+import fakeredis
+from fakeredis import aioredis
+
+from aicp.shared_state import SharedState
+from aicp.state_cache import LocalCache
+
+def fake(server=None):
+    return aioredis.FakeRedis(server=server or fakeredis.FakeServer(), decode_responses=True)
+
+async def fill(ssot: SharedState, n: int):
+    for i in range(n): await ssot.set(f"k{i:03d}", f'"v{i}"')
+
+# ---- 전체 조회 (SCAN + MGET) ----
+def test_iter_items_and_dump_all_redis():
+    async def main():
+        ssot = SharedState(redis=fake(), scan_count=7)
+        await fill(ssot, 50)
+        await ssot.redis.set("other:key", "x")  # 접두사 밖 키는 제외
+        chunks = [c async for c in ssot.iter_items()]
+        return chunks, await ssot.dump_all()
+    chunks, dump = asyncio.run(main())
+    assert len(chunks) > 1
+    assert dump == {f"k{i:03d}": f'"v{i}"' for i in range(50)}
+    assert sum(map(len, chunks)) == 50
+
+def test_page_walks_every_key_redis():
+    async def main():
+        ssot = SharedState(redis=fake())
+        await fill(ssot, 120)
+        seen, cursor, pages = {}, None, 0
+        while True:
+            items, cursor = await ssot.page(cursor, 25)
+            seen.update(items); pages += 1
+            if cursor is None: return seen, pages
+    seen, pages = asyncio.run(main())
+    assert len(seen) == 120 and seen["k007"] == '"v7"'
+    assert pages > 1
+
+def test_page_memory():
+    async def main():
+        ssot = SharedState()
+        await fill(ssot, 10)
+        first, cursor = await ssot.page(None, 4)
+        rest = {}
+        while cursor is not None:
+            items, cursor = await ssot.page(cursor, 4); rest.update(items)
+        return first, rest, await ssot.dump_all()
+    first, rest, dump = asyncio.run(main())
+    assert list(first) == ["k000", "k001", "k002", "k003"]
+    assert len(first) + len(rest) == 10 == len(dump)
+
+def test_page_rejects_bad_cursor():
+    async def main():
+        try:
+            await SharedState().page("-1", 10)
+        except ValueError:
+            return True
+    assert asyncio.run(main())
+
+# ---- 로컬 캐시 + 레플리카 무효화 ----
+def test_cache_is_invalidated_by_other_replica():
+    async def main():
+        server = fakeredis.FakeServer()
+        a = SharedState(redis=fake(server), cache=LocalCache())
+        b = SharedState(redis=fake(server), cache=LocalCache())
+        await a.start(); await b.start()
+        await asyncio.sleep(0.05)  # 구독 연결
+        try:
+            await a.set("k", '"1"')
+            assert await b.get("k") == '"1"'
+            assert b.cache.get("k") == '"1"'  # b 로컬 캐시에 적재
+            await a.set("k", '"2"')
+            for _ in range(100):
+                if b.cache.get("k") is None: break
+                await asyncio.sleep(0.01)
+            return await b.get("k"), a.cache.get("k")
+        finally:
+            await a.close(); await b.close()
+    b_value, a_cached = asyncio.run(main())
+    assert b_value == '"2"'
+    assert a_cached == '"2"'  # 쓴 쪽은 자기 캐시를 새 값으로 갱신
+
+def test_cache_fill_skipped_after_invalidation():
+    cache = LocalCache()
+    token = cache.token("k")
+    cache.invalidate("k")  # 읽는 도중 다른 쓰기
+    assert not cache.fill("k", "old", token)
+    assert cache.get("k") is None
+    assert cache.fill("k", "new", cache.token("k")) and cache.get("k") == "new"
+
+def test_delete_drops_value_and_version():
+    async def main(redis):
+        ssot = SharedState(redis=redis)
+        await ssot.set("a", '"1"', ttl=60); await ssot.set("b", '"2"')
+        n = await ssot.delete("a", "b", "missing")
+        return n, await ssot.get_versioned("a"), await ssot.dump_all()
+    for redis in (fake(), None):
+        assert asyncio.run(main(redis)) == (2, (None, 0), {})
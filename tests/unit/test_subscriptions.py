@@ -0,0 +1,92 @@
+import asyncio
+
+import fakeredis
+from fakeredis import aioredis
+
+from aicp.mem_store import MemoryStore
+from aicp.shared_state import SharedState
+from aicp.subscriptions import SubscriptionHub
+
+def fake(server):
+    return aioredis.FakeRedis(server=server, decode_responses=True)
+
+async def until(cond, tries=200):
+    for _ in range(tries):
+        if cond(): return True
+        await asyncio.sleep(0.01)
+    return False
+
+def test_local_changes_are_coalesced_per_key():
+    async def main():
+        ssot = SharedState(); hub = SubscriptionHub(ssot)
+        got = []
+        async def notify(msg): got.append(msg["params"].decode())
+        hub.subscribe("s1", notify, "aicp://shared-state?prefix=jobs/", "jobs/")
+        await ssot.set("jobs/a", '"1"'); await ssot.set("jobs/a", '"2"'); await ssot.set("other", '"x"')
+        await until(lambda: got)
+        await hub.close()
+        return got
+    assert asyncio.run(main()) == [{"uri":"aicp://shared-state?prefix=jobs/","changes":{"jobs/a":"2"}}]
+
+def test_local_removals_notify_null():
+    async def main(ssot):
+        hub = SubscriptionHub(ssot); got = {}
+        async def notify(msg): got.update(msg["params"].decode()["changes"])
+        hub.subscribe("s1", notify, "aicp://shared-state?prefix=jobs/", "jobs/")
+        await ssot.set("jobs/a", '"1"'); await ssot.set("jobs/b", '"2"', ttl=0.02)
+        await until(lambda: len(got) == 2); got.clear()
+        await ssot.delete("jobs/a")
+        await asyncio.sleep(0.03)
+        if not ssot.redis: ssot.mem.expire()  # 내장 저장소 만료
+        await until(lambda: len(got) == (1 if ssot.redis else 2))
+        await hub.close()
+        return got
+    assert asyncio.run(main(SharedState())) == {"jobs/a": None, "jobs/b": None}
+    assert asyncio.run(main(SharedState(redis=fake(fakeredis.FakeServer())))) == {"jobs/a": None}
+
+def test_eviction_notifies_null():
+    async def main():
+        ssot = SharedState(mem=MemoryStore(max_bytes=2 * 130)); hub = SubscriptionHub(ssot); got = {}
+        async def notify(msg): got.update(msg["params"].decode()["changes"])
+        hub.subscribe("s1", notify, "aicp://shared-state", "")
+        for k in ("k0", "k1", "k2"): await ssot.set(k, '"x"')
+        await until(lambda: got.get("k0", 0) is None)
+        await hub.close()
+        return got, sorted(ssot.mem.data)
+    got, left = asyncio.run(main())
+    assert got["k0"] is None and left == ["k1", "k2"]
+
+def test_replica_changes_publish_keys_and_fetch_values():
+    async def main():
+        server = fakeredis.FakeServer()
+        a, b = SharedState(redis=fake(server)), SharedState(redis=fake(server))
+        hub_a, hub_b = SubscriptionHub(a), SubscriptionHub(b)
+        await hub_a.start(); await hub_b.start()
+        tap = fake(server).pubsub(); await tap.subscribe(a.change_channel)
+        got = []
+        async def notify(msg): got.append(msg["params"].decode())
+        await asyncio.sleep(0.05)  # 구독 연결 + 최초 resync 알림 이후부터 수집
+        hub_b.subscribe("s1", notify, "aicp://shared-state?prefix=jobs/", "jobs/")
+        try:
+            await a.set("jobs/a", '{"big":"' + "x" * 1000 + '"}')
+            await a.set("other", '"ignored"')
+            await until(lambda: got)
+            published = []
+            for _ in range(5):  # 첫 호출은 subscribe 확인 메시지를 소비하고 None
+                m = await tap.get_message(ignore_subscribe_messages=True, timeout=0.05)
+                if m is not None: published.append(m["data"])
+            return got, published, a.node_id
+        finally:
+            await tap.aclose(); await hub_a.close(); await hub_b.close()
+    got, published, node = asyncio.run(main())
+    assert published == [f"{node}|jobs/a", f"{node}|other"]  # 값은 발행하지 않음
+    assert got == [{"uri":"aicp://shared-state?prefix=jobs/","changes":{"jobs/a":{"big":"x" * 1000}}}]
+
+def test_close_stops_listener():
+    async def main():
+        ssot = SharedState(redis=fake(fakeredis.FakeServer()))
+        hub = SubscriptionHub(ssot); await hub.start()
+        await asyncio.sleep(0.02)
+        await asyncio.wait_for(hub.close(), 3)
+        return hub._listener
+    assert asyncio.run(main()) is None
@@ -0,0 +1,37 @@
+from aicp import supervisor
+from aicp.supervisor import Supervisor
+
+def test_crash_loop_backs_off_exponentially():
+    sup = Supervisor(2, backoff_base=0.5, backoff_max=4.0, stable_after=10.0)
+    assert [sup._backoff(1.0) for _ in range(6)] == [0.5, 1.0, 2.0, 4.0, 4.0, 4.0]
+    assert sup._backoff(60.0) == 0.0  # 안정적으로 돌던 워커는 즉시 재기동, 카운터 초기화
+    assert sup._backoff(1.0) == 0.5
+
+def test_multiple_workers_require_redis(monkeypatch):
+    ran = []
+    monkeypatch.setattr(Supervisor, "run", lambda self: ran.append(self.n))
+    monkeypatch.delenv("REDIS_URL", raising=False)
+    monkeypatch.setenv("WORKERS", "4")
+    assert supervisor.main() == 2 and ran == []
+    monkeypatch.setenv("ALLOW_LOCAL_STATE", "1")
+    assert supervisor.main() is None and ran == [4]
+    monkeypatch.delenv("ALLOW_LOCAL_STATE")
+    monkeypatch.setenv("REDIS_URL", "redis://localhost:6379/0")
+    monkeypatch.setenv("WORKERS", "1")
+    assert supervisor.main() is None and ran == [4, 1]
+
+def test_dead_worker_respawn_is_delayed(monkeypatch):
+    class Dead:
+        pid = 101; exitcode = 1
+        def is_alive(self): return False
+    now = [100.0]
+    monkeypatch.setattr(supervisor.time, "monotonic", lambda: now[0])
+    sup = Supervisor(1, backoff_base=2.0)
+    spawned = []
+    sup._spawn = lambda wait_ready=False: spawned.append(now[0])
+    sup._reap = lambda p: sup.workers.pop(p.pid, None)
+    sup.workers[101] = Dead(); sup.started[101] = 99.0
+    sup._check_workers()
+    assert spawned == [] and sup._respawns == [102.0]
+    now[0] = 102.0; sup._check_workers()
+    assert spawned == [102.0] and sup._respawns == []
@@ -0,0 +1,79 @@
+import asyncio
+
+import fakeredis
+from fakeredis import aioredis
+
+from aicp.shared_state import SharedState
+
+def fake(server=None):
+    return aioredis.FakeRedis(server=server or fakeredis.FakeServer(), decode_responses=True)
+
+def test_coalesced_writers_share_one_version():
+    async def main():
+        ssot = SharedState(redis=fake(), write_window=0.02)
+        batches = []
+        write = ssot._write_batch
+        async def spy(batch):
+            batches.append(sorted(batch)); return await write(batch)
+        ssot._write_batch = spy
+        versions = await asyncio.gather(*(ssot.set("k", f'"{i}"') for i in range(5)), ssot.set("other", '"x"'))
+        value = await ssot.redis.get("aicp:ssot:k")
+        await ssot.close()
+        return versions, value, batches
+    versions, value, batches = asyncio.run(main())
+    assert versions == [1, 1, 1, 1, 1, 1]
+    assert value == '"4"'  # 마지막 값만 기록
+    assert batches == [["k", "other"]]
+
+def test_reads_see_buffered_values():
+    async def main():
+        ssot = SharedState(redis=fake(), write_window=10, write_ack="buffer")
+        ack = await ssot.set("k", '"v"')
+        read, stored = await ssot.get("k"), await ssot.redis.get("aicp:ssot:k")
+        versioned = await ssot.get_versioned("k")  # 버전 조회는 먼저 플러시
+        await ssot.close()
+        return ack, read, stored, versioned
+    assert asyncio.run(main()) == (None, '"v"', None, ('"v"', 1))
+
+def test_close_flushes_buffer():
+    async def main():
+        server = fakeredis.FakeServer()
+        ssot = SharedState(redis=fake(server), write_window=10, write_ack="buffer")
+        for i in range(3): await ssot.set(f"k{i}", f'"{i}"', ttl=60 if i == 2 else None)
+        await ssot.close()
+        redis = fake(server)
+        return await redis.mget(["aicp:ssot:k0", "aicp:ssot:k1", "aicp:ssot:k2"]), await redis.pttl("aicp:ssot:k2")
+    values, ttl = asyncio.run(main())
+    assert values == ['"0"', '"1"', '"2"'] and 0 < ttl <= 60000
+
+def test_flush_error_reaches_every_waiter():
+    async def main():
+        ssot = SharedState(redis=fake(), write_window=0.01)
+        async def down(batch): raise ConnectionError("MULTI failed")
+        ssot._write_batch = down
+        results = await asyncio.gather(ssot.set("k", '"1"'), ssot.set("k", '"2"'), ssot.set("j", '"3"'), return_exceptions=True)
+        pending = dict(ssot._pending)
+        ssot._flusher.cancel()
+        return results, pending
+    results, pending = asyncio.run(main())
+    assert len(results) == 3 and all(isinstance(r, ConnectionError) for r in results)
+    assert not pending  # flush 모드: 호출자가 오류를 받았으므로 재적재하지 않음
+
+def test_buffer_mode_retries_after_error():
+    async def main():
+        ssot = SharedState(redis=fake(), write_window=0.01, write_ack="buffer")
+        write = ssot._write_batch; calls = []
+        async def flaky(batch):
+            calls.append(sorted(batch))
+            if len(calls) == 1: raise ConnectionError("MULTI failed")
+            return await write(batch)
+        ssot._write_batch = flaky
+        await ssot.set("k", '"1"'); await ssot.set("j", '"2"')
+        for _ in range(200):
+            if await ssot.redis.get("aicp:ssot:k"): break
+            await asyncio.sleep(0.01)
+        await ssot.close()
+        return calls, await ssot.redis.mget(["aicp:ssot:k", "aicp:ssot:j"])
+    calls, values = asyncio.run(main())
+    assert calls == [["j", "k"], ["j", "k"]]
+    assert values == ['"1"', '"2"']